@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from core.models import Coins, FullCoin
+from core.models import CoinPrice, Coins, FullCoin
 
 
 @admin.register(Coins)
@@ -45,3 +45,9 @@ class FullCoinAdmin(admin.ModelAdmin):
         'last_updated',
     )
     list_filter = ('coin_id', 'symbol', 'name', 'market_cap_rank')
+
+
+@admin.register(CoinPrice)
+class CoinPriceAdmin(admin.ModelAdmin):
+    list_display = ('coin_id', 'vs_currency', 'current_price', 'market_cap', 'total_volume', 'last_updated')
+    list_filter = ('vs_currency',)
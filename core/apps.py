@@ -1,6 +1,12 @@
 from django.apps import AppConfig
 
+from core import metrics
+
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self) -> None:
+        """Connect the Celery signal handlers that feed task metrics."""
+        metrics.connect_signals()
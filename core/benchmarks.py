@@ -0,0 +1,139 @@
+import io
+import json
+import random
+import time
+import tracemalloc
+import uuid
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterator, Mapping, Optional, Union
+from urllib.parse import parse_qs, urlsplit
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext, override_settings
+from requests import PreparedRequest, Response
+from requests.adapters import BaseAdapter
+
+
+def synthetic_market_data(count: int, seed: int = 0, start_rank: int = 1) -> list[dict[str, Any]]:
+    """Generate deterministic payloads shaped like CoinGecko's /coins/markets rows."""
+    rng = random.Random(seed)  # nosec B311 - seeded fixture data, not a secret
+    base_time = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    data = []
+    for rank in range(start_rank, start_rank + count):
+        price = round(rng.uniform(0.01, 90000), 2)
+        supply = round(rng.uniform(1e6, 1e10), 2)
+        data.append(
+            {
+                'id': f'bench-coin-{rank}',
+                'symbol': f'bc{rank}',
+                'name': f'Bench Coin {rank}',
+                'image': f'https://assets.example.com/coins/images/{rank}/large/coin.png',
+                'current_price': price,
+                'market_cap': int(price * supply),
+                'market_cap_rank': rank,
+                'fully_diluted_valuation': int(price * supply * 1.2),
+                'total_volume': int(rng.uniform(1e3, 1e10)),
+                'high_24h': round(price * 1.05, 2),
+                'low_24h': round(price * 0.95, 2),
+                'price_change_24h': round(rng.uniform(-price / 10, price / 10), 2),
+                'price_change_percentage_24h': round(rng.uniform(-10, 10), 5),
+                'market_cap_change_24h': int(rng.uniform(-1e8, 1e8)),
+                'market_cap_change_percentage_24h': round(rng.uniform(-10, 10), 5),
+                'circulating_supply': supply,
+                'total_supply': supply,
+                'max_supply': None if rank % 3 else supply,
+                'ath': round(price * 2, 2),
+                'ath_change_percentage': round(rng.uniform(-99, 0), 5),
+                'ath_date': (base_time - timedelta(days=rank % 900)).isoformat(),
+                'atl': round(price / 2, 2),
+                'atl_change_percentage': round(rng.uniform(0, 9999), 5),
+                'atl_date': (base_time - timedelta(days=900 + rank % 900)).isoformat(),
+                'last_updated': (base_time + timedelta(seconds=seed)).isoformat(),
+            }
+        )
+    return data
+
+
+@contextmanager
+def measure(memory: bool = False) -> Iterator[dict[str, Any]]:
+    """Time the wrapped block and count the queries it runs, plus its tracemalloc peak if ``memory``."""
+    result: dict[str, Any] = {}
+    if memory:
+        tracemalloc.start()
+    try:
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            yield result
+            result['seconds'] = round(time.perf_counter() - started, 4)
+        result['queries'] = len(queries)
+        if memory:
+            result['peak_bytes'] = tracemalloc.get_traced_memory()[1]
+    finally:
+        if memory:
+            tracemalloc.stop()
+
+
+@contextmanager
+def isolated_caches() -> Iterator[None]:
+    """
+    Point every cache alias at a fresh local-memory cache for the wrapped block.
+
+    Keeps locks, checkpoints and generation bumps of benchmarked code away from the live caches.
+    """
+    run = uuid.uuid4().hex
+    caches = {
+        alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'bench-{run}-{alias}'}
+        for alias in settings.CACHES
+    }
+    with override_settings(CACHES=caches):
+        yield
+
+
+@contextmanager
+def rolled_back() -> Iterator[None]:
+    """Run the wrapped block in a transaction that is always rolled back."""
+    with transaction.atomic():
+        yield
+        transaction.set_rollback(True)
+
+
+class SyntheticMarketAdapter(BaseAdapter):
+    """
+    A requests transport that answers /coins/markets with pages of ``synthetic_market_data``.
+
+    Mount it on a CoinGeckoClient's session to exercise the real client (retries, JSON decoding,
+    response cache) without the network. ``count`` coins exist in total; later pages come back empty.
+    """
+
+    def __init__(self, count: int, seed: int = 0) -> None:
+        """Generate the market once; pages are sliced from it."""
+        super().__init__()
+        self.market = synthetic_market_data(count, seed=seed)
+        self.requests = 0
+
+    def send(  # pylint: disable=too-many-positional-arguments
+        self,
+        request: PreparedRequest,
+        stream: bool = False,
+        timeout: Union[None, float, tuple[float, float], tuple[float, None]] = None,
+        verify: Union[bool, str] = True,
+        cert: Union[None, bytes, str, tuple[Union[bytes, str], Union[bytes, str]]] = None,
+        proxies: Optional[Mapping[str, str]] = None,
+    ) -> Response:
+        """Return the requested page as a 200 JSON response."""
+        self.requests += 1
+        query = parse_qs(urlsplit(request.url or '').query)
+        per_page = int(query.get('per_page', ['100'])[0])
+        page = int(query.get('page', ['1'])[0])
+        response = Response()
+        response.status_code = 200
+        response.headers['Content-Type'] = 'application/json'
+        response.raw = io.BytesIO(json.dumps(self.market[slice((page - 1) * per_page, page * per_page)]).encode())
+        response.url = request.url or ''
+        response.request = request
+        return response
+
+    def close(self) -> None:
+        """Nothing to release."""
@@ -0,0 +1,193 @@
+import hashlib
+import logging
+import os
+import re
+import threading
+import time
+from collections import Counter
+from typing import Any, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+from django.conf import settings
+from django.core.cache import BaseCache, caches
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+logger = logging.getLogger(__name__)
+
+
+def cache_key(url: str, params: Optional[dict[str, Any]] = None) -> str:
+    """Return a cache key for a GET request, independent of query parameter order and host case."""
+    parts = urlsplit(url)
+    query = parse_qsl(parts.query, keep_blank_values=True)
+    query.extend((str(name), str(value)) for name, value in (params or {}).items())
+    normalized = urlunsplit(
+        (parts.scheme.lower(), parts.netloc.lower(), parts.path.rstrip('/') or '/', urlencode(sorted(query)), '')
+    )
+    return f'coingecko:{hashlib.sha256(normalized.encode()).hexdigest()}'
+
+
+class CoinGeckoClient:
+    """Pooled, keep-alive HTTP client shared by every CoinGecko ingestion task."""
+
+    def __init__(
+        self,
+        *,
+        pool_maxsize: int = 4,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 30.0,
+        max_retries: int = 3,
+        backoff_factor: float = 0.5,
+        cache: Optional[BaseCache] = None,
+        cache_ttl: int = 0,
+        revalidate_ttl: int = 0,
+    ) -> None:
+        """
+        Create the session and mount a retrying, pooled adapter on it.
+
+        With a ``cache`` and a positive ``cache_ttl``, ``get_json`` serves repeated URLs from the
+        cache while they are fresh and revalidates them with ``If-None-Match`` for ``revalidate_ttl``
+        seconds after that.
+        """
+        self.cache = cache if cache_ttl > 0 else None
+        self.cache_ttl = cache_ttl
+        self.revalidate_ttl = revalidate_ttl
+        self.cache_counts: Counter[str] = Counter()
+        self._counts_lock = threading.Lock()
+        self.timeout = (connect_timeout, read_timeout)
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=max_retries,
+            status_forcelist=(500, 502, 503, 504),
+            allowed_methods=frozenset({'GET'}),
+            backoff_factor=backoff_factor,
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        self.adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, max_retries=retry)
+        self.session = requests.Session()
+        self.session.headers.update({'Accept': 'application/json', 'Accept-Encoding': 'gzip, deflate'})
+        self.session.mount('https://', self.adapter)
+        self.session.mount('http://', self.adapter)
+
+    def get(
+        self, url: str, params: Optional[dict[str, Any]] = None, headers: Optional[dict[str, str]] = None
+    ) -> requests.Response:
+        """Issue a GET request over the pooled session."""
+        if headers:
+            return self.session.get(url, params=params, headers=headers, timeout=self.timeout)
+        return self.session.get(url, params=params, timeout=self.timeout)
+
+    def get_json(self, url: str, params: Optional[dict[str, Any]] = None) -> Any:
+        """Issue a GET request and decode the JSON body, going through the response cache if there is one."""
+        if self.cache is None:
+            return self.get(url, params=params).json()
+
+        key = cache_key(url, params)
+        entry = self.cache.get(key)
+        if entry is not None and entry['expires'] > time.time():
+            self._count('hits')
+            return entry['data']
+
+        etag = entry.get('etag') if entry is not None else None
+        response = self.get(url, params=params, headers={'If-None-Match': etag} if etag else None)
+        if response.status_code == 304 and entry is not None:
+            self._count('revalidated')
+            data = entry['data']
+        else:
+            self._count('misses')
+            data = response.json()
+            if response.status_code != 200:
+                return data
+            etag = response.headers.get('ETag')
+
+        ttl = self._freshness(response.headers)
+        if ttl is not None:
+            keep = ttl + self.revalidate_ttl if etag else ttl
+            if keep > 0:
+                self.cache.set(key, {'data': data, 'etag': etag, 'expires': time.time() + ttl}, timeout=keep)
+        return data
+
+    def _freshness(self, headers: Any) -> Optional[int]:
+        """Return for how many seconds a response may be reused, or None if it must not be stored."""
+        directives = {}
+        for directive in headers.get('Cache-Control', '').lower().split(','):
+            name, _, value = directive.strip().partition('=')
+            directives[name] = value.strip('"')
+        if 'no-store' in directives or 'private' in directives:
+            return None
+        if 'no-cache' in directives:
+            return 0
+        ttl = self.cache_ttl
+        max_age = directives.get('s-maxage') or directives.get('max-age')
+        if max_age and re.fullmatch(r'\d+', max_age):
+            age = headers.get('Age', '0')
+            ttl = min(ttl, int(max_age) - (int(age) if age.isdigit() else 0))
+        return max(ttl, 0)
+
+    def _count(self, outcome: str) -> None:
+        with self._counts_lock:
+            self.cache_counts[outcome] += 1
+
+    def cache_stats(self) -> dict[str, int]:
+        """Return how many ``get_json`` calls were cache hits, misses or 304 revalidations."""
+        with self._counts_lock:
+            return {outcome: self.cache_counts[outcome] for outcome in ('hits', 'misses', 'revalidated')}
+
+    def connection_stats(self) -> dict[str, int]:
+        """Return how many requests went over new vs reused connections."""
+        pools = self.adapter.poolmanager.pools
+        requests_made = new_connections = 0
+        for key in pools.keys():
+            try:
+                pool = pools[key]
+            except KeyError:
+                continue
+            requests_made += pool.num_requests
+            new_connections += pool.num_connections
+        return {
+            'requests': requests_made,
+            'new_connections': new_connections,
+            'reused_connections': max(requests_made - new_connections, 0),
+        }
+
+    def close(self) -> None:
+        """Close the session and every pooled connection."""
+        self.session.close()
+
+
+_client: Optional[CoinGeckoClient] = None
+_client_pid: Optional[int] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> CoinGeckoClient:
+    """Return this worker process' client, creating it after a fork if needed."""
+    global _client, _client_pid  # pylint: disable=global-statement
+    pid = os.getpid()
+    with _client_lock:
+        if _client is None or _client_pid != pid:
+            _client = CoinGeckoClient(
+                pool_maxsize=settings.COINGECKO_POOL_MAXSIZE,
+                connect_timeout=settings.COINGECKO_CONNECT_TIMEOUT,
+                read_timeout=settings.COINGECKO_READ_TIMEOUT,
+                max_retries=settings.COINGECKO_MAX_RETRIES,
+                backoff_factor=settings.COINGECKO_RETRY_BACKOFF,
+                cache=caches[settings.COINGECKO_CACHE_ALIAS],
+                cache_ttl=settings.COINGECKO_CACHE_TTL,
+                revalidate_ttl=settings.COINGECKO_CACHE_REVALIDATE_TTL,
+            )
+            _client_pid = pid
+        return _client
+
+
+def reset_client() -> None:
+    """Close and forget the cached client."""
+    global _client, _client_pid  # pylint: disable=global-statement
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+        _client_pid = None
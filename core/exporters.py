@@ -0,0 +1,255 @@
+import csv
+import io
+import logging
+import os
+import tempfile
+import zipfile
+from datetime import timedelta
+from pathlib import Path
+from typing import IO, Any, Iterator, Optional
+
+from decouple import config
+from django.conf import settings
+from django.core import signing
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db.models import QuerySet
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Font, NamedStyle, Protection
+from openpyxl.worksheet._write_only import WriteOnlyWorksheet
+
+from core import metrics
+from core.generation import COINS, get_data_generation
+from core.models import Coins
+
+logger = logging.getLogger(__name__)
+
+COIN_EXPORT_COLUMNS = ['Name', 'Symbol', 'Rank', 'Current price', 'Price change', 'Market cap', 'Total supply']
+COIN_EXPORT_FIELDS = [
+    'name',
+    'symbol',
+    'rank',
+    'current_price',
+    'price_change_within_24_hours',
+    'market_cap',
+    'total_supply',
+]
+CURRENCY_COLUMNS = {'current_price', 'price_change_within_24_hours', 'market_cap'}
+CSV_FLUSH_BYTES = 64 * 1024
+EXPORT_STORAGE_DIR = 'exports'
+EXPORT_LINK_SALT = 'core.exporters.download'
+
+
+def coin_export_queryset() -> QuerySet[Coins]:
+    """Return the coins to export, in rank order."""
+    return Coins.objects.all().order_by('rank')
+
+
+def _register_styles(workbook: Workbook) -> dict[str, str]:
+    """Register the named styles every cell shares and return them by column kind."""
+    locked = Protection(locked=True)
+    styles = [
+        NamedStyle(
+            name='coin_header',
+            font=Font(bold=True),
+            alignment=Alignment(horizontal='center', vertical='center', wrap_text=True),
+            protection=locked,
+        ),
+        NamedStyle(name='coin_text', protection=locked),
+        NamedStyle(name='coin_integer', number_format='0', protection=locked),
+        NamedStyle(name='coin_currency', number_format=settings.EXPORT_CURRENCY_FORMAT, protection=locked),
+        NamedStyle(name='coin_decimal', number_format='#,##0.00', protection=locked),
+    ]
+    for style in styles:
+        workbook.add_named_style(style)
+    column_styles = {'name': 'coin_text', 'symbol': 'coin_text', 'rank': 'coin_integer', 'total_supply': 'coin_decimal'}
+    column_styles.update({field: 'coin_currency' for field in CURRENCY_COLUMNS})
+    column_styles['header'] = 'coin_header'
+    return column_styles
+
+
+def _protect(workbook: Workbook, worksheet: WriteOnlyWorksheet) -> None:
+    """Apply the workbook and sheet protection settings."""
+    workbook.security.workbookPassword = config('PASSWORD', default='12345data')
+    workbook.security.lockStructure = config('PROTECT', default=True, cast=bool)
+    workbook.security.revisionsPassword = config('PASSWORD', default='12345data')
+    worksheet.protection.sheet = config('PROTECT', default=True, cast=bool)
+    worksheet.protection.formatCells = config('PROTECT', default=False, cast=bool)
+
+
+def write_coins_workbook(
+    output: IO[bytes], queryset: Optional[QuerySet[Coins]] = None, chunk_size: Optional[int] = None
+) -> int:
+    """
+    Stream coins into a write-only workbook saved to ``output`` and return the number of data rows.
+
+    Rows are read with a chunked ``iterator()`` over ``values_list`` and appended as they arrive, so
+    memory stays flat however many rows are exported. Prices are written as numbers with a currency
+    ``number_format`` so they stay sortable in Excel.
+    """
+    if queryset is None:
+        queryset = coin_export_queryset()
+    if chunk_size is None:
+        chunk_size = settings.EXPORT_CHUNK_SIZE
+
+    workbook = Workbook(write_only=True)
+    worksheet = workbook.create_sheet(title='Latest Cryptocurrency Coins')
+    _protect(workbook, worksheet)
+    worksheet.sheet_properties.tabColor = '1072BA'
+    worksheet.freeze_panes = 'I2'
+    column_styles = _register_styles(workbook)
+
+    def make_cell(value: Any, style: str) -> WriteOnlyCell:
+        cell = WriteOnlyCell(worksheet, value=value)
+        cell.style = style
+        return cell
+
+    worksheet.append([make_cell(title, column_styles['header']) for title in COIN_EXPORT_COLUMNS])
+    styles = [column_styles[field] for field in COIN_EXPORT_FIELDS]
+    symbol_index = COIN_EXPORT_FIELDS.index('symbol')
+    row_count = 0
+    for row in queryset.values_list(*COIN_EXPORT_FIELDS).iterator(chunk_size=chunk_size):
+        values = list(row)
+        values[symbol_index] = f'{values[symbol_index]}'.upper()
+        worksheet.append([make_cell(value, style) for value, style in zip(values, styles)])
+        row_count += 1
+
+    workbook.save(output)
+    return row_count
+
+
+def _evict_exports(cache_dir: Path, keep: Path) -> None:
+    """Delete least recently used artifacts until the cache fits in EXPORT_CACHE_MAX_BYTES."""
+    artifacts = []
+    for path in cache_dir.glob('*.xlsx'):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        artifacts.append((stat.st_mtime, stat.st_size, path))
+    total = sum(size for _, size, _ in artifacts)
+    for _, size, path in sorted(artifacts):
+        if total <= settings.EXPORT_CACHE_MAX_BYTES:
+            break
+        if path == keep:
+            continue
+        path.unlink(missing_ok=True)
+        total -= size
+        logger.info('Evicted cached export %s', path.name)
+
+
+def cached_coins_export() -> Path:
+    """
+    Return the rendered coin workbook for the current ingestion generation, rendering it on a miss.
+
+    Artifacts are named after the generation, so a new ingestion run makes the next export a miss and
+    every export until the following run a hit. Hits refresh the file's mtime, which drives LRU eviction.
+    """
+    cache_dir = Path(settings.EXPORT_CACHE_DIR)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    path = cache_dir / f'coins-{get_data_generation(COINS)}.xlsx'
+    if path.exists():
+        os.utime(path)
+        logger.info('Export cache hit: %s', path.name)
+        return path
+
+    logger.info('Export cache miss: %s', path.name)
+    with tempfile.NamedTemporaryFile(dir=cache_dir, suffix='.tmp', delete=False) as output:
+        try:
+            write_coins_workbook(output)
+        except BaseException:
+            os.unlink(output.name)
+            raise
+    os.replace(output.name, path)
+    _evict_exports(cache_dir, keep=path)
+    return path
+
+
+def publish_coins_export() -> str:
+    """
+    Put the current generation's coin workbook in ``default_storage`` and return its storage name.
+
+    The workbook is rendered through the local export cache, streamed into storage from disk, and
+    zipped first when EXPORT_COMPRESS is on. A generation already in storage is reused as is.
+    """
+    extension = 'zip' if settings.EXPORT_COMPRESS else 'xlsx'
+    name = f'{EXPORT_STORAGE_DIR}/coins-{get_data_generation(COINS)}.{extension}'
+    if default_storage.exists(name):
+        return name
+
+    workbook = cached_coins_export()
+    if settings.EXPORT_COMPRESS:
+        with tempfile.TemporaryFile(suffix='.zip') as archive:
+            with zipfile.ZipFile(archive, 'w', compression=zipfile.ZIP_DEFLATED) as zipped:
+                zipped.write(workbook, arcname='latest-coin-list.xlsx')
+            metrics.EXPORT_BYTES.labels('zip').inc(archive.tell())
+            archive.seek(0)
+            return default_storage.save(name, File(archive))
+    metrics.EXPORT_BYTES.labels('xlsx').inc(workbook.stat().st_size)
+    with workbook.open('rb') as excelfile:
+        return default_storage.save(name, File(excelfile))
+
+
+def export_download_url(name: str) -> str:
+    """Return an absolute, signed link to a stored export that stops working after EXPORT_LINK_MAX_AGE."""
+    token = signing.dumps(name, salt=EXPORT_LINK_SALT)
+    return f"{settings.SITE_URL.rstrip('/')}{reverse('core:download_export', args=[token])}"
+
+
+def load_export_token(token: str) -> Optional[str]:
+    """Return the storage name a download token was signed for, or None if it is invalid or expired."""
+    try:
+        name: str = signing.loads(token, salt=EXPORT_LINK_SALT, max_age=settings.EXPORT_LINK_MAX_AGE)
+    except signing.BadSignature:
+        return None
+    return name
+
+
+def purge_export_artifacts() -> int:
+    """Delete stored exports older than EXPORT_ARTIFACT_MAX_AGE and return how many were removed."""
+    if not default_storage.exists(EXPORT_STORAGE_DIR):
+        return 0
+    cutoff = timezone.now() - timedelta(seconds=settings.EXPORT_ARTIFACT_MAX_AGE)
+    purged = 0
+    for filename in default_storage.listdir(EXPORT_STORAGE_DIR)[1]:
+        name = f'{EXPORT_STORAGE_DIR}/{filename}'
+        if default_storage.get_modified_time(name) < cutoff:
+            default_storage.delete(name)
+            purged += 1
+    logger.info('Purged %s stored exports older than %s', purged, cutoff.isoformat())
+    return purged
+
+
+def stream_csv(
+    queryset: QuerySet[Any], fields: list[str], header: list[str], chunk_size: Optional[int] = None
+) -> Iterator[str]:
+    """
+    Yield a CSV of ``fields`` for every row of ``queryset``, a buffer at a time.
+
+    The header is yielded on its own so the response starts straight away; rows are read with a
+    chunked ``iterator()`` (a server-side cursor where the backend has one) and flushed every
+    CSV_FLUSH_BYTES, so memory stays flat however large the table is.
+    """
+    if chunk_size is None:
+        chunk_size = settings.EXPORT_CHUNK_SIZE
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+
+    def flush() -> str:
+        chunk = buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+        metrics.EXPORT_BYTES.labels('csv').inc(len(chunk.encode()))
+        return chunk
+
+    writer.writerow(header)
+    yield flush()
+    for row in queryset.values_list(*fields).iterator(chunk_size=chunk_size):
+        writer.writerow(row)
+        if buffer.tell() >= CSV_FLUSH_BYTES:
+            yield flush()
+    if buffer.tell():
+        yield flush()
@@ -0,0 +1,228 @@
+import copy
+import json
+import re
+import time
+from collections import Counter
+from typing import Any, Callable, Optional
+
+from openpyxl.utils import column_index_from_string
+
+A1_RANGE = re.compile(r"^'?(?P<title>.*?)'?!(?P<col>[A-Z]+)(?P<row>\d+)(?::[A-Z]+\d+)?$")
+
+
+class FakeSheetsError(Exception):
+    """Raised where the real API would answer with a 400."""
+
+
+class FakeRequest:
+    """Deferred call mirroring googleapiclient's ``HttpRequest``; the work happens in ``execute``."""
+
+    def __init__(self, service: 'FakeSheetsService', method: str, body: Any, handler: Callable[[], Any]) -> None:
+        """Store the call until it is executed."""
+        self.service = service
+        self.method = method
+        self.body = body
+        self.handler = handler
+
+    def execute(self) -> Any:
+        """Record the call's cost and run it against the in-memory spreadsheet."""
+        self.service.record(self.method, self.body)
+        return self.handler()
+
+
+class _Values:
+    def __init__(self, service: 'FakeSheetsService') -> None:
+        self.service = service
+
+    def append(
+        self, spreadsheetId: str, range: str, valueInputOption: str, body: dict[str, Any]  # noqa: N803
+    ) -> FakeRequest:
+        """Append rows after the last non-empty row of the range's tab, growing the grid as needed."""
+        # pylint: disable=invalid-name,redefined-builtin
+        return FakeRequest(self.service, 'values.append', body, lambda: self.service.append(range, body['values']))
+
+    def update(
+        self, spreadsheetId: str, range: str, valueInputOption: str, body: dict[str, Any]  # noqa: N803
+    ) -> FakeRequest:
+        """Overwrite the cells of a single range."""
+        # pylint: disable=invalid-name,redefined-builtin
+        return FakeRequest(self.service, 'values.update', body, lambda: self.service.write(range, body['values']))
+
+    def batchUpdate(self, spreadsheetId: str, body: dict[str, Any]) -> FakeRequest:  # noqa: N802,N803
+        """Overwrite the cells of several ranges in one call."""
+        # pylint: disable=invalid-name
+
+        def handler() -> dict[str, Any]:
+            for data in body['data']:
+                self.service.write(data['range'], data['values'])
+            return {'totalUpdatedRanges': len(body['data'])}
+
+        return FakeRequest(self.service, 'values.batchUpdate', body, handler)
+
+
+class _Spreadsheets:
+    def __init__(self, service: 'FakeSheetsService') -> None:
+        self.service = service
+
+    def get(self, spreadsheetId: str) -> FakeRequest:  # noqa: N803
+        """Return the spreadsheet's tab metadata."""
+        # pylint: disable=invalid-name
+        return FakeRequest(self.service, 'spreadsheets.get', None, self.service.metadata)
+
+    def batchUpdate(self, spreadsheetId: str, body: dict[str, Any]) -> FakeRequest:  # noqa: N802,N803
+        """Apply structural requests (add/delete/resize/clear tabs) in order."""
+        # pylint: disable=invalid-name
+        return FakeRequest(self.service, 'spreadsheets.batchUpdate', body, lambda: self.service.apply(body['requests']))
+
+    def values(self) -> _Values:
+        """Return the values collection."""
+        return _Values(self.service)
+
+
+class FakeSheetsService:
+    """
+    In-process stand-in for the slice of the Sheets v4 API that core.sheets uses.
+
+    Every executed request is counted per method along with its JSON payload size, and
+    ``latency`` seconds are added to ``simulated_seconds`` per call (and slept if ``sleep``).
+    """
+
+    def __init__(self, latency: float = 0.0, sleep: bool = False) -> None:
+        """Start with a spreadsheet holding a single empty tab."""
+        self.latency = latency
+        self.sleep = sleep
+        self.calls: Counter[str] = Counter()
+        self.request_bytes = 0
+        self.simulated_seconds = 0.0
+        self.tabs: dict[int, dict[str, Any]] = {}
+        self._add_tab({'sheetId': 0, 'title': 'Sheet1'})
+
+    def spreadsheets(self) -> _Spreadsheets:
+        """Return the spreadsheets collection."""
+        return _Spreadsheets(self)
+
+    def record(self, method: str, body: Any) -> None:
+        """Count a request and its payload size and account for its latency."""
+        self.calls[method] += 1
+        if body is not None:
+            self.request_bytes += len(json.dumps(body, default=str))
+        self.simulated_seconds += self.latency
+        if self.sleep and self.latency:
+            time.sleep(self.latency)
+
+    def stats(self) -> dict[str, Any]:
+        """Return the recorded request counts and costs."""
+        return {
+            'calls': sum(self.calls.values()),
+            'calls_by_method': dict(self.calls),
+            'request_bytes': self.request_bytes,
+            'simulated_seconds': round(self.simulated_seconds, 4),
+        }
+
+    def metadata(self) -> dict[str, Any]:
+        """Return tab properties the way ``spreadsheets.get`` does."""
+        return {
+            'sheets': [
+                {
+                    'properties': {
+                        'sheetId': sheet_id,
+                        'title': tab['title'],
+                        'gridProperties': {'rowCount': tab['rowCount'], 'columnCount': tab['columnCount']},
+                    }
+                }
+                for sheet_id, tab in self.tabs.items()
+            ]
+        }
+
+    def _add_tab(self, properties: dict[str, Any]) -> dict[str, Any]:
+        grid = properties.get('gridProperties', {})
+        sheet_id = properties.get('sheetId', max(self.tabs, default=0) + 1)
+        if sheet_id in self.tabs or any(tab['title'] == properties['title'] for tab in self.tabs.values()):
+            raise FakeSheetsError(f"A sheet with id {sheet_id} or title {properties['title']!r} already exists")
+        self.tabs[sheet_id] = {
+            'title': properties['title'],
+            'rowCount': grid.get('rowCount', 1000),
+            'columnCount': grid.get('columnCount', 26),
+            'cells': {},
+        }
+        return {'addSheet': {'properties': {'sheetId': sheet_id, 'title': properties['title']}}}
+
+    def apply(self, requests_body: list[dict[str, Any]]) -> dict[str, Any]:
+        """Apply structural ``batchUpdate`` requests, all or none of them, like the real API."""
+        before = copy.deepcopy(self.tabs)
+        try:
+            return self._apply(requests_body)
+        except FakeSheetsError:
+            self.tabs = before
+            raise
+
+    def _apply(self, requests_body: list[dict[str, Any]]) -> dict[str, Any]:
+        replies: list[dict[str, Any]] = []
+        for request in requests_body:
+            if 'addSheet' in request:
+                replies.append(self._add_tab(request['addSheet']['properties']))
+                continue
+            if 'deleteSheet' in request:
+                sheet_id = request['deleteSheet']['sheetId']
+                if sheet_id not in self.tabs:
+                    raise FakeSheetsError(f'No grid with id: {sheet_id}')
+                if len(self.tabs) == 1:
+                    raise FakeSheetsError("You can't remove all the sheets in a document.")
+                del self.tabs[sheet_id]
+            elif 'updateSheetProperties' in request:
+                properties = request['updateSheetProperties']['properties']
+                self.tabs[properties['sheetId']]['rowCount'] = properties['gridProperties']['rowCount']
+            elif 'updateCells' in request:
+                self.tabs[request['updateCells']['range']['sheetId']]['cells'].clear()
+            else:
+                raise FakeSheetsError(f'Unsupported request {sorted(request)}')
+            replies.append({})
+        return {'replies': replies}
+
+    def tab(self, title: str) -> dict[str, Any]:
+        """Return a tab by title."""
+        for tab in self.tabs.values():
+            if tab['title'] == title:
+                return tab
+        raise FakeSheetsError(f'Unable to parse range: {title!r}')
+
+    def _parse(self, a1_range: str) -> tuple[dict[str, Any], int, int]:
+        match = A1_RANGE.match(a1_range)
+        if match is None:
+            raise FakeSheetsError(f'Unable to parse range: {a1_range!r}')
+        return self.tab(match['title']), int(match['row']) - 1, column_index_from_string(match['col']) - 1
+
+    def write(self, a1_range: str, values: list[list[Any]], grow: bool = False) -> dict[str, Any]:
+        """Write a block of values starting at the range's top-left cell."""
+        tab, first_row, first_column = self._parse(a1_range)
+        last_row = first_row + len(values)
+        if last_row > tab['rowCount']:
+            if not grow:
+                raise FakeSheetsError(f'Range {a1_range!r} exceeds grid limits. Max rows: {tab["rowCount"]}')
+            tab['rowCount'] = last_row
+        for row_offset, row in enumerate(values):
+            for column_offset, value in enumerate(row):
+                key = (first_row + row_offset, first_column + column_offset)
+                if value == '' or value is None:
+                    tab['cells'].pop(key, None)
+                else:
+                    tab['cells'][key] = value
+        return {'updatedRows': len(values)}
+
+    def append(self, a1_range: str, values: list[list[Any]]) -> dict[str, Any]:
+        """Append below the last row holding any value."""
+        match = A1_RANGE.match(a1_range)
+        if match is None:
+            raise FakeSheetsError(f'Unable to parse range: {a1_range!r}')
+        tab = self.tab(match['title'])
+        next_row = max((row for row, _ in tab['cells']), default=-1) + 1
+        return self.write(f"'{match['title']}'!{match['col']}{next_row + 1}", values, grow=True)
+
+    def rows(self, title: str, width: Optional[int] = None) -> list[list[Any]]:
+        """Return a tab's non-empty area as a list of rows, with blanks as ``''``."""
+        cells = self.tab(title)['cells']
+        if not cells:
+            return []
+        height = max(row for row, _ in cells) + 1
+        width = width or max(column for _, column in cells) + 1
+        return [[cells.get((row, column), '') for column in range(width)] for row in range(height)]
@@ -0,0 +1,133 @@
+import locale
+import threading
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Any, Iterable, Optional
+
+# Monetary conventions for en_NG, used when no candidate locale is installed on the host.
+FALLBACK_CONVENTIONS: dict[str, Any] = {
+    'currency_symbol': '₦',
+    'mon_decimal_point': '.',
+    'mon_thousands_sep': ',',
+    'mon_grouping': [3, 3, 0],
+    'frac_digits': 2,
+    'p_cs_precedes': 1,
+    'n_cs_precedes': 1,
+    'p_sep_by_space': 0,
+    'n_sep_by_space': 0,
+    'p_sign_posn': 1,
+    'n_sign_posn': 1,
+    'positive_sign': '',
+    'negative_sign': '-',
+}
+DEFAULT_LOCALES = ('en_NG.UTF-8', 'en_US.UTF-8')
+ZERO_CURRENCY = '₦0.0'
+
+
+@dataclass(frozen=True)
+class CurrencyFormatter:
+    """Format amounts like ``locale.currency(..., grouping=True)`` from conventions resolved up front."""
+
+    conventions: dict[str, Any]
+
+    def _group(self, digits: str) -> str:
+        """Insert the thousands separator into a string of integer digits."""
+        separator = self.conventions['mon_thousands_sep']
+        if not separator:
+            return digits
+        groups: list[str] = []
+        last_size = 0
+        for size in self.conventions['mon_grouping']:
+            if size == locale.CHAR_MAX:
+                break
+            if size == 0:
+                # A trailing 0 repeats the previous group size for the remaining digits.
+                while last_size and len(digits) > last_size:
+                    groups.insert(0, digits[-last_size:])
+                    digits = digits[:-last_size]
+                break
+            if len(digits) <= size:
+                break
+            groups.insert(0, digits[-size:])
+            digits = digits[:-size]
+            last_size = size
+        groups.insert(0, digits)
+        return separator.join(groups)
+
+    def format(self, value: Any) -> str:
+        """Format a single amount."""
+        conv = self.conventions
+        amount = Decimal(value)
+        negative = amount < 0
+        integer, _, fraction = f'{abs(amount):.{conv["frac_digits"]}f}'.partition('.')
+        number = self._group(integer) + (conv['mon_decimal_point'] + fraction if fraction else '')
+
+        symbol = conv['currency_symbol']
+        space = ' ' if conv['n_sep_by_space' if negative else 'p_sep_by_space'] else ''
+        if conv['n_cs_precedes' if negative else 'p_cs_precedes']:
+            formatted = f'{symbol}{space}<{number}>'
+        else:
+            formatted = f'<{number}>{space}{symbol}'
+
+        sign = conv['negative_sign' if negative else 'positive_sign']
+        sign_position = conv['n_sign_posn' if negative else 'p_sign_posn']
+        if sign_position == 0:
+            formatted = f'({formatted})'
+        elif sign_position == 2:
+            formatted = formatted + sign
+        elif sign_position == 3:
+            formatted = formatted.replace('<', sign)
+        elif sign_position == 4:
+            formatted = formatted.replace('>', sign)
+        else:
+            formatted = sign + formatted
+        return formatted.replace('<', '').replace('>', '')
+
+
+_formatters: dict[tuple[tuple[str, ...], Optional[str]], CurrencyFormatter] = {}
+_formatters_lock = threading.Lock()
+
+
+def _read_conventions(locale_names: Iterable[str]) -> dict[str, Any]:
+    """Read monetary conventions for the first installed locale, restoring LC_MONETARY afterwards."""
+    previous = locale.setlocale(locale.LC_MONETARY)
+    try:
+        for name in locale_names:
+            try:
+                locale.setlocale(locale.LC_MONETARY, name)
+            except (locale.Error, ValueError):
+                continue
+            conventions = locale.localeconv()
+            if conventions['currency_symbol']:
+                return {key: value for key, value in conventions.items() if key in FALLBACK_CONVENTIONS}
+    finally:
+        locale.setlocale(locale.LC_MONETARY, previous)
+    return dict(FALLBACK_CONVENTIONS)
+
+
+def get_currency_formatter(
+    locale_names: tuple[str, ...] = DEFAULT_LOCALES, currency_symbol: Optional[str] = None
+) -> CurrencyFormatter:
+    """Return the cached formatter for a locale preference list and optional symbol override."""
+    key = (locale_names, currency_symbol)
+    formatter = _formatters.get(key)
+    if formatter is None:
+        with _formatters_lock:
+            formatter = _formatters.get(key)
+            if formatter is None:
+                conventions = _read_conventions(locale_names)
+                if currency_symbol is not None:
+                    conventions['currency_symbol'] = currency_symbol
+                formatter = _formatters[key] = CurrencyFormatter(conventions)
+    return formatter
+
+
+def format_currency(value: Any) -> str:
+    """Format a single amount, rendering empty or zero values as ``ZERO_CURRENCY``."""
+    return get_currency_formatter().format(value) if value else ZERO_CURRENCY
+
+
+def format_currency_many(values: Iterable[Any]) -> list[str]:
+    """Format many amounts with one formatter lookup, for exporters."""
+    formatter = get_currency_formatter()
+    return [formatter.format(value) if value else ZERO_CURRENCY for value in values]
@@ -0,0 +1,50 @@
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from django.core.cache import cache
+
+COINS = 'coins'
+FULL_COINS = 'full_coins'
+PRICES = 'prices'
+
+
+def _generation_key(dataset: str) -> str:
+    return f'data-generation:{dataset}'
+
+
+def _modified_key(dataset: str) -> str:
+    return f'data-generation-modified:{dataset}'
+
+
+def _seed(dataset: str) -> None:
+    """Start a missing counter from the wall clock so it never repeats after a cache flush."""
+    cache.add(_generation_key(dataset), int(time.time() * 1000), timeout=None)
+
+
+def get_data_generation(dataset: str = COINS) -> int:
+    """Return the current ingestion generation of a dataset."""
+    generation = cache.get(_generation_key(dataset))
+    if generation is None:
+        _seed(dataset)
+        generation = cache.get(_generation_key(dataset))
+    return int(generation)
+
+
+def bump_data_generation(dataset: str = COINS) -> int:
+    """Mark a dataset as changed by a committed ingestion run and return the new generation."""
+    _seed(dataset)
+    try:
+        generation = int(cache.incr(_generation_key(dataset)))
+    except ValueError:
+        # The key expired or was evicted between add() and incr().
+        _seed(dataset)
+        generation = int(cache.incr(_generation_key(dataset)))
+    cache.set(_modified_key(dataset), time.time(), timeout=None)
+    return generation
+
+
+def get_generation_modified(dataset: str = COINS) -> Optional[datetime]:
+    """Return when a dataset's generation was last bumped, if known."""
+    modified = cache.get(_modified_key(dataset))
+    return None if modified is None else datetime.fromtimestamp(modified, tz=timezone.utc)
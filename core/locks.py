@@ -0,0 +1,181 @@
+import functools
+import logging
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.redis import RedisCache
+from redis.exceptions import LockError
+from redis.lock import Lock
+
+logger = logging.getLogger(__name__)
+
+LOCK_POLL_INTERVAL = 0.05
+
+
+def _lock_key(name: str) -> str:
+    return f'single-flight:{name}'
+
+
+def _contention_key(name: str) -> str:
+    return f'single-flight-contention:{name}'
+
+
+def _rerun_key(name: str) -> str:
+    return f'single-flight-rerun:{name}'
+
+
+class SingleFlightLock:
+    """
+    A named lock in the default cache, held by at most one worker at a time.
+
+    On the Redis cache backend this is redis-py's ``Lock``: taking, extending and releasing it are
+    each a single atomic operation checked against this holder's token. Every other backend only
+    gives best-effort locking: the token is stored with ``cache.add``, which FileBasedCache does not
+    do atomically, and extending or releasing reads the token before acting on it, so a lock that
+    expired in between can be extended or deleted for its next holder.
+
+    A crashed worker's lock expires after ``ttl``. With a ``heartbeat``, a thread extends the TTL
+    every ``heartbeat`` seconds while the lock is held; without one, the holder must finish within it.
+    """
+
+    def __init__(self, name: str, ttl: Optional[int] = None, heartbeat: Optional[float] = None) -> None:
+        """Describe the lock; nothing is acquired until ``acquire`` is called."""
+        self.name = name
+        self.key = _lock_key(name)
+        self.ttl = ttl if ttl is not None else settings.TASK_LOCK_TTL
+        self.heartbeat = heartbeat
+        self.token = uuid.uuid4().hex
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._redis_lock = _redis_lock(self.key, self.ttl)
+
+    def acquire(self, wait: float = 0) -> bool:
+        """Take the lock, retrying for up to ``wait`` seconds; on contention, count it and return False."""
+        if self._redis_lock is not None:
+            acquired = self._redis_lock.acquire(blocking=wait > 0, blocking_timeout=wait)
+        else:
+            acquired = self._add(wait)
+        if not acquired:
+            count = record_contention(self.name)
+            logger.info("Lock '%s' is held by another run; contention #%s", self.name, count)
+            return False
+        if self.heartbeat:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._beat, name=f'lock-heartbeat-{self.name}', daemon=True)
+            self._thread.start()
+        return True
+
+    def _add(self, wait: float) -> bool:
+        deadline = time.monotonic() + wait
+        while not cache.add(self.key, self.token, timeout=self.ttl):
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(LOCK_POLL_INTERVAL)
+        return True
+
+    def _extend(self) -> bool:
+        if self._redis_lock is not None:
+            try:
+                return bool(self._redis_lock.extend(self.ttl, replace_ttl=True))
+            except LockError:
+                return False
+        return cache.get(self.key) == self.token and cache.touch(self.key, self.ttl)
+
+    def _beat(self) -> None:
+        while not self._stop.wait(self.heartbeat):
+            if not self._extend():
+                logger.warning("Lock '%s' expired or was taken over while held", self.name)
+                return
+
+    def release(self) -> None:
+        """Stop the heartbeat and delete the lock if this holder still owns it."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._redis_lock is not None:
+            try:
+                self._redis_lock.release()
+            except LockError:
+                logger.warning("Lock '%s' expired or was taken over before it was released", self.name)
+            return
+        if cache.get(self.key) == self.token:
+            cache.delete(self.key)
+
+
+def _redis_lock(key: str, ttl: int) -> Optional[Lock]:
+    """Return a redis-py lock on ``key`` when the default cache is Redis, else None."""
+    backend = caches[DEFAULT_CACHE_ALIAS]
+    if not isinstance(backend, RedisCache):
+        return None
+    cache_key = backend.make_and_validate_key(key)
+    client = backend._cache.get_client(cache_key, write=True)  # pylint: disable=protected-access
+    return Lock(client, cache_key, timeout=ttl, sleep=LOCK_POLL_INTERVAL, thread_local=False)
+
+
+def record_contention(name: str) -> int:
+    """Count a run that found ``name`` locked and return the running total."""
+    key = _contention_key(name)
+    cache.add(key, 0, timeout=None)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Evicted between add and incr.
+        cache.set(key, 1, timeout=None)
+        return 1
+
+
+def contention_count(name: str) -> int:
+    """Return how many runs found ``name`` locked since the counter was last reset."""
+    return int(cache.get(_contention_key(name), 0))
+
+
+@contextmanager
+def single_flight(
+    name: str, ttl: Optional[int] = None, heartbeat: Optional[float] = None, wait: float = 0
+) -> Iterator[bool]:
+    """
+    Hold ``name`` for the duration of the block; yields whether the lock was acquired.
+
+    Without a ``heartbeat`` the block should finish within ``ttl``, as short critical sections do.
+    """
+    lock = SingleFlightLock(name, ttl=ttl, heartbeat=heartbeat)
+    if not lock.acquire(wait=wait):
+        yield False
+        return
+    try:
+        yield True
+    finally:
+        lock.release()
+
+
+def single_flight_task(name: str, coalesce: bool = False) -> Callable[[Callable[..., Any]], Callable[..., Any]]:
+    """
+    Make a task skip when another run of it holds ``name``.
+
+    With ``coalesce``, a skipped run instead asks the holder to go once more when it finishes, so
+    any number of overlapping requests collapse into a single follow-up run.
+    """
+
+    def decorator(func: Callable[..., Any]) -> Callable[..., Any]:
+        @functools.wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            with single_flight(name, heartbeat=settings.TASK_LOCK_HEARTBEAT) as acquired:
+                if not acquired:
+                    if coalesce:
+                        cache.set(_rerun_key(name), True, timeout=settings.TASK_LOCK_TTL)
+                    return None
+                result = func(*args, **kwargs)
+                while coalesce and cache.delete(_rerun_key(name)):
+                    logger.info("Running '%s' again for requests that arrived while it ran", name)
+                    result = func(*args, **kwargs)
+                return result
+
+        return wrapper
+
+    return decorator
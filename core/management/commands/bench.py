@@ -0,0 +1,109 @@
+import functools
+import json
+import tempfile
+from decimal import Decimal
+from pathlib import Path
+from typing import Any, Callable
+from unittest.mock import patch
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.test import RequestFactory
+from django.test.utils import override_settings
+
+from core.benchmarks import (
+    SyntheticMarketAdapter,
+    isolated_caches,
+    measure,
+    rolled_back,
+    synthetic_market_data,
+)
+from core.coingecko import CoinGeckoClient
+from core.models import Coins, FullCoin
+from core.tasks import (
+    coin_from_data,
+    export_data_to_excel,
+    ingest_coin_markets,
+    store_data,
+)
+from core.templatetags.custom_tags import currency
+from core.views import index
+
+BENCHMARKS = ('store_data', 'coins_task', 'export', 'currency_filter', 'index')
+
+
+class Command(BaseCommand):
+    help = 'Time the ingestion, export and rendering hot paths on synthetic coins and print JSON results.'
+    memory = True
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Add command arguments."""
+        parser.add_argument('--sizes', nargs='+', type=int, default=[250, 5000, 20000])
+        parser.add_argument('--only', nargs='+', choices=BENCHMARKS, default=list(BENCHMARKS))
+        parser.add_argument('--no-memory', action='store_true', help='Skip tracemalloc, which slows every run.')
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """Run each selected benchmark at every size inside a rolled-back transaction and throwaway caches."""
+        self.memory = not options['no_memory']
+        results = []
+        with override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend'):
+            for size in options['sizes']:
+                for name in options['only']:
+                    with rolled_back(), isolated_caches():
+                        result = getattr(self, f'bench_{name}')(size)
+                    results.append({'benchmark': name, 'rows': size, **result})
+        self.stdout.write(json.dumps(results, indent=2))
+
+    def _measure(self, func: Callable[[], Any]) -> dict[str, Any]:
+        with measure(memory=self.memory) as result:
+            func()
+        return result
+
+    def _seed_coins(self, size: int) -> None:
+        Coins.objects.bulk_create([coin_from_data(data) for data in synthetic_market_data(size, seed=1)])
+
+    def bench_store_data(self, size: int) -> dict[str, Any]:
+        """Insert then update ``size`` full coins."""
+        initial, changed = synthetic_market_data(size, seed=1), synthetic_market_data(size, seed=2)
+        return {
+            'insert': self._measure(lambda: store_data(initial)),
+            'update': self._measure(lambda: store_data(changed)),
+        }
+
+    def bench_coins_task(self, size: int) -> dict[str, Any]:
+        """
+        Run the scheduled market ingestion over a synthetic /coins/markets of ``size`` coins.
+
+        It pages through the whole market per currency; its task lock, checkpoint and generation bumps
+        land in the run's isolated caches, never in the ones a live ingestion is using.
+        """
+        adapter = SyntheticMarketAdapter(size)
+        client = CoinGeckoClient(max_retries=0)
+        client.session.mount('https://', adapter)
+        with patch('core.tasks.get_client', return_value=client), override_settings(COINGECKO_PAGE_INTERVAL=0):
+            result = self._measure(ingest_coin_markets)
+        result['stored'] = FullCoin.objects.count()
+        result['requests'] = adapter.requests
+        return result
+
+    def bench_export(self, size: int) -> dict[str, Any]:
+        """Render, store and email the coin workbook for ``size`` coins, cold."""
+        self._seed_coins(size)
+        # Fresh directories so no artifact rendered for another size is reused.
+        with tempfile.TemporaryDirectory() as scratch, override_settings(
+            EXPORT_CACHE_DIR=Path(scratch) / 'cache', MEDIA_ROOT=Path(scratch) / 'media'
+        ):
+            return self._measure(lambda: export_data_to_excel('bench@django_excel.com'))
+
+    def bench_currency_filter(self, size: int) -> dict[str, Any]:
+        """Format three currency cells per coin through the template filter."""
+        values = [Decimal(f'{i * 1234.5678:.2f}') for i in range(size * 3)]
+        return self._measure(lambda: [currency(value) for value in values])
+
+    def bench_index(self, size: int) -> dict[str, Any]:
+        """Render the first index page in rank order and by market cap, and a search."""
+        self._seed_coins(size)
+        factory = RequestFactory()
+        queries = {'rank': {}, 'market_cap_desc': {'sort': '-market_cap'}, 'search': {'q': 'bench coin 1'}}
+        return {
+            label: self._measure(functools.partial(index, factory.get('/', query))) for label, query in queries.items()
+        }
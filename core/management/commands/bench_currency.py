@@ -0,0 +1,49 @@
+import decimal
+import json
+import locale
+import timeit
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from core.formatting import format_currency, format_currency_many
+
+
+def setlocale_currency(value: Any) -> str:
+    """Format currency the way the filter used to: a setlocale call on every invocation."""
+    try:
+        locale.setlocale(locale.LC_ALL, 'en_NG.UTF-8')
+    except (locale.Error, ValueError):
+        locale.setlocale(locale.LC_ALL, 'en_US.UTF-8')
+    return locale.currency(decimal.Decimal(value), symbol=True, grouping=True) if value else '₦0.0'
+
+
+class Command(BaseCommand):
+    help = 'Compare per-call cost of the cached currency formatter with per-call setlocale.'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Add command arguments."""
+        parser.add_argument('--calls', type=int, default=20000)
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """Time each formatter and print microseconds per call as JSON."""
+        calls = options['calls']
+        values = [decimal.Decimal(f'{i * 1234.5678:.2f}') for i in range(1, calls + 1)]
+        timings = {
+            'format_currency': timeit.timeit(lambda: [format_currency(v) for v in values], number=1),
+            'format_currency_many': timeit.timeit(lambda: format_currency_many(values), number=1),
+        }
+        previous = locale.setlocale(locale.LC_ALL)
+        try:
+            timings['setlocale_per_call'] = timeit.timeit(lambda: [setlocale_currency(v) for v in values], number=1)
+        except (locale.Error, ValueError) as err:
+            self.stderr.write(f'Skipping setlocale_per_call, no monetary locale installed: {err}')
+        finally:
+            locale.setlocale(locale.LC_ALL, previous)
+
+        results: dict[str, Any] = {
+            name: {'us_per_call': round(seconds / calls * 1e6, 3)} for name, seconds in timings.items()
+        }
+        if 'setlocale_per_call' in timings:
+            results['speedup'] = round(timings['setlocale_per_call'] / timings['format_currency'], 1)
+        self.stdout.write(json.dumps(results, indent=2))
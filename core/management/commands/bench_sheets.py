@@ -0,0 +1,56 @@
+import json
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+from django.db.models import F
+from django.test.utils import override_settings
+
+from core.benchmarks import measure, rolled_back, synthetic_market_data
+from core.fake_sheets import FakeSheetsService
+from core.models import Coins
+from core.sheets import publish_coin_tab, reset_sheet_snapshot, sync_coin_tab
+from core.tasks import coin_from_data
+
+
+class Command(BaseCommand):
+    help = 'Measure Google Sheets publishing cost against an in-process fake of the Sheets API.'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Add command arguments."""
+        parser.add_argument('--sizes', nargs='+', type=int, default=[250, 5000, 15000])
+        parser.add_argument('--latency', type=float, default=0.2, help='Simulated seconds per API round trip.')
+        parser.add_argument('--churn', type=float, default=0.01, help='Share of coins repriced between syncs.')
+
+    def _run(self, service: FakeSheetsService, publish: Any) -> dict[str, Any]:
+        before = service.stats()
+        with measure() as result:
+            publish(service.spreadsheets())
+        after = service.stats()
+        result['calls'] = after['calls'] - before['calls']
+        result['request_bytes'] = after['request_bytes'] - before['request_bytes']
+        result['simulated_seconds'] = round(after['simulated_seconds'] - before['simulated_seconds'], 4)
+        return result
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """Sync synthetic coins inside rolled-back transactions and print JSON results."""
+        results = []
+        for size in options['sizes']:
+            changed = max(1, int(size * options['churn']))
+            with rolled_back(), override_settings(SPREADSHEET_ID=f'bench-sheets-{size}'):
+                Coins.objects.bulk_create([coin_from_data(data) for data in synthetic_market_data(size, seed=1)])
+
+                service = FakeSheetsService(latency=options['latency'])
+                reset_sheet_snapshot()
+                try:
+                    cold = self._run(service, sync_coin_tab)
+                    Coins.objects.filter(rank__lte=changed).update(current_price=F('current_price') + 1)
+                    churn = self._run(service, sync_coin_tab)
+                    steady = self._run(service, sync_coin_tab)
+                finally:
+                    reset_sheet_snapshot()
+                results.append({'rows': size, 'mode': 'incremental', 'cold': cold, 'churn': churn, 'steady': steady})
+
+                service = FakeSheetsService(latency=options['latency'])
+                results.append({'rows': size, 'mode': 'tabs', 'run': self._run(service, publish_coin_tab)})
+
+        self.stdout.write(json.dumps(results, indent=2))
@@ -0,0 +1,37 @@
+import json
+from typing import Any
+
+from django.core.management.base import BaseCommand, CommandParser
+
+from core.benchmarks import measure, rolled_back, synthetic_market_data
+from core.tasks import store_data, supports_upsert
+
+
+class Command(BaseCommand):
+    help = 'Compare the upsert and read-then-bulk_update paths of store_data.'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        """Add command arguments."""
+        parser.add_argument('--sizes', nargs='+', type=int, default=[100, 1000, 15000])
+
+    def handle(self, *args: Any, **options: Any) -> None:
+        """Run the benchmark inside rolled-back transactions and print JSON results."""
+        paths = {'bulk_update': False}
+        if supports_upsert():
+            paths['upsert'] = True
+
+        results = []
+        for size in options['sizes']:
+            initial = synthetic_market_data(size, seed=1)
+            changed = synthetic_market_data(size, seed=2)
+            for path, upsert in paths.items():
+                with rolled_back():
+                    with measure() as insert:
+                        store_data(initial, upsert=upsert)
+                    with measure() as update:
+                        store_data(changed, upsert=upsert)
+                    with measure() as unchanged:
+                        store_data(changed, upsert=upsert)
+                results.append({'rows': size, 'path': path, 'insert': insert, 'update': update, 'unchanged': unchanged})
+
+        self.stdout.write(json.dumps(results, indent=2))
@@ -0,0 +1,92 @@
+import os
+import time
+from typing import Any, Callable
+
+from celery.signals import task_failure, task_postrun, task_prerun
+from django.db import connection
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# With PROMETHEUS_MULTIPROC_DIR set (before this module is imported), every process writes its samples to
+# files in that directory and /metrics adds them up, so web and worker processes on the host report together.
+
+TASK_DURATION = Histogram(
+    'django_excel_task_duration_seconds',
+    'Celery task run time.',
+    ['task', 'state'],
+    buckets=(0.1, 0.5, 1, 5, 15, 60, 180, 600, 1800, 3600),
+)
+TASK_FAILURES = Counter('django_excel_task_failures', 'Celery task runs that raised.', ['task', 'exception'])
+TASK_QUERIES = Histogram(
+    'django_excel_task_db_queries',
+    'Database queries issued by one Celery task run.',
+    ['task'],
+    buckets=(1, 5, 10, 50, 100, 500, 1000, 5000, 20000),
+)
+COINGECKO_PAGES = Counter('django_excel_coingecko_pages_fetched', 'CoinGecko market pages fetched.', ['vs_currency'])
+COINGECKO_RATE_LIMITED = Counter(
+    'django_excel_coingecko_rate_limited', 'CoinGecko responses reporting a 429.', ['vs_currency']
+)
+SLEEP_SECONDS = Counter('django_excel_sleep_seconds', 'Time spent sleeping between or before requests.', ['reason'])
+# Upserts can't tell created rows from updated ones and count as 'upserted'; snapshots ignore duplicates and
+# count as 'appended'.
+ROWS_STORED = Counter('django_excel_rows_stored', 'Rows handled by the store functions.', ['model', 'outcome'])
+EXPORT_BYTES = Counter('django_excel_export_bytes', 'Bytes of export artifacts produced.', ['format'])
+SHEETS_RANGES = Counter('django_excel_sheets_ranges_written', 'Ranges sent to Google Sheets.')
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """Return every metric in the Prometheus text format and its content type."""
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)  # type: ignore[no-untyped-call]
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+_task_started: dict[str, tuple[float, list[int], Callable[..., Any]]] = {}
+
+
+def _count_queries(counter: list[int]) -> Callable[..., Any]:
+    def wrapper(execute: Callable[..., Any], sql: str, params: Any, many: bool, context: dict[str, Any]) -> Any:
+        counter[0] += 1
+        return execute(sql, params, many, context)
+
+    return wrapper
+
+
+def _on_task_prerun(task_id: str, task: Any, **kwargs: Any) -> None:
+    counter = [0]
+    wrapper = _count_queries(counter)
+    connection.execute_wrappers.append(wrapper)
+    _task_started[task_id] = (time.perf_counter(), counter, wrapper)
+
+
+def _on_task_postrun(task_id: str, task: Any, state: str = 'UNKNOWN', **kwargs: Any) -> None:
+    started = _task_started.pop(task_id, None)
+    if started is None:
+        return
+    began, counter, wrapper = started
+    if wrapper in connection.execute_wrappers:
+        connection.execute_wrappers.remove(wrapper)
+    TASK_DURATION.labels(task.name, (state or 'UNKNOWN').lower()).observe(time.perf_counter() - began)
+    TASK_QUERIES.labels(task.name).observe(counter[0])
+
+
+def _on_task_failure(sender: Any = None, exception: Any = None, **kwargs: Any) -> None:
+    if sender is not None:
+        TASK_FAILURES.labels(sender.name, type(exception).__name__).inc()
+
+
+def connect_signals() -> None:
+    """Feed the task metrics from Celery's task signals; connecting again is a no-op."""
+    task_prerun.connect(_on_task_prerun, weak=False, dispatch_uid='core.metrics.task_prerun')
+    task_postrun.connect(_on_task_postrun, weak=False, dispatch_uid='core.metrics.task_postrun')
+    task_failure.connect(_on_task_failure, weak=False, dispatch_uid='core.metrics.task_failure')
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:22
+
+from django.db import migrations, models
+
+
+def dedupe_coins(apps, schema_editor):
+    """Keep only the most recently inserted row for every (name, symbol) pair."""
+    coins = apps.get_model("core", "Coins")
+    duplicates = (
+        coins.objects.values("name", "symbol")
+        .annotate(keep_id=models.Max("id"), rows=models.Count("id"))
+        .filter(rows__gt=1)
+    )
+    for duplicate in duplicates:
+        coins.objects.filter(name=duplicate["name"], symbol=duplicate["symbol"]).exclude(
+            id=duplicate["keep_id"]
+        ).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_coins, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="coins",
+            constraint=models.UniqueConstraint(fields=("name", "symbol"), name="unique_coin_name_symbol"),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0002_coins_unique_name_symbol"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="fullcoin",
+            name="content_hash",
+            field=models.CharField(blank=True, editable=False, max_length=32, null=True),
+        ),
+    ]
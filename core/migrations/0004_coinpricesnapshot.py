@@ -0,0 +1,54 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:27
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0003_fullcoin_content_hash"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CoinPriceSnapshot",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("captured_at", models.DateTimeField()),
+                (
+                    "current_price",
+                    models.DecimalField(decimal_places=8, max_digits=24, null=True),
+                ),
+                ("market_cap", models.BigIntegerField(null=True)),
+                ("total_volume", models.BigIntegerField(null=True)),
+                (
+                    "coin",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="price_snapshots",
+                        to="core.fullcoin",
+                    ),
+                ),
+            ],
+            options={
+                "indexes": [models.Index(fields=["captured_at"], name="coin_snapshot_captured_idx")],
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("coin", "captured_at"),
+                        name="unique_coin_price_snapshot",
+                    )
+                ],
+            },
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:28
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0004_coinpricesnapshot"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="coins",
+            index=models.Index(fields=["rank", "id"], name="coins_rank_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="coins",
+            index=models.Index(fields=["name", "id"], name="coins_name_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="coins",
+            index=models.Index(fields=["current_price", "id"], name="coins_price_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="coins",
+            index=models.Index(fields=["market_cap", "id"], name="coins_market_cap_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="coins",
+            index=models.Index(
+                django.db.models.functions.text.Upper("name"),
+                name="coins_name_upper_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="coins",
+            index=models.Index(
+                django.db.models.functions.text.Upper("symbol"),
+                name="coins_symbol_upper_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,58 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0005_coins_keyset_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="CoinPrice",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("vs_currency", models.CharField(max_length=10)),
+                (
+                    "current_price",
+                    models.DecimalField(decimal_places=8, max_digits=24, null=True),
+                ),
+                ("market_cap", models.BigIntegerField(null=True)),
+                ("total_volume", models.BigIntegerField(null=True)),
+                (
+                    "price_change_24h",
+                    models.DecimalField(decimal_places=8, max_digits=24, null=True),
+                ),
+                ("last_updated", models.DateTimeField(null=True)),
+                (
+                    "coin",
+                    models.ForeignKey(
+                        db_constraint=False,
+                        db_index=False,
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="prices",
+                        to="core.fullcoin",
+                    ),
+                ),
+            ],
+            options={
+                "constraints": [
+                    models.UniqueConstraint(
+                        fields=("coin", "vs_currency"),
+                        name="unique_coin_price_currency",
+                    )
+                ],
+            },
+        ),
+    ]
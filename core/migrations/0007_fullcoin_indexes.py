@@ -0,0 +1,52 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:48
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0006_coinprice"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="fullcoin",
+            index=models.Index(
+                condition=models.Q(("market_cap_rank__isnull", False)),
+                fields=["market_cap_rank", "coin_id"],
+                name="fullcoin_ranked_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="fullcoin",
+            index=models.Index(fields=["name", "coin_id"], name="fullcoin_name_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="fullcoin",
+            index=models.Index(fields=["symbol", "coin_id"], name="fullcoin_symbol_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="fullcoin",
+            index=models.Index(fields=["current_price", "coin_id"], name="fullcoin_price_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="fullcoin",
+            index=models.Index(fields=["market_cap", "coin_id"], name="fullcoin_market_cap_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="fullcoin",
+            index=models.Index(
+                django.db.models.functions.text.Upper("name"),
+                name="fullcoin_name_upper_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="fullcoin",
+            index=models.Index(
+                django.db.models.functions.text.Upper("symbol"),
+                name="fullcoin_symbol_upper_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.1.6 on 2026-10-18 12:28
+
+from django.db import migrations, models
+
+import core.pagination
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("core", "0007_fullcoin_indexes"),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name="coins",
+            name="coins_name_upper_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="coins",
+            name="coins_symbol_upper_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="fullcoin",
+            name="fullcoin_name_upper_idx",
+        ),
+        migrations.RemoveIndex(
+            model_name="fullcoin",
+            name="fullcoin_symbol_upper_idx",
+        ),
+        migrations.AddIndex(
+            model_name="coins",
+            index=models.Index(core.pagination.SearchKey("name"), name="coins_name_upper_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="coins",
+            index=models.Index(core.pagination.SearchKey("symbol"), name="coins_symbol_upper_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="fullcoin",
+            index=models.Index(core.pagination.SearchKey("name"), name="fullcoin_name_upper_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="fullcoin",
+            index=models.Index(core.pagination.SearchKey("symbol"), name="fullcoin_symbol_upper_idx"),
+        ),
+    ]
@@ -1,4 +1,9 @@
+from datetime import datetime, timedelta
+
 from django.db import models
+from django.utils import timezone
+
+from core.pagination import SearchKey
 
 
 class Coins(models.Model):
@@ -13,6 +18,19 @@ class Coins(models.Model):
 
     class Meta:
         verbose_name_plural = 'Coins'
+        constraints = [
+            models.UniqueConstraint(fields=['name', 'symbol'], name='unique_coin_name_symbol'),
+        ]
+        indexes = [
+            # Keyset pagination seeks on (sort column, id) for every sortable column of the index view.
+            models.Index(fields=['rank', 'id'], name='coins_rank_id_idx'),
+            models.Index(fields=['name', 'id'], name='coins_name_id_idx'),
+            models.Index(fields=['current_price', 'id'], name='coins_price_id_idx'),
+            models.Index(fields=['market_cap', 'id'], name='coins_market_cap_id_idx'),
+            # Case-insensitive prefix search is a range scan on UPPER(column), byte-wise on PostgreSQL.
+            models.Index(SearchKey('name'), name='coins_name_upper_idx'),
+            models.Index(SearchKey('symbol'), name='coins_symbol_upper_idx'),
+        ]
 
     def __str__(self) -> str:
         """Return model string representation."""
@@ -45,6 +63,86 @@ class FullCoin(models.Model):
     atl_change_percentage = models.DecimalField(max_digits=20, decimal_places=5, null=True, blank=True)
     atl_date = models.DateTimeField(null=True, blank=True)
     last_updated = models.DateTimeField(null=True, blank=True)
+    content_hash = models.CharField(max_length=32, null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            # Keyset pages skip NULL sort values, so the rank index only needs ranked coins; a good share of
+            # the full market is unranked and stays out of it.
+            models.Index(
+                fields=['market_cap_rank', 'coin_id'],
+                name='fullcoin_ranked_idx',
+                condition=models.Q(market_cap_rank__isnull=False),
+            ),
+            # The other sortable columns of the full-coins API; name and symbol also serve admin filters.
+            models.Index(fields=['name', 'coin_id'], name='fullcoin_name_id_idx'),
+            models.Index(fields=['symbol', 'coin_id'], name='fullcoin_symbol_id_idx'),
+            models.Index(fields=['current_price', 'coin_id'], name='fullcoin_price_id_idx'),
+            models.Index(fields=['market_cap', 'coin_id'], name='fullcoin_market_cap_id_idx'),
+            models.Index(SearchKey('name'), name='fullcoin_name_upper_idx'),
+            models.Index(SearchKey('symbol'), name='fullcoin_symbol_upper_idx'),
+        ]
+
+    def __str__(self) -> str:
+        """Return model string representation."""
+        return f"{self.name} ({(self.symbol or '').upper()})"
+
+
+class CoinPriceSnapshotQuerySet(models.QuerySet['CoinPriceSnapshot']):
+    def for_coin_since(self, coin_id: str, hours: int) -> 'CoinPriceSnapshotQuerySet':
+        """Return a coin's snapshots from the last ``hours`` hours, oldest first."""
+        since = timezone.now() - timedelta(hours=hours)
+        return self.filter(coin_id=coin_id, captured_at__gte=since).order_by('captured_at')
+
+    def captured_before(self, cutoff: datetime) -> 'CoinPriceSnapshotQuerySet':
+        """Return snapshots older than ``cutoff``."""
+        return self.filter(captured_at__lt=cutoff)
+
+
+class CoinPriceSnapshot(models.Model):
+    # No FK constraint so history can be appended before (or after) the FullCoin row is written.
+    coin = models.ForeignKey(
+        FullCoin, on_delete=models.CASCADE, db_constraint=False, db_index=False, related_name='price_snapshots'
+    )
+    captured_at = models.DateTimeField()
+    current_price = models.DecimalField(max_digits=24, decimal_places=8, null=True)
+    market_cap = models.BigIntegerField(null=True)
+    total_volume = models.BigIntegerField(null=True)
 
-    def __str__(self):
-        return f"{self.name} ({self.symbol.upper()})"
+    objects = CoinPriceSnapshotQuerySet.as_manager()
+
+    class Meta:
+        constraints = [
+            # Also serves "coin X over the last N hours" lookups: coin_id = X AND captured_at >= T.
+            models.UniqueConstraint(fields=['coin', 'captured_at'], name='unique_coin_price_snapshot'),
+        ]
+        indexes = [
+            models.Index(fields=['captured_at'], name='coin_snapshot_captured_idx'),
+        ]
+
+    def __str__(self) -> str:
+        """Return model string representation."""
+        return f'{self.coin_id} @ {self.captured_at.isoformat()}'
+
+
+class CoinPrice(models.Model):
+    # No FK constraint: a currency's pages can land before the coin's FullCoin row exists.
+    coin = models.ForeignKey(
+        FullCoin, on_delete=models.CASCADE, db_constraint=False, db_index=False, related_name='prices'
+    )
+    vs_currency = models.CharField(max_length=10)
+    current_price = models.DecimalField(max_digits=24, decimal_places=8, null=True)
+    market_cap = models.BigIntegerField(null=True)
+    total_volume = models.BigIntegerField(null=True)
+    price_change_24h = models.DecimalField(max_digits=24, decimal_places=8, null=True)
+    last_updated = models.DateTimeField(null=True)
+
+    class Meta:
+        constraints = [
+            # Also serves "all prices of coin X": coin_id = X.
+            models.UniqueConstraint(fields=['coin', 'vs_currency'], name='unique_coin_price_currency'),
+        ]
+
+    def __str__(self) -> str:
+        """Return model string representation."""
+        return f'{self.coin_id} in {self.vs_currency.upper()}'
@@ -0,0 +1,121 @@
+from dataclasses import dataclass
+from typing import Any, Callable, Optional
+
+from django.core import signing
+from django.db.models import Q, QuerySet, Value
+from django.db.models.functions import Upper
+
+CURSOR_SALT = 'core.pagination.cursor'
+
+
+@dataclass
+class KeysetPage:
+    """One page of a keyset-paginated queryset."""
+
+    object_list: list[Any]
+    next_cursor: Optional[str]
+    sort: str
+
+
+def parse_sort(sort: Optional[str], allowed: tuple[str, ...], default: str) -> tuple[str, bool]:
+    """Return ``(field, descending)`` for a ``field``/``-field`` sort parameter, falling back to ``default``."""
+    sort = sort or default
+    field = sort.removeprefix('-')
+    if field not in allowed:
+        return parse_sort(default, allowed, default)
+    return field, sort.startswith('-')
+
+
+class SearchKey(Upper):  # pylint: disable=abstract-method
+    """
+    ``UPPER(expression)``, compared code point by code point: the key of prefix searches and their indexes.
+
+    PostgreSQL compares it under the "C" collation, so a ``>=``/``<`` range over it is an exact prefix
+    match whatever the database's collation; SQLite's default BINARY collation already behaves so.
+    """
+
+    def as_postgresql(self, compiler: Any, connection: Any, **extra_context: Any) -> tuple[str, Any]:
+        """Render ``(UPPER(expression) COLLATE "C")``."""
+        sql, params = self.as_sql(compiler, connection, **extra_context)
+        return f'({sql} COLLATE "C")', params
+
+
+# Sorts after every character a name can realistically contain, so ``prefix + MAX_CHAR`` caps the range.
+MAX_CHAR = chr(0x10FFFF)
+
+
+def prefix_search(queryset: QuerySet[Any], term: str, fields: tuple[str, ...]) -> QuerySet[Any]:
+    """
+    Filter to rows where any of ``fields`` starts with ``term``, ignoring case as the database does.
+
+    The prefix is expressed as a range on ``SearchKey(field)`` so it can use an expression index on
+    every backend instead of a LIKE that needs pattern operator classes. The bounds are folded by the
+    database's own ``UPPER`` too, which on SQLite only changes ASCII letters.
+    """
+    if not term:
+        return queryset
+    lower_bound, upper_bound = SearchKey(Value(term)), SearchKey(Value(term + MAX_CHAR))
+    condition = Q()
+    for field in fields:
+        alias = f'{field}_key'
+        queryset = queryset.alias(**{alias: SearchKey(field)})
+        condition |= Q(**{f'{alias}__gte': lower_bound, f'{alias}__lt': upper_bound})
+    return queryset.filter(condition)
+
+
+def encode_cursor(sort: str, value: Any, row_pk: Any) -> str:
+    """Return an opaque, signed cursor pointing just past the row with this sort value and pk."""
+    return signing.dumps([sort, None if value is None else str(value), row_pk], salt=CURSOR_SALT, compress=True)
+
+
+def decode_cursor(cursor: str, sort: str) -> Optional[tuple[Optional[str], Any]]:
+    """Return ``(value, pk)`` from a cursor, or None if it is invalid or was issued for another sort."""
+    try:
+        cursor_sort, value, row_pk = signing.loads(cursor, salt=CURSOR_SALT)
+    except (signing.BadSignature, TypeError, ValueError):
+        return None
+    if cursor_sort != sort:
+        return None
+    return value, row_pk
+
+
+def keyset_paginate(
+    queryset: QuerySet[Any],
+    field: str,
+    descending: bool,
+    cursor: Optional[str],
+    page_size: int,
+    *,
+    row_key: Optional[Callable[[Any], tuple[Any, Any]]] = None,
+) -> KeysetPage:
+    """
+    Return the page after ``cursor`` ordered by ``field`` with the primary key as tie-breaker.
+
+    Rows whose sort column is NULL come last in either direction, in a second phase ordered by the
+    primary key alone: a cursor with a NULL value points into that phase. Keeping the phases apart
+    lets the first one walk the ``(field, pk)`` index forwards or backwards. ``row_key`` returns
+    ``(sort value, pk)`` for rows that aren't model instances, e.g. ``values_list`` tuples.
+    """
+    sort = f'-{field}' if descending else field
+    after = 'lt' if descending else 'gt'
+    pk_ordering = '-pk' if descending else 'pk'
+    nulls = queryset.filter(**{f'{field}__isnull': True}).order_by(pk_ordering)
+    position = decode_cursor(cursor, sort) if cursor else None
+
+    if position is not None and position[0] is None:
+        rows = list(nulls.filter(**{f'pk__{after}': position[1]})[: page_size + 1])
+    else:
+        values = queryset.filter(**{f'{field}__isnull': False})
+        if position is not None:
+            value, row_pk = position
+            values = values.filter(Q(**{f'{field}__{after}': value}) | Q(**{field: value, f'pk__{after}': row_pk}))
+        rows = list(values.order_by(f'-{field}' if descending else field, pk_ordering)[: page_size + 1])
+        if len(rows) <= page_size:
+            rows += nulls[: page_size + 1 - len(rows)]
+
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        value, row_pk = row_key(rows[-1]) if row_key else (getattr(rows[-1], field), rows[-1].pk)
+        next_cursor = encode_cursor(sort, value, row_pk)
+    return KeysetPage(object_list=rows, next_cursor=next_cursor, sort=sort)
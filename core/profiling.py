@@ -0,0 +1,139 @@
+import functools
+import logging
+import re
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, Optional
+
+from django.conf import settings
+from django.db import connection
+from django.http import HttpRequest, HttpResponse
+
+logger = logging.getLogger(__name__)
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\((?:\s*(?:\?|%s)\s*,)+\s*(?:\?|%s)\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+
+
+def fingerprint(sql: str) -> str:
+    """Return ``sql`` with literals and IN-lists collapsed, so repeats of one statement shape compare equal."""
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _PLACEHOLDER_LIST.sub('(...)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+class QueryProfile:
+    """Database execute wrapper that records every statement run on this thread's connection."""
+
+    def __init__(self, label: str, slow_threshold: Optional[float] = None) -> None:
+        """Start an empty profile; ``slow_threshold`` is in seconds."""
+        self.label = label
+        self.slow_threshold = settings.SLOW_QUERY_THRESHOLD if slow_threshold is None else slow_threshold
+        self.count = 0
+        self.total_time = 0.0
+        self.fingerprints: Counter[str] = Counter()
+        self.slow: list[tuple[float, str]] = []
+
+    def __call__(  # pylint: disable=too-many-positional-arguments
+        self, execute: Callable[..., Any], sql: str, params: Any, many: bool, context: dict[str, Any]
+    ) -> Any:
+        """Run the statement and record its duration and shape."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.count += 1
+            self.total_time += duration
+            self.fingerprints[fingerprint(sql)] += 1
+            if duration >= self.slow_threshold:
+                self.slow.append((duration, sql))
+
+    def duplicates(self) -> dict[str, int]:
+        """Return statement shapes that ran more than once, most repeated first."""
+        return {sql: count for sql, count in self.fingerprints.most_common() if count > 1}
+
+    def summary(self) -> dict[str, Any]:
+        """Return the profile as a loggable dict."""
+        return {
+            'label': self.label,
+            'queries': self.count,
+            'db_ms': round(self.total_time * 1000, 2),
+            'duplicated': sum(count - 1 for count in self.duplicates().values()),
+            'slow': len(self.slow),
+        }
+
+    def log(self) -> None:
+        """Log the summary, each duplicated shape and each slow statement."""
+        logger.info('Query profile: %s', self.summary())
+        for sql, count in self.duplicates().items():
+            logger.info('Duplicated %sx in %s: %s', count, self.label, sql[:500])
+        for duration, sql in self.slow:
+            logger.warning('Slow query (%.1f ms) in %s: %s', duration * 1000, self.label, sql[:1000])
+
+
+@contextmanager
+def profile_queries(label: str, slow_threshold: Optional[float] = None) -> Iterator[QueryProfile]:
+    """Record the queries run on the default connection inside the block."""
+    profile = QueryProfile(label, slow_threshold)
+    with connection.execute_wrapper(profile):
+        yield profile
+
+
+def profile_task(func: Callable[..., Any]) -> Callable[..., Any]:
+    """Log a query profile for every run of a task while QUERY_PROFILING is on."""
+
+    @functools.wraps(func)
+    def wrapper(*args: Any, **kwargs: Any) -> Any:
+        if not settings.QUERY_PROFILING:
+            return func(*args, **kwargs)
+        with profile_queries(f'task {func.__module__}.{func.__name__}') as profile:
+            try:
+                return func(*args, **kwargs)
+            finally:
+                profile.log()
+
+    return wrapper
+
+
+class QueryProfilerMiddleware:
+    """Log a query profile for every request while QUERY_PROFILING is on."""
+
+    def __init__(self, get_response: Callable[[HttpRequest], HttpResponse]) -> None:
+        """Store the next handler."""
+        self.get_response = get_response
+
+    def __call__(self, request: HttpRequest) -> HttpResponse:
+        """Profile the rest of the request."""
+        if not settings.QUERY_PROFILING:
+            return self.get_response(request)
+        with profile_queries(f'{request.method} {request.path}') as profile:
+            response = self.get_response(request)
+        # Streaming responses run their queries after this point and aren't covered.
+        profile.log()
+        return response
+
+
+@contextmanager
+def query_budget(max_queries: int, max_duplicated: Optional[int] = None) -> Iterator[QueryProfile]:
+    """
+    Fail with the profile's details if the block runs more than ``max_queries`` queries.
+
+    ``max_duplicated`` additionally caps how many statements may repeat an earlier statement's
+    shape, which is how N+1 loops show up.
+    """
+    with profile_queries('query budget', slow_threshold=float('inf')) as profile:
+        yield profile
+    problems = []
+    if profile.count > max_queries:
+        problems.append(f'{profile.count} queries, budget {max_queries}')
+    duplicated = profile.summary()['duplicated']
+    if max_duplicated is not None and duplicated > max_duplicated:
+        problems.append(f'{duplicated} duplicated queries, budget {max_duplicated}')
+    if problems:
+        details = '\n'.join(f'  {count}x {sql}' for sql, count in profile.fingerprints.most_common())
+        raise AssertionError(f"Query budget exceeded: {'; '.join(problems)}\n{details}")
@@ -0,0 +1,275 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from itertools import islice
+from typing import Any, Optional
+from urllib.parse import quote
+
+import requests
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from google.oauth2 import service_account
+from googleapiclient.discovery import build
+from openpyxl.utils import get_column_letter
+
+from core.formatting import format_currency_many
+from core.models import Coins
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _CachedService:
+    pid: int
+    key_url: str
+    key_fingerprint: str
+    service: Any
+
+
+_cached: Optional[_CachedService] = None
+_cached_lock = threading.Lock()
+
+
+def fetch_service_account_info(key_url: str) -> dict[str, Any]:
+    """Download and parse the service-account key, keeping it in memory only."""
+    response = requests.get(key_url, timeout=settings.GOOGLE_API_KEY_TIMEOUT)
+    response.raise_for_status()
+    info: dict[str, Any] = response.json()
+    return info
+
+
+def _build_service(info: dict[str, Any]) -> Any:
+    """Build a Sheets v4 client from the discovery document bundled with google-api-python-client."""
+    # google-auth ships without annotations on this factory.
+    creds = service_account.Credentials.from_service_account_info(  # type: ignore[no-untyped-call]
+        info, scopes=settings.GOOGLE_API_SCOPE
+    )
+    return build('sheets', 'v4', credentials=creds, static_discovery=True, cache_discovery=False)
+
+
+def get_sheets_service() -> Any:
+    """
+    Return this worker process' Sheets client, building it on first use or when the key changes.
+
+    The credentials object is reused across task runs, so its access token is only refreshed
+    when it expires rather than on every run.
+    """
+    global _cached  # pylint: disable=global-statement
+    key_url = settings.GOOGLE_API_SERVICE_KEY_URL
+    pid = os.getpid()
+    with _cached_lock:
+        if _cached is not None and _cached.pid == pid and _cached.key_url == key_url:
+            return _cached.service
+
+        info = fetch_service_account_info(key_url)
+        fingerprint = hashlib.sha256(json.dumps(info, sort_keys=True).encode()).hexdigest()
+        if _cached is not None and _cached.pid == pid and _cached.key_fingerprint == fingerprint:
+            _cached.key_url = key_url
+            return _cached.service
+
+        logger.info("Building Sheets client for service account %s", info.get('client_email', ''))
+        _cached = _CachedService(pid, key_url, fingerprint, _build_service(info))
+        return _cached.service
+
+
+def reset_sheets_service() -> None:
+    """Forget the cached client so the next call re-reads the key, e.g. after it was rotated."""
+    global _cached  # pylint: disable=global-statement
+    with _cached_lock:
+        _cached = None
+
+
+SHEET_HEADER = ['Name', 'Symbol', 'Rank', 'Current price', 'Price change', 'Market cap', 'Total supply']
+TAB_DATETIME_FORMAT = '%a %b %d %Y %Hh%Mm'
+TAB_COLOR = {'red': 0.968627451, 'green': 0.576470588, 'blue': 0.101960784}
+
+
+def coin_sheet_rows() -> list[list[Any]]:
+    """Return the header and one formatted row per coin, in rank order."""
+    rows: list[list[Any]] = [list(SHEET_HEADER)]
+    coins = list(
+        Coins.objects.order_by('rank').values_list(
+            'name', 'symbol', 'rank', 'current_price', 'price_change_within_24_hours', 'market_cap', 'total_supply'
+        )
+    )
+    prices = iter(format_currency_many(value for coin in coins for value in coin[3:6]))
+    for name, symbol, rank, *_, total_supply in coins:
+        rows.append([name, f'{symbol}'.upper(), rank, *islice(prices, 3), str(total_supply)])
+    return rows
+
+
+def expired_tab_ids(sheets: list[dict[str, Any]]) -> list[int]:
+    """Return the ids of timestamped tabs older than SPREADSHEET_TAB_EXPIRY seconds."""
+    now = datetime.strptime(timezone.now().strftime(TAB_DATETIME_FORMAT), TAB_DATETIME_FORMAT)
+    expired = []
+    for csheet in sheets:
+        properties = csheet.get('properties', {})
+        date_segment_of_the_title = ' '.join(properties.get('title', '').split(' ')[0:5]).strip()
+        try:
+            parsed_datetime = datetime.strptime(date_segment_of_the_title, TAB_DATETIME_FORMAT)
+        except ValueError:
+            continue
+        if (now - parsed_datetime).total_seconds() > settings.SPREADSHEET_TAB_EXPIRY:
+            expired.append(properties.get('sheetId', 0))
+    return expired
+
+
+def publish_coin_tab(sheet: Any) -> int:
+    """
+    Publish all coins to a brand-new timestamped tab, deleting expired tabs in the same batchUpdate.
+
+    Returns how many ranges were written, which is always one.
+    """
+    csheets = sheet.get(spreadsheetId=settings.SPREADSHEET_ID).execute().get('sheets', [])
+    rows = coin_sheet_rows()
+    new_sheet_title = f'{timezone.now().strftime(TAB_DATETIME_FORMAT)} Coin data'
+    # The new tab goes first: a spreadsheet must keep a sheet, so deleting every expired tab before
+    # adding one would get the whole batch rejected when they are the only tabs left.
+    requests_body: list[dict[str, Any]] = [
+        {
+            'addSheet': {
+                'properties': {
+                    'title': new_sheet_title,
+                    'tabColor': TAB_COLOR,
+                    'gridProperties': {'rowCount': len(rows), 'columnCount': len(SHEET_HEADER)},
+                }
+            }
+        }
+    ]
+    requests_body += [{'deleteSheet': {'sheetId': sheet_id}} for sheet_id in expired_tab_ids(csheets)]
+    sheet.batchUpdate(spreadsheetId=settings.SPREADSHEET_ID, body={'requests': requests_body}).execute()
+    sheet.values().append(
+        spreadsheetId=settings.SPREADSHEET_ID,
+        range=f"'{new_sheet_title}'!A1:G1",
+        valueInputOption='USER_ENTERED',
+        body={'values': rows},
+    ).execute()
+    return 1
+
+
+def _snapshot_key() -> str:
+    return f'sheets-snapshot:{settings.SPREADSHEET_ID}:{quote(settings.SPREADSHEET_LIVE_TAB_TITLE)}'
+
+
+def reset_sheet_snapshot() -> None:
+    """Forget the last published snapshot so the next sync rewrites the live tab in full."""
+    cache.delete(_snapshot_key())
+
+
+def diff_ranges(title: str, old_rows: list[list[Any]], new_rows: list[list[Any]]) -> list[dict[str, Any]]:
+    """
+    Return ``values.batchUpdate`` data covering every cell that differs between two snapshots.
+
+    Each row's changed cells are split into runs of adjacent columns, and identical runs on
+    consecutive rows are merged into one rectangular range. Rows that disappeared are blanked.
+    """
+    width = len(SHEET_HEADER)
+    blank = [''] * width
+    blocks: list[dict[str, Any]] = []
+    open_blocks: dict[tuple[int, int], dict[str, Any]] = {}
+    for row_index in range(max(len(old_rows), len(new_rows))):
+        new = new_rows[row_index] if row_index < len(new_rows) else blank
+        old = old_rows[row_index] if row_index < len(old_rows) else None
+        runs: list[list[int]] = []
+        for column in range(width):
+            if old is not None and column < len(old) and old[column] == new[column]:
+                continue
+            if runs and runs[-1][1] == column - 1:
+                runs[-1][1] = column
+            else:
+                runs.append([column, column])
+
+        still_open = {}
+        for start, end in runs:
+            block = open_blocks.get((start, end))
+            if block is None or block['last_row'] != row_index - 1:
+                block = {'start': start, 'end': end, 'first_row': row_index, 'values': []}
+                blocks.append(block)
+            block['last_row'] = row_index
+            block['values'].append(new[slice(start, end + 1)])
+            still_open[(start, end)] = block
+        open_blocks = still_open
+
+    return [
+        {
+            'range': f"'{title}'!{get_column_letter(block['start'] + 1)}{block['first_row'] + 1}:"
+            f"{get_column_letter(block['end'] + 1)}{block['last_row'] + 1}",
+            'values': block['values'],
+        }
+        for block in blocks
+    ]
+
+
+def _prepare_live_tab(sheet: Any, row_count: int, clear: bool) -> dict[str, Any]:
+    """
+    Make sure the live tab exists and is tall enough, folding all structural changes into one batchUpdate.
+
+    Expired timestamped tabs are deleted in the same request, and ``clear`` blanks an existing live
+    tab whose contents are no longer known.
+    """
+    title = settings.SPREADSHEET_LIVE_TAB_TITLE
+    csheets = sheet.get(spreadsheetId=settings.SPREADSHEET_ID).execute().get('sheets', [])
+    requests_body: list[dict[str, Any]] = []
+    live = next((s['properties'] for s in csheets if s.get('properties', {}).get('title') == title), None)
+    if live is None:
+        live = {
+            'sheetId': settings.SPREADSHEET_LIVE_TAB_ID,
+            'title': title,
+            'tabColor': TAB_COLOR,
+            'gridProperties': {'rowCount': row_count, 'columnCount': len(SHEET_HEADER)},
+        }
+        requests_body.append({'addSheet': {'properties': live}})
+    else:
+        if live.get('gridProperties', {}).get('rowCount', 0) < row_count:
+            live['gridProperties'] = {**live.get('gridProperties', {}), 'rowCount': row_count}
+            requests_body.append(
+                {
+                    'updateSheetProperties': {
+                        'properties': {'sheetId': live['sheetId'], 'gridProperties': {'rowCount': row_count}},
+                        'fields': 'gridProperties.rowCount',
+                    }
+                }
+            )
+        if clear:
+            requests_body.append({'updateCells': {'range': {'sheetId': live['sheetId']}, 'fields': 'userEnteredValue'}})
+    # Deletes go last so the live tab already exists and the spreadsheet is never left without a sheet.
+    requests_body += [{'deleteSheet': {'sheetId': sheet_id}} for sheet_id in expired_tab_ids(csheets)]
+    if requests_body:
+        sheet.batchUpdate(spreadsheetId=settings.SPREADSHEET_ID, body={'requests': requests_body}).execute()
+    return {'sheet_id': live['sheetId'], 'row_count': live['gridProperties']['rowCount'], 'rows': []}
+
+
+def sync_coin_tab(sheet: Any) -> int:
+    """
+    Bring the live tab up to date by sending only cells that changed since the last sync.
+
+    The last published rows are kept in the Django cache. Without them (first run, cache flush,
+    failed write) the tab metadata is read, the tab is created or resized, and every cell is sent.
+    Returns how many ranges were written.
+    """
+    rows = coin_sheet_rows()
+    state = cache.get(_snapshot_key())
+    if state is None:
+        state = _prepare_live_tab(sheet, len(rows), clear=True)
+    elif state['row_count'] < len(rows):
+        state = {**_prepare_live_tab(sheet, len(rows), clear=False), 'rows': state['rows']}
+
+    data = diff_ranges(settings.SPREADSHEET_LIVE_TAB_TITLE, state['rows'], rows)
+    if data:
+        try:
+            sheet.values().batchUpdate(
+                spreadsheetId=settings.SPREADSHEET_ID,
+                body={'valueInputOption': 'USER_ENTERED', 'data': data},
+            ).execute()
+        except Exception:
+            reset_sheet_snapshot()
+            raise
+    state['rows'] = rows
+    cache.set(_snapshot_key(), state, timeout=None)
+    logger.info("Synced %s changed ranges to '%s'", len(data), settings.SPREADSHEET_LIVE_TAB_TITLE)
+    return len(data)
@@ -1,196 +1,379 @@
+import abc
+import hashlib
+import json
 import logging
-import time
-from datetime import datetime
-from io import BytesIO
-from typing import Any, Generator, Optional
+import queue
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Any, Optional, Sequence
 
-import requests
 from celery import shared_task
-from decouple import config
 from django.conf import settings
-from django.core.mail import EmailMessage
+from django.core.cache import cache
+from django.core.mail import EmailMessage, get_connection
+from django.db import connection, transaction
 from django.utils import timezone
-from google.oauth2 import service_account
-from googleapiclient.discovery import build
-from openpyxl import Workbook
-from openpyxl.styles import Alignment, Font, Protection
-
-from core.models import Coins, FullCoin
-from core.templatetags.custom_tags import currency
+from google.auth.exceptions import RefreshError
+
+from core import metrics
+from core.coingecko import get_client
+from core.exporters import (
+    export_download_url,
+    publish_coins_export,
+    purge_export_artifacts,
+)
+from core.generation import COINS, FULL_COINS, PRICES, bump_data_generation
+from core.locks import single_flight, single_flight_task
+from core.models import CoinPrice, CoinPriceSnapshot, Coins, FullCoin
+from core.profiling import profile_task
+from core.sheets import (
+    get_sheets_service,
+    publish_coin_tab,
+    reset_sheets_service,
+    sync_coin_tab,
+)
 
 logger = logging.getLogger(__name__)
 
+# ``(vs_currency, page, coins)``; ``coins`` is None once that currency's stream has ended.
+MarketPage = tuple[str, int, Optional[list[dict[str, Any]]]]
+
+
+COINS_UPDATE_FIELDS = [
+    'image_url',
+    'current_price',
+    'price_change_within_24_hours',
+    'rank',
+    'market_cap',
+    'total_supply',
+]
+
+
+def coin_from_data(data: dict[str, Any]) -> Coins:
+    """Build an unsaved Coins row from a CoinGecko market dict."""
+    return Coins(
+        name=data['name'],
+        symbol=data['symbol'],
+        image_url=data['image'],
+        current_price=data['current_price'],
+        price_change_within_24_hours=data['price_change_24h'],
+        rank=data['market_cap_rank'],
+        market_cap=data['market_cap'],
+        total_supply=data['total_supply'],
+    )
 
-@shared_task
-def get_coins_data_from_coingecko_and_store() -> None:
-    """Fetch data from coingecko api and store."""
-    market_currency_order = 'markets?vs_currency=ngn&order=market_cap_desc&'
-    per_page = 'per_page=250&page=1&sparkline=false'
-    final_url = f'{settings.BASE_API_URL}{market_currency_order}{per_page}'
 
-    coin_data = requests.get(final_url).json()
+def store_coins(data_list: list[dict[str, Any]], upsert: Optional[bool] = None) -> None:
+    """Insert or update a page of coins, keyed on (name, symbol), in one transaction."""
+    coins = {(data['name'], data['symbol']): coin_from_data(data) for data in data_list}
+    if not coins:
+        return
+    if upsert is None:
+        upsert = supports_upsert()
+
+    with transaction.atomic():
+        if upsert:
+            Coins.objects.bulk_create(
+                list(coins.values()),
+                update_conflicts=True,
+                unique_fields=['name', 'symbol'],
+                update_fields=COINS_UPDATE_FIELDS,
+            )
+            metrics.ROWS_STORED.labels('coins', 'upserted').inc(len(coins))
+            return
 
-    for data in coin_data:
-        coin, _ = Coins.objects.get_or_create(name=data['name'], symbol=data['symbol'])
-        coin.image_url = data['image']
-        coin.current_price = data['current_price']
-        coin.price_change_within_24_hours = data['price_change_24h']
-        coin.rank = data['market_cap_rank']
-        coin.market_cap = data['market_cap']
-        coin.total_supply = data['total_supply']
-        coin.save()
+        existing_coins = {
+            (coin.name, coin.symbol): coin
+            for coin in Coins.objects.filter(
+                name__in={name for name, _ in coins}, symbol__in={symbol for _, symbol in coins}
+            )
+        }
+        coins_to_update = []
+        for key, coin in coins.items():
+            if key in existing_coins:
+                coin.pk = existing_coins[key].pk
+                coins_to_update.append(coin)
+        if coins_to_update:
+            Coins.objects.bulk_update(coins_to_update, fields=COINS_UPDATE_FIELDS)
+        Coins.objects.bulk_create([coin for key, coin in coins.items() if key not in existing_coins])
+    metrics.ROWS_STORED.labels('coins', 'updated').inc(len(coins_to_update))
+    metrics.ROWS_STORED.labels('coins', 'created').inc(len(coins) - len(coins_to_update))
 
 
 @shared_task
-def export_data_to_excel(user_email: str) -> None:
-    """Send extracted model data and save in excel and send to email."""
-    excelfile = BytesIO()
-    workbook = Workbook()
-    workbook.remove(workbook.active)
-    worksheet = workbook.create_sheet(title='Latest Cryptocurrency Coins', index=1)
-    workbook.security.workbookPassword = config('PASSWORD', default='12345data')
-    workbook.security.lockStructure = config('PROTECT', default=True, cast=bool)
-    workbook.security.revisionsPassword = config('PASSWORD', default='12345data')
-    worksheet.protection.sheet = config('PROTECT', default=True, cast=bool)
-    worksheet.protection.formatCells = config('PROTECT', default=False, cast=bool)
-
-    worksheet.sheet_properties.tabColor = '1072BA'
-    worksheet.freeze_panes = 'I2'
-
-    coin_queryset = Coins.objects.all().order_by('rank')
-    columns = ['Name', 'Symbol', 'Rank', 'Current price', 'Price change', 'Market cap', 'Total supply']
-    row_num = 1
-
-    # Assign the titles for each cell of the header
-    for col_num, column_title in enumerate(columns, 1):
-        cell = worksheet.cell(row=row_num, column=col_num)
-        cell.value = column_title
-        cell.alignment = Alignment(horizontal='center', vertical='center', wrap_text=True)
-        cell.font = Font(bold=True)
-    # Iterate through all coins
-    for _, coin in enumerate(coin_queryset, 1):
-        row_num += 1
-
-        # Define the data for each cell in the row
-        row = [
-            coin.name,
-            f'{coin.symbol}'.upper(),
-            coin.rank,
-            currency(coin.current_price),
-            currency(coin.price_change_within_24_hours),
-            currency(coin.market_cap),
-            coin.total_supply,
-        ]
-
-        # Assign the data for each cell of the row
-        for col_num, cell_value in enumerate(row, 1):
-            cell = worksheet.cell(row=row_num, column=col_num)
-            cell.value = cell_value
-            cell.protection = Protection(locked=True)
-    workbook.save(excelfile)
+@single_flight_task('coins-ingestion')
+@profile_task
+def get_coins_data_from_coingecko_and_store() -> None:
+    """Fetch data from coingecko api and store."""
+    ingest_markets([CoinsSink(settings.COINS_VS_CURRENCY, max_pages=settings.COINS_MAX_PAGES)])
+
+
+def coin_export_message(user_email: str, download_url: str) -> EmailMessage:
+    """Build the email linking to the stored coin workbook."""
     now = timezone.now()
-    message = EmailMessage(
+    hours = settings.EXPORT_LINK_MAX_AGE // 3600
+    return EmailMessage(
         f'Coin data as of {now.date().isoformat()}',
-        f'Generated at: {now.isoformat()}',
+        f'Generated at: {now.isoformat()}\n\nDownload it here: {download_url}\nThis link expires in {hours} hours.',
         settings.DEFAULT_FROM_EMAIL,
         [user_email],
     )
-    message.attach('latest-coin-list.xlsx', excelfile.getvalue(), 'application/vnd.ms-excel')
-    message.send()
 
 
 @shared_task
+@profile_task
+def export_data_to_excel(user_email: str) -> None:
+    """Send extracted model data and save in excel and send to email."""
+    coin_export_message(user_email, export_download_url(publish_coins_export())).send()
+
+
+EXPORT_PENDING_KEY = 'coin-export-pending'
+EXPORT_SCHEDULED_KEY = 'coin-export-batch-scheduled'
+EXPORT_QUEUE_LOCK = 'coin-export-queue'
+
+
+def request_coin_export(user_email: str) -> bool:
+    """
+    Add ``user_email`` to the next batched export, scheduling the batch unless one is already due.
+
+    Repeat requests from an address already waiting are dropped. Returns whether the address was added.
+    """
+    user_email = user_email.strip()
+    with single_flight(
+        EXPORT_QUEUE_LOCK, ttl=settings.EXPORT_BATCH_LOCK_TTL, wait=settings.EXPORT_BATCH_LOCK_WAIT
+    ) as held:
+        if not held:
+            # The queue is wedged; don't lose the request.
+            export_data_to_excel.delay(user_email)
+            return True
+        pending: list[str] = cache.get(EXPORT_PENDING_KEY) or []
+        if user_email.lower() in (email.lower() for email in pending):
+            return False
+        pending.append(user_email)
+        # No expiry: the list is only emptied by a batch that has sent it.
+        cache.set(EXPORT_PENDING_KEY, pending, timeout=None)
+        # The marker outlives the window by EXPORT_BATCH_GRACE; once it's gone, the batch is overdue.
+        schedule = cache.add(
+            EXPORT_SCHEDULED_KEY, True, timeout=settings.EXPORT_BATCH_WINDOW + settings.EXPORT_BATCH_GRACE
+        )
+    if schedule:
+        if len(pending) > 1:
+            logger.warning("Rescheduling the export batch for %s addresses; the last one never ran", len(pending))
+        try:
+            send_coin_export_batch.apply_async(countdown=settings.EXPORT_BATCH_WINDOW)
+        except Exception:  # pylint: disable=broad-except
+            # The next request, or the periodic sweep, schedules it again.
+            cache.delete(EXPORT_SCHEDULED_KEY)
+            logger.exception("Failed to schedule the export batch for %s addresses", len(pending))
+    return True
+
+
+@shared_task(
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    retry_backoff_max=600,
+    max_retries=5,
+)
+@profile_task
+def send_coin_export_batch() -> int:
+    """
+    Store the workbook once and email its link to every pending address over one SMTP connection.
+
+    Addresses stay queued until the batch has been sent, so a failed run is retried with all of them.
+    Also runs periodically as a sweep, so addresses whose batch was never scheduled still get mailed.
+    """
+    with single_flight(
+        EXPORT_QUEUE_LOCK, ttl=settings.EXPORT_BATCH_LOCK_TTL, wait=settings.EXPORT_BATCH_LOCK_WAIT
+    ) as held:
+        if not held:
+            raise RuntimeError('Export queue lock is unavailable')
+        pending: list[str] = cache.get(EXPORT_PENDING_KEY) or []
+        scheduled = cache.get(EXPORT_SCHEDULED_KEY)
+        # Requests arriving from here on schedule the next batch.
+        cache.delete(EXPORT_SCHEDULED_KEY)
+    if not pending:
+        return 0
+    if not scheduled:
+        logger.warning("Sending %s coin exports whose batch was late or never scheduled", len(pending))
+
+    download_url = export_download_url(publish_coins_export())
+    sent = get_connection().send_messages([coin_export_message(email, download_url) for email in pending])
+    logger.info("Sent %s coin exports in one batch", sent)
+
+    with single_flight(
+        EXPORT_QUEUE_LOCK, ttl=settings.EXPORT_BATCH_LOCK_TTL, wait=settings.EXPORT_BATCH_LOCK_WAIT
+    ) as held:
+        if not held:
+            # Sent but still queued; a later batch mails these addresses again rather than never.
+            logger.error("Could not dequeue %s sent coin exports", len(pending))
+            return sent
+        done = {email.lower() for email in pending}
+        remaining = [email for email in cache.get(EXPORT_PENDING_KEY) or [] if email.lower() not in done]
+        if remaining:
+            cache.set(EXPORT_PENDING_KEY, remaining, timeout=None)
+        else:
+            cache.delete(EXPORT_PENDING_KEY)
+    return sent
+
+
+@shared_task
+@profile_task
+def purge_stored_exports() -> int:
+    """Delete stored exports whose download links have expired."""
+    return purge_export_artifacts()
+
+
+@shared_task
+@single_flight_task('google-sheets-sync', coalesce=True)
+@profile_task
 def populate_googlesheet_with_coins_data() -> None:
     """Populate Googlesheet with the coin data from the database."""
-    response = requests.get(settings.GOOGLE_API_SERVICE_KEY_URL)
-    with open('core/djangoexcel.json', 'wb') as file:
-        file.write(response.content)
-    service_account_file = 'core/djangoexcel.json'
-    creds = service_account.Credentials.from_service_account_file(
-        service_account_file, scopes=settings.GOOGLE_API_SCOPE
-    )
-    service = build('sheets', 'v4', credentials=creds)
-    sheet = service.spreadsheets()
-
-    sheet_metadata_values = sheet.get(spreadsheetId=settings.SPREADSHEET_ID).execute()
-    csheets = sheet_metadata_values.get('sheets', '')
-    datetime_format = '%a %b %d %Y %Hh%Mm'
-    if csheets and len(csheets) > 1:
-        for csheet in csheets:
-            sheet_title = csheet.get('properties', {}).get('title', '')
-            date_segment_of_the_title = ' '.join(sheet_title.split(' ')[0:5]).strip()
-            parsed_datetime: Optional[Any] = None
-            try:
-                parsed_datetime = datetime.strptime(date_segment_of_the_title, datetime_format)
-            except ValueError as err:
-                print(err)
-            now = timezone.now().strftime(datetime_format)
-            if (
-                parsed_datetime
-                and (datetime.strptime(now, datetime_format) - parsed_datetime).seconds
-                > settings.SPREADSHEET_TAB_EXPIRY
-            ):
-                sheet_id = csheet.get('properties', {}).get('sheetId', 0)
-                batch_update_request_body = {'requests': [{'deleteSheet': {'sheetId': sheet_id}}]}
-                sheet.batchUpdate(spreadsheetId=settings.SPREADSHEET_ID, body=batch_update_request_body).execute()
-
-    coin_queryset = Coins.objects.all().order_by('rank')
-    coin_data_list: list[Any] = [
-        [
-            'Name',
-            'Symbol',
-            'Rank',
-            'Current price',
-            'Price change',
-            'Market cap',
-            'Total supply',
-        ]
-    ]
-    for coin in coin_queryset:
-        coin_data_list.append(
-            [
-                coin.name,
-                f'{coin.symbol}'.upper(),
-                coin.rank,
-                str(currency(coin.current_price)),
-                str(currency(coin.price_change_within_24_hours)),
-                str(currency(coin.market_cap)),
-                str(coin.total_supply),
-            ]
-        )
+    publish = publish_coin_tab if settings.SPREADSHEET_SYNC_MODE == 'tabs' else sync_coin_tab
+    try:
+        ranges = publish(get_sheets_service().spreadsheets())
+    except RefreshError:
+        # The cached key was probably rotated; rebuild the client from the current key once.
+        reset_sheets_service()
+        ranges = publish(get_sheets_service().spreadsheets())
+    metrics.SHEETS_RANGES.inc(ranges)
+
 
-    new_sheet_title = f'{timezone.now().strftime(datetime_format)} Coin data'
-    batch_update_request_body = {
-        'requests': [
-            {
-                'addSheet': {
-                    'properties': {
-                        'title': new_sheet_title,
-                        'tabColor': {'red': 0.968627451, 'green': 0.576470588, 'blue': 0.101960784},
-                        'gridProperties': {'rowCount': len(coin_data_list), 'columnCount': 7},
-                    }
-                }
-            }
-        ]
-    }
-    sheet.batchUpdate(spreadsheetId=settings.SPREADSHEET_ID, body=batch_update_request_body).execute()
-    sheet.values().append(
-        spreadsheetId=settings.SPREADSHEET_ID,
-        range=f"'{new_sheet_title}'!A1:G1",
-        valueInputOption='USER_ENTERED',
-        body={'values': coin_data_list},
-    ).execute()
-
-
-def build_api_url(page: int) -> str:
+def build_api_url(page: int, vs_currency: str = 'usd', per_page: int = 50) -> str:
     """Build the API URL."""
-    market_currency_order = 'markets?vs_currency=usd&order=market_cap_desc&'
-    per_page = f'per_page=50&page={page}&sparkline=false'
-    return f'{settings.BASE_API_URL}/coins/{market_currency_order}{per_page}'
+    market_currency_order = f'markets?vs_currency={vs_currency}&order=market_cap_desc&'
+    pagination = f'per_page={per_page}&page={page}&sparkline=false'
+    return f'{settings.BASE_API_URL}/coins/{market_currency_order}{pagination}'
+
+
+FULL_COIN_DATA_FIELDS = [
+    'symbol',
+    'name',
+    'image',
+    'current_price',
+    'market_cap',
+    'market_cap_rank',
+    'fully_diluted_valuation',
+    'total_volume',
+    'high_24h',
+    'low_24h',
+    'price_change_24h',
+    'price_change_percentage_24h',
+    'market_cap_change_24h',
+    'market_cap_change_percentage_24h',
+    'circulating_supply',
+    'total_supply',
+    'max_supply',
+    'ath',
+    'ath_change_percentage',
+    'ath_date',
+    'atl',
+    'atl_change_percentage',
+    'atl_date',
+    'last_updated',
+]
+FULL_COIN_UPDATE_FIELDS = [*FULL_COIN_DATA_FIELDS, 'content_hash']
+
+
+@dataclass
+class StoreResult:
+    """How many rows a store_data call created, updated or skipped as unchanged."""
+
+    created: int = 0
+    updated: int = 0
+    unchanged: int = 0
+
+    def __iadd__(self, other: 'StoreResult') -> 'StoreResult':
+        """Accumulate another batch's counts."""
+        self.created += other.created
+        self.updated += other.updated
+        self.unchanged += other.unchanged
+        return self
+
+    @property
+    def written(self) -> int:
+        """Return the number of rows that hit the database."""
+        return self.created + self.updated
+
+
+def content_hash(data: dict[str, Any]) -> str:
+    """Return a digest of every stored field of a CoinGecko market dict."""
+    payload = json.dumps([data.get(field) for field in FULL_COIN_DATA_FIELDS], default=str)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+def full_coin_from_data(data: dict[str, Any]) -> FullCoin:
+    """Build an unsaved FullCoin straight from a CoinGecko market dict."""
+    # Using get() because CoinGecko omits or nulls several of these (e.g. max_supply)
+    return FullCoin(
+        coin_id=data['id'],
+        content_hash=content_hash(data),
+        **{field: data.get(field) for field in FULL_COIN_DATA_FIELDS},
+    )
+
+
+def supports_upsert() -> bool:
+    """Return whether the database can do INSERT ... ON CONFLICT (...) DO UPDATE."""
+    features = connection.features
+    return bool(features.supports_update_conflicts and features.supports_update_conflicts_with_target)
+
 
+def store_data(data_list: list[dict[str, Any]], upsert: Optional[bool] = None) -> StoreResult:
+    """
+    Store the data in bulk, skipping coins whose content hash hasn't changed.
+
+    Changed and new coins are written with a single INSERT ... ON CONFLICT DO UPDATE statement where
+    the backend supports it, falling back to the read-then-bulk_update path otherwise. Pass
+    ``upsert`` to force either path.
+    """
+    # Later duplicates of a coin win, matching what the write paths below would store.
+    incoming = {data['id']: data for data in data_list}
+    stored_hashes = dict(FullCoin.objects.filter(coin_id__in=incoming).values_list('coin_id', 'content_hash'))
+
+    result = StoreResult()
+    changed = []
+    for coin_id, data in incoming.items():
+        if coin_id not in stored_hashes:
+            result.created += 1
+        elif stored_hashes[coin_id] != content_hash(data):
+            result.updated += 1
+        else:
+            result.unchanged += 1
+            continue
+        changed.append(data)
 
-def store_data(data_list: list[dict]) -> None:
-    """Store the data in bulk."""
+    if changed:
+        if upsert is None:
+            upsert = supports_upsert()
+        if upsert:
+            upsert_full_coins(changed)
+        else:
+            store_data_with_bulk_update(changed)
+
+    logger.info("Stored coins: %s new, %s changed, %s unchanged", result.created, result.updated, result.unchanged)
+    metrics.ROWS_STORED.labels('full_coin', 'created').inc(result.created)
+    metrics.ROWS_STORED.labels('full_coin', 'updated').inc(result.updated)
+    metrics.ROWS_STORED.labels('full_coin', 'unchanged').inc(result.unchanged)
+    return result
+
+
+def upsert_full_coins(data_list: list[dict[str, Any]]) -> None:
+    """Insert or update every coin in one statement without reading existing rows first."""
+    # CoinGecko can repeat a coin across page boundaries; ON CONFLICT can't touch a row twice.
+    coins = {data['id']: full_coin_from_data(data) for data in data_list}
+    if coins:
+        FullCoin.objects.bulk_create(
+            list(coins.values()),
+            update_conflicts=True,
+            unique_fields=['coin_id'],
+            update_fields=FULL_COIN_UPDATE_FIELDS,
+        )
+
+
+def store_data_with_bulk_update(data_list: list[dict[str, Any]]) -> None:
+    """Load existing coins, then bulk create the new ones and bulk update the rest."""
     # Get existing coins
     existing_coins = {coin.coin_id: coin for coin in FullCoin.objects.filter(coin_id__in=[d['id'] for d in data_list])}
 
@@ -198,67 +381,16 @@ def store_data(data_list: list[dict]) -> None:
     coins_to_update = []
 
     for data in data_list:
-        if data['id'] in existing_coins:
-            # Update existing coin
-            coin = existing_coins[data['id']]
-            coins_to_update.append(coin)
-        else:
-            # Create new coin
-            coin = FullCoin(
-                coin_id=data['id'],
-                symbol=data['symbol'],
-                name=data['name'],
-                image=data['image'],
-                current_price=data['current_price'],
-                market_cap=data['market_cap'],
-                market_cap_rank=data['market_cap_rank'],
-                fully_diluted_valuation=data.get('fully_diluted_valuation'),
-                total_volume=data['total_volume'],
-                high_24h=data['high_24h'],
-                low_24h=data['low_24h'],
-                price_change_24h=data['price_change_24h'],
-                price_change_percentage_24h=data['price_change_percentage_24h'],
-                market_cap_change_24h=data['market_cap_change_24h'],
-                market_cap_change_percentage_24h=data['market_cap_change_percentage_24h'],
-                circulating_supply=data['circulating_supply'],
-                total_supply=data.get('total_supply'),
-                max_supply=data.get('max_supply'),
-                ath=data['ath'],
-                ath_change_percentage=data['ath_change_percentage'],
-                ath_date=data['ath_date'],
-                atl=data['atl'],
-                atl_change_percentage=data['atl_change_percentage'],
-                atl_date=data['atl_date'],
-                last_updated=data['last_updated'],
-            )
-            coins_to_create.append(coin)
+        if data['id'] not in existing_coins:
+            coins_to_create.append(full_coin_from_data(data))
             continue
 
         # Update fields for existing coins
-        coin.symbol = data['symbol']
-        coin.name = data['name']
-        coin.image = data['image']
-        coin.current_price = data['current_price']
-        coin.market_cap = data['market_cap']
-        coin.market_cap_rank = data['market_cap_rank']
-        coin.fully_diluted_valuation = data.get('fully_diluted_valuation')  # Using get() for nullable fields
-        coin.total_volume = data['total_volume']
-        coin.high_24h = data['high_24h']
-        coin.low_24h = data['low_24h']
-        coin.price_change_24h = data['price_change_24h']
-        coin.price_change_percentage_24h = data['price_change_percentage_24h']
-        coin.market_cap_change_24h = data['market_cap_change_24h']
-        coin.market_cap_change_percentage_24h = data['market_cap_change_percentage_24h']
-        coin.circulating_supply = data['circulating_supply']
-        coin.total_supply = data.get('total_supply')  # Using get() for nullable fields
-        coin.max_supply = data.get('max_supply')  # Using get() for nullable fields
-        coin.ath = data['ath']
-        coin.ath_change_percentage = data['ath_change_percentage']
-        coin.ath_date = data['ath_date']
-        coin.atl = data['atl']
-        coin.atl_change_percentage = data['atl_change_percentage']
-        coin.atl_date = data['atl_date']
-        coin.last_updated = data['last_updated']
+        coin = existing_coins[data['id']]
+        for field in FULL_COIN_DATA_FIELDS:
+            setattr(coin, field, data.get(field))
+        coin.content_hash = content_hash(data)
+        coins_to_update.append(coin)
 
     # Bulk create new coins with ignore_conflicts=True
     if coins_to_create:
@@ -266,98 +398,328 @@ def store_data(data_list: list[dict]) -> None:
 
     # Bulk update existing coins
     if coins_to_update:
-        FullCoin.objects.bulk_update(
-            coins_to_update,
-            fields=[
-                'symbol',
-                'name',
-                'image',
-                'current_price',
-                'market_cap',
-                'market_cap_rank',
-                'fully_diluted_valuation',
-                'total_volume',
-                'high_24h',
-                'low_24h',
-                'price_change_24h',
-                'price_change_percentage_24h',
-                'market_cap_change_24h',
-                'market_cap_change_percentage_24h',
-                'circulating_supply',
-                'total_supply',
-                'max_supply',
-                'ath',
-                'ath_change_percentage',
-                'ath_date',
-                'atl',
-                'atl_change_percentage',
-                'atl_date',
-                'last_updated',
-            ],
+        FullCoin.objects.bulk_update(coins_to_update, fields=FULL_COIN_UPDATE_FIELDS)
+
+
+def snapshot_from_data(data: dict[str, Any], captured_at: datetime) -> CoinPriceSnapshot:
+    """Build an unsaved price snapshot from a CoinGecko market dict."""
+    return CoinPriceSnapshot(
+        coin_id=data['id'],
+        captured_at=captured_at,
+        current_price=data.get('current_price'),
+        market_cap=data.get('market_cap'),
+        total_volume=data.get('total_volume'),
+    )
+
+
+def store_snapshots(snapshots: list[CoinPriceSnapshot]) -> None:
+    """Append a run's price snapshots with one bulk insert."""
+    if snapshots:
+        # The same coin can repeat across page boundaries within one run.
+        CoinPriceSnapshot.objects.bulk_create(
+            snapshots, batch_size=settings.SNAPSHOT_INSERT_BATCH_SIZE, ignore_conflicts=True
         )
+        logger.info("Stored %s price snapshots", len(snapshots))
+        metrics.ROWS_STORED.labels('price_snapshot', 'appended').inc(len(snapshots))
 
 
-def fetch_coins_iteratively() -> Generator[dict, None, None]:
-    """Fetch coins data from API using generator."""
-    page = 1
+@shared_task
+@profile_task
+def prune_coin_price_snapshots() -> int:
+    """Delete snapshots older than SNAPSHOT_RETENTION_HOURS in chunks and return how many went."""
+    cutoff = timezone.now() - timedelta(hours=settings.SNAPSHOT_RETENTION_HOURS)
+    chunk_size = settings.SNAPSHOT_PRUNE_CHUNK_SIZE
+    stale = CoinPriceSnapshot.objects.captured_before(cutoff)
+    deleted = 0
     while True:
-        try:
-            url = build_api_url(page)
-            response = requests.get(url)
-            coin_data = response.json()
+        chunk = list(stale.values_list('pk', flat=True)[:chunk_size])
+        if not chunk:
+            break
+        deleted += CoinPriceSnapshot.objects.filter(pk__in=chunk).delete()[0]
+    logger.info("Pruned %s price snapshots captured before %s", deleted, cutoff.isoformat())
+    return deleted
+
+
+COIN_PRICE_UPDATE_FIELDS = ['current_price', 'market_cap', 'total_volume', 'price_change_24h', 'last_updated']
+
+
+def price_from_data(data: dict[str, Any], vs_currency: str) -> CoinPrice:
+    """Build an unsaved CoinPrice from a CoinGecko market dict quoted in ``vs_currency``."""
+    return CoinPrice(
+        coin_id=data['id'],
+        vs_currency=vs_currency,
+        current_price=data.get('current_price'),
+        market_cap=data.get('market_cap'),
+        total_volume=data.get('total_volume'),
+        price_change_24h=data.get('price_change_24h'),
+        last_updated=data.get('last_updated'),
+    )
+
 
-            # Check for rate limit response
+def store_prices(vs_currency: str, data_list: list[dict[str, Any]], upsert: Optional[bool] = None) -> int:
+    """Insert or update one currency's page of prices, keyed on (coin, currency), and return the row count."""
+    prices = {data['id']: price_from_data(data, vs_currency) for data in data_list}
+    if not prices:
+        return 0
+    if upsert is None:
+        upsert = supports_upsert()
+
+    if upsert:
+        CoinPrice.objects.bulk_create(
+            list(prices.values()),
+            update_conflicts=True,
+            unique_fields=['coin', 'vs_currency'],
+            update_fields=COIN_PRICE_UPDATE_FIELDS,
+        )
+        metrics.ROWS_STORED.labels('coin_price', 'upserted').inc(len(prices))
+        return len(prices)
+
+    with transaction.atomic():
+        existing = dict(
+            CoinPrice.objects.filter(vs_currency=vs_currency, coin_id__in=prices).values_list('coin_id', 'pk')
+        )
+        for coin_id, price in prices.items():
+            price.pk = existing.get(coin_id)
+        if existing:
+            CoinPrice.objects.bulk_update(
+                [price for price in prices.values() if price.pk], fields=COIN_PRICE_UPDATE_FIELDS
+            )
+        CoinPrice.objects.bulk_create([price for price in prices.values() if price.pk is None])
+    metrics.ROWS_STORED.labels('coin_price', 'updated').inc(len(existing))
+    metrics.ROWS_STORED.labels('coin_price', 'created').inc(len(prices) - len(existing))
+    return len(prices)
+
+
+COIN_MARKETS_LOCK = 'coin-markets-ingestion'
+COIN_MARKETS_CHECKPOINT = 'coin-markets'
+
+
+def ingestion_checkpoint_key(name: str) -> str:
+    """Return the cache key holding the progress of the ingestion run ``name``."""
+    return f'ingestion-checkpoint:{name}'
+
+
+def new_ingestion_run() -> dict[str, Any]:
+    """Return the progress of a run that hasn't stored anything yet."""
+    return {'run_id': uuid.uuid4().hex, 'pages': {}, 'written': {}}
+
+
+def load_ingestion_checkpoint(name: str) -> dict[str, Any]:
+    """Return the unfinished ``name`` run's progress, or start a new run."""
+    checkpoint: Optional[dict[str, Any]] = cache.get(ingestion_checkpoint_key(name))
+    return checkpoint if checkpoint is not None else new_ingestion_run()
+
+
+def save_ingestion_checkpoint(name: str, checkpoint: dict[str, Any]) -> None:
+    """Record the last stored page of every currency, so a retry starts after them."""
+    cache.set(ingestion_checkpoint_key(name), checkpoint, timeout=settings.INGESTION_CHECKPOINT_TTL)
+
+
+def clear_ingestion_checkpoint(name: str) -> None:
+    """Forget the ``name`` run's progress so its next run is a full sweep."""
+    cache.delete(ingestion_checkpoint_key(name))
+
+
+def fetch_currency_pages(
+    vs_currency: str,
+    pages: queue.Queue[MarketPage],
+    stop: threading.Event,
+    per_page: int,
+    *,
+    start_page: int = 1,
+    max_pages: Optional[int] = None,
+) -> None:
+    """
+    Put each market page quoted in ``vs_currency`` on ``pages`` as ``(vs_currency, page, coins)``.
+
+    Stops after ``max_pages`` (or at the first empty page) and always ends with a ``None`` page.
+    Runs in a worker thread and only does HTTP, so the database is only touched by the caller.
+    """
+    client = get_client()
+    page = start_page
+    try:
+        while (max_pages is None or page <= max_pages) and not stop.is_set():
+            if page > start_page and settings.COINGECKO_PAGE_INTERVAL:
+                metrics.SLEEP_SECONDS.labels('politeness').inc(settings.COINGECKO_PAGE_INTERVAL)
+                if stop.wait(settings.COINGECKO_PAGE_INTERVAL):
+                    break
+            coin_data = client.get_json(build_api_url(page, vs_currency, per_page))
             if isinstance(coin_data, dict) and coin_data.get('status', {}).get('error_code') == 429:
-                logger.warning("Rate limit exceeded. Waiting 60 seconds...")
-                time.sleep(60)
+                logger.warning("Rate limit exceeded fetching %s markets. Waiting 60 seconds...", vs_currency)
+                metrics.COINGECKO_RATE_LIMITED.labels(vs_currency).inc()
+                metrics.SLEEP_SECONDS.labels('rate_limit').inc(60)
+                stop.wait(60)
                 continue
-
-            # Check for empty response (end of pagination)
             if not coin_data:
                 break
-
-            yield from coin_data
-            logger.info(f"Fetched page {page} with {len(coin_data)} coins")
+            pages.put((vs_currency, page, coin_data))
+            logger.info("Fetched %s page %s with %s coins", vs_currency, page, len(coin_data))
+            metrics.COINGECKO_PAGES.labels(vs_currency).inc()
             page += 1
+    finally:
+        pages.put((vs_currency, page, None))
 
-            time.sleep(1)  # Be nice to the API
 
-        except requests.exceptions.RequestException as e:
-            logger.error(f"Request failed on page {page}: {e}")
-            raise
+class IngestionSink(abc.ABC):
+    """
+    A destination for the market pages of one quote currency.
 
+    ``ingest_markets`` fetches each currency's pages once and hands every page, in order, to each
+    sink of that currency until the sink's ``max_pages``. Subclasses implement ``write``.
+    """
 
-def fetch_coins_recursively(page: int = 1) -> Generator[dict, None, None]:
-    """Fetch coins data from API recursively using generator."""
-    try:
-        url = build_api_url(page)
-        response = requests.get(url)
-        coin_data = response.json()
-
-        # Check for rate limit response
-        if isinstance(coin_data, dict) and coin_data.get('status', {}).get('error_code') == 429:
-            logger.warning("Rate limit exceeded. Waiting 60 seconds...")
-            time.sleep(60)
-            yield from fetch_coins_recursively(page)
-            return
+    name = 'sink'
+    dataset: Optional[str] = None
 
-        # Base case: empty response (end of pagination)
-        if not coin_data:
-            return
+    def __init__(self, vs_currency: str = 'usd', max_pages: Optional[int] = None) -> None:
+        """Consume ``vs_currency`` pages, all of them unless ``max_pages`` is given."""
+        self.vs_currency = vs_currency.strip().lower()
+        self.max_pages = max_pages
+
+    @property
+    def key(self) -> str:
+        """Return the name this sink's row count is reported under."""
+        return f'{self.name}.{self.vs_currency}'
+
+    def wants(self, page: int) -> bool:
+        """Return whether ``page`` should be written to this sink."""
+        return self.max_pages is None or page <= self.max_pages
+
+    @abc.abstractmethod
+    def write(self, coin_data: list[dict[str, Any]], captured_at: datetime) -> int:
+        """Store one page and return how many rows were written."""
+
+
+class FullCoinSink(IngestionSink):
+    """Upsert every coin into FullCoin, skipping unchanged ones."""
+
+    name = 'full_coins'
+    dataset = FULL_COINS
+
+    def write(self, coin_data: list[dict[str, Any]], captured_at: datetime) -> int:
+        """Store the page with ``store_data``."""
+        return store_data(coin_data).written
 
-        # Process current page
-        yield from coin_data
-        logger.info(f"Fetched page {page} with {len(coin_data)} coins")
 
-        # Be nice to the API
-        time.sleep(1)
+class SnapshotSink(IngestionSink):
+    """Append every coin to the price history at the run's capture time."""
 
-        # Recursive case: fetch next page
-        yield from fetch_coins_recursively(page + 1)
+    name = 'snapshots'
 
-    except requests.exceptions.RequestException as e:
-        logger.error(f"Request failed on page {page}: {e}")
-        raise
+    def write(self, coin_data: list[dict[str, Any]], captured_at: datetime) -> int:
+        """Store one snapshot per coin."""
+        store_snapshots([snapshot_from_data(coin, captured_at) for coin in coin_data])
+        return len(coin_data)
+
+
+class CoinsSink(IngestionSink):
+    """Project the top of the market into Coins, the table behind the index view and exports."""
+
+    name = 'coins'
+    dataset = COINS
+
+    def write(self, coin_data: list[dict[str, Any]], captured_at: datetime) -> int:
+        """Store the page with ``store_coins``."""
+        store_coins(coin_data)
+        return len(coin_data)
+
+
+class CoinPriceSink(IngestionSink):
+    """Upsert each coin's price in this sink's currency into CoinPrice."""
+
+    name = 'prices'
+    dataset = PRICES
+
+    def write(self, coin_data: list[dict[str, Any]], captured_at: datetime) -> int:
+        """Store the page with ``store_prices``."""
+        return store_prices(self.vs_currency, coin_data)
+
+
+def price_currencies() -> list[str]:
+    """Return COINGECKO_VS_CURRENCIES normalised and without repeats."""
+    return list(dict.fromkeys(currency.strip().lower() for currency in settings.COINGECKO_VS_CURRENCIES))
+
+
+def default_ingestion_sinks() -> list[IngestionSink]:
+    """Return the sinks fed by the scheduled ingestion run."""
+    return [
+        FullCoinSink(settings.FULL_COIN_VS_CURRENCY),
+        SnapshotSink(settings.FULL_COIN_VS_CURRENCY),
+        CoinsSink(settings.COINS_VS_CURRENCY, max_pages=settings.COINS_MAX_PAGES),
+        *(CoinPriceSink(currency, max_pages=settings.COINGECKO_PRICE_MAX_PAGES) for currency in price_currencies()),
+    ]
+
+
+def ingest_markets(
+    sinks: Sequence[IngestionSink], per_page: Optional[int] = None, checkpoint: Optional[str] = None
+) -> dict[str, int]:
+    """
+    Fetch each currency's /coins/markets pages once and route every page through ``sinks``.
+
+    Every currency is one stream of requests on its own thread, going as far as its hungriest sink;
+    pages come back over a queue and are written here as they arrive. With ``checkpoint``, the last
+    stored page of each currency is kept in the cache under that name so a failed run's retry
+    resumes after it. Only page progress is resumed: every attempt stamps its snapshots with its own
+    capture time. Returns the rows written per sink ``key``.
+    """
+    streams: dict[str, list[IngestionSink]] = {}
+    for sink in sinks:
+        streams.setdefault(sink.vs_currency, []).append(sink)
+    if not streams:
+        return {}
+    per_page = per_page or settings.COINGECKO_MARKETS_PER_PAGE
+    state = load_ingestion_checkpoint(checkpoint) if checkpoint else new_ingestion_run()
+    captured_at = timezone.now()
+    for sink in sinks:
+        state['written'].setdefault(sink.key, 0)
+    if state['pages']:
+        logger.info("Resuming ingestion run %s after pages %s", state['run_id'], state['pages'])
+
+    pages: queue.Queue[MarketPage] = queue.Queue()
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=len(streams), thread_name_prefix='coingecko-markets') as executor:
+        futures = []
+        for vs_currency, currency_sinks in streams.items():
+            limits = [sink.max_pages for sink in currency_sinks]
+            futures.append(
+                executor.submit(
+                    fetch_currency_pages,
+                    vs_currency,
+                    pages,
+                    stop,
+                    per_page,
+                    start_page=state['pages'].get(vs_currency, 0) + 1,
+                    max_pages=None if None in limits else max(limit for limit in limits if limit is not None),
+                )
+            )
+        try:
+            remaining = len(streams)
+            while remaining:
+                vs_currency, page, coin_data = pages.get()
+                if coin_data is None:
+                    remaining -= 1
+                    continue
+                for sink in streams[vs_currency]:
+                    if sink.wants(page):
+                        state['written'][sink.key] += sink.write(coin_data, captured_at)
+                state['pages'][vs_currency] = page
+                if checkpoint:
+                    save_ingestion_checkpoint(checkpoint, state)
+        finally:
+            stop.set()
+    for future in futures:
+        future.result()
+
+    written = {sink.key: state['written'][sink.key] for sink in sinks}
+    for dataset in dict.fromkeys(sink.dataset for sink in sinks if sink.dataset and written[sink.key]):
+        bump_data_generation(dataset)
+    if checkpoint:
+        clear_ingestion_checkpoint(checkpoint)
+    logger.info("Ingested rows: %s", written)
+    logger.info(
+        "CoinGecko connection stats: %s, cache: %s", get_client().connection_stats(), get_client().cache_stats()
+    )
+    return written
 
 
 @shared_task(
@@ -367,26 +729,49 @@ def fetch_coins_recursively(page: int = 1) -> Generator[dict, None, None]:
     retry_backoff_max=600,
     max_retries=5,
 )
-def get_full_coin_data_iteratively_for_page(self) -> None:
-    """Get full coin data iteratively for each page."""
+@single_flight_task(COIN_MARKETS_LOCK)
+@profile_task
+def ingest_coin_markets(self: Any) -> dict[str, int]:
+    """
+    Fetch every market page once per currency and feed FullCoin, its history, Coins and CoinPrice.
+
+    Progress is checkpointed after every routed page, so retries carry on from there.
+    """
     try:
-        # Use list comprehension to collect coins in batches
-        batch_size = 100
-        coins_batch = []
-
-        for coin in fetch_coins_iteratively():
-            coins_batch.append(coin)
-
-            if len(coins_batch) >= batch_size:
-                logger.info(f"Processing batch of {len(coins_batch)} coins")
-                store_data(coins_batch)
-                coins_batch = []
-
-        # Process remaining coins
-        if coins_batch:
-            logger.info(f"Processing final batch of {len(coins_batch)} coins")
-            store_data(coins_batch)
-
-    except Exception as e:
-        logger.error(f"Failed to process coins: {e}")
-        raise self.retry(exc=e)
+        return ingest_markets(default_ingestion_sinks(), checkpoint=COIN_MARKETS_CHECKPOINT)
+    except Exception as exc:
+        logger.error("Failed to ingest coin markets: %s", exc)
+        raise self.retry(exc=exc)
+
+
+@shared_task(
+    bind=True,
+    autoretry_for=(Exception,),
+    retry_backoff=True,
+    retry_backoff_max=600,
+    max_retries=5,
+)
+@single_flight_task('full-coin-ingestion')
+@profile_task
+def get_full_coin_data_iteratively_for_page(self: Any) -> None:
+    """
+    Get full coin data page by page, resuming after the last page a failed attempt stored.
+
+    Only feeds FullCoin and its history; the scheduled ``ingest_coin_markets`` covers them too.
+    """
+    try:
+        sinks = [FullCoinSink(settings.FULL_COIN_VS_CURRENCY), SnapshotSink(settings.FULL_COIN_VS_CURRENCY)]
+        ingest_markets(sinks, checkpoint='full-coins')
+    except Exception as exc:
+        logger.error("Failed to process coins: %s", exc)
+        raise self.retry(exc=exc)
+
+
+@shared_task
+@single_flight_task('coin-price-ingestion')
+@profile_task
+def get_coin_prices_for_currencies() -> dict[str, int]:
+    """Fetch every COINGECKO_VS_CURRENCIES currency concurrently and upsert each page into CoinPrice."""
+    sinks = [CoinPriceSink(currency, max_pages=settings.COINGECKO_PRICE_MAX_PAGES) for currency in price_currencies()]
+    written = ingest_markets(sinks, per_page=settings.COINGECKO_PRICE_PER_PAGE)
+    return {sink.vs_currency: written[sink.key] for sink in sinks}
@@ -1,22 +1,13 @@
-import decimal
-import locale
+from typing import Any
 
 from django import template
 
+from core.formatting import format_currency
+
 register = template.Library()
 
 
 @register.filter(name='currency')
-def currency(value: int | str) -> str:
+def currency(value: Any) -> str:
     """Format currency."""
-    try:
-        locale.setlocale(locale.LC_ALL, 'en_NG.UTF-8')
-    except (locale.Error, ValueError):
-        locale.setlocale(locale.LC_ALL, 'en_US.UTF-8')
-    loc = locale.localeconv()
-    returned_format = (
-        locale.currency(decimal.Decimal(value), loc['currency_symbol'], grouping=True)  # type:ignore
-        if value
-        else '₦0.0'
-    )
-    return returned_format
+    return format_currency(value)
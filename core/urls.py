@@ -7,4 +7,9 @@ app_name: str = 'core'
 urlpatterns = [
     path('', views.index, name='index'),
     path('extract-data-to-excel/', views.extract_and_send_coin_data_via_email, name='extract_data'),
+    path('download/<slug:dataset>.<slug:file_format>', views.download_data, name='download_data'),
+    path('exports/<str:token>/', views.download_export, name='download_export'),
+    path('metrics', views.prometheus_metrics, name='metrics'),
+    path('api/coins/', views.coins_api, name='coins_api'),
+    path('api/full-coins/', views.full_coins_api, name='full_coins_api'),
 ]
@@ -1,17 +1,78 @@
+import hashlib
 import json
+from datetime import datetime
+from typing import Any, Callable, Optional
 
-from django.http import HttpRequest, HttpResponse, JsonResponse
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db.models import QuerySet
+from django.http import (
+    FileResponse,
+    Http404,
+    HttpRequest,
+    HttpResponse,
+    JsonResponse,
+    StreamingHttpResponse,
+)
 from django.shortcuts import render
+from django.views.decorators.gzip import gzip_page
+from django.views.decorators.http import condition, require_GET
 
-from core.models import Coins
-from core.tasks import export_data_to_excel
+from core.exporters import (
+    COIN_EXPORT_COLUMNS,
+    COIN_EXPORT_FIELDS,
+    cached_coins_export,
+    coin_export_queryset,
+    load_export_token,
+    stream_csv,
+)
+from core.generation import (
+    COINS,
+    FULL_COINS,
+    get_data_generation,
+    get_generation_modified,
+)
+from core.metrics import render_metrics
+from core.models import Coins, FullCoin
+from core.pagination import keyset_paginate, parse_sort, prefix_search
+from core.tasks import FULL_COIN_DATA_FIELDS, request_coin_export
+
+INDEX_SORT_FIELDS = ('rank', 'name', 'current_price', 'market_cap')
+COINS_API_FIELDS = [
+    'id',
+    'name',
+    'symbol',
+    'image_url',
+    'current_price',
+    'price_change_within_24_hours',
+    'rank',
+    'market_cap',
+    'total_supply',
+]
+FULL_COINS_API_FIELDS = ['coin_id', *FULL_COIN_DATA_FIELDS]
+FULL_COINS_SORT_FIELDS = ('market_cap_rank', 'name', 'symbol', 'current_price', 'market_cap')
+DOWNLOAD_DATASETS: dict[str, tuple[str, Callable[[], QuerySet[Any]], list[str], list[str]]] = {
+    'coins': (COINS, coin_export_queryset, COIN_EXPORT_FIELDS, COIN_EXPORT_COLUMNS),
+    'full-coins': (
+        FULL_COINS,
+        lambda: FullCoin.objects.order_by('market_cap_rank', 'coin_id'),
+        FULL_COINS_API_FIELDS,
+        FULL_COINS_API_FIELDS,
+    ),
+}
 
 
 def index(request: HttpRequest) -> HttpResponse:
     """Index view."""
-    coins = Coins.objects.all().order_by('rank')
-    context: dict[str, str] = {
-        'coin_data': coins,
+    field, descending = parse_sort(request.GET.get('sort'), INDEX_SORT_FIELDS, default='rank')
+    search = request.GET.get('q', '').strip()
+    coins = prefix_search(Coins.objects.all(), search, fields=('name', 'symbol'))
+    page = keyset_paginate(coins, field, descending, request.GET.get('cursor'), settings.INDEX_PAGE_SIZE)
+    context: dict[str, Any] = {
+        'coin_data': page.object_list,
+        'next_cursor': page.next_cursor,
+        'sort': page.sort,
+        'search': search,
     }
     return render(request, 'coin_data.html', context)
 
@@ -21,7 +82,130 @@ def extract_and_send_coin_data_via_email(request: HttpRequest) -> JsonResponse:
     if request.method == 'POST':
         request_data = json.loads(request.body)
         email = request_data['userEmail']
-        export_data_to_excel.delay(email)
+        request_coin_export(email)
         return JsonResponse({'message': 'Coins data successfully extracted 💃!'}, status=200)
 
     return JsonResponse({'message': 'Coins data failed to be extracted 😔!'}, status=500)
+
+
+@require_GET
+def download_data(request: HttpRequest, dataset: str, file_format: str) -> HttpResponse:
+    """Stream a dataset as CSV, or send the coin workbook as XLSX, without going through email."""
+    if dataset not in DOWNLOAD_DATASETS:
+        raise Http404('Unknown dataset')
+    generation_dataset, queryset, fields, header = DOWNLOAD_DATASETS[dataset]
+    filename = f'{dataset}-{get_data_generation(generation_dataset)}.{file_format}'
+
+    if file_format == 'csv':
+        response = StreamingHttpResponse(stream_csv(queryset(), fields, header), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+    if file_format == 'xlsx' and dataset == 'coins':
+        # A zip container can't be emitted row by row; the workbook cached for this generation is sent instead.
+        return FileResponse(cached_coins_export().open('rb'), as_attachment=True, filename=filename)
+    raise Http404('Unsupported format')
+
+
+@require_GET
+def download_export(request: HttpRequest, token: str) -> FileResponse:
+    """Stream a stored export from ``default_storage`` to the holder of a valid, unexpired link."""
+    name = load_export_token(token)
+    if name is None or not default_storage.exists(name):
+        raise Http404('This download link is invalid or has expired')
+    return FileResponse(default_storage.open(name, 'rb'), as_attachment=True, filename=name.rsplit('/', 1)[-1])
+
+
+@require_GET
+def prometheus_metrics(request: HttpRequest) -> HttpResponse:
+    """Expose task, ingestion and export metrics in the Prometheus text format."""
+    if settings.METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {settings.METRICS_TOKEN}':
+        return HttpResponse(status=401)
+    body, content_type = render_metrics()
+    return HttpResponse(body, content_type=content_type)
+
+
+def _api_etag(dataset: str) -> Callable[..., str]:
+    """Build an ETag function from the dataset generation and query string, without touching the DB."""
+
+    def etag(request: HttpRequest) -> str:
+        query = hashlib.blake2b(request.GET.urlencode().encode(), digest_size=8).hexdigest()
+        return f'{dataset}-{get_data_generation(dataset)}-{query}'
+
+    return etag
+
+
+def _api_last_modified(dataset: str) -> Callable[..., Optional[datetime]]:
+    """Build a Last-Modified function from when the dataset generation was bumped."""
+
+    def last_modified(request: HttpRequest) -> Optional[datetime]:
+        return get_generation_modified(dataset)
+
+    return last_modified
+
+
+def _api_page(
+    request: HttpRequest,
+    dataset: str,
+    queryset: QuerySet[Any],
+    fields: list[str],
+    *,
+    sort_fields: tuple[str, ...],
+    search_fields: tuple[str, ...],
+) -> JsonResponse:
+    """Serialize one keyset page of ``queryset`` straight from ``values_list`` rows."""
+    field, descending = parse_sort(request.GET.get('sort'), sort_fields, default=sort_fields[0])
+    try:
+        limit = min(max(int(request.GET.get('limit', settings.API_PAGE_SIZE)), 1), settings.API_MAX_PAGE_SIZE)
+    except ValueError:
+        limit = settings.API_PAGE_SIZE
+
+    pk_name = queryset.model._meta.pk.name
+    queryset = prefix_search(queryset, request.GET.get('q', '').strip(), search_fields)
+    columns = fields if field in fields else [*fields, field]
+    field_index, pk_index = columns.index(field), columns.index(pk_name)
+    page = keyset_paginate(
+        queryset.values_list(*columns),
+        field,
+        descending,
+        request.GET.get('cursor'),
+        limit,
+        row_key=lambda row: (row[field_index], row[pk_index]),
+    )
+    return JsonResponse(
+        {
+            'generation': get_data_generation(dataset),
+            'sort': page.sort,
+            'next_cursor': page.next_cursor,
+            'results': [dict(zip(fields, row)) for row in page.object_list],
+        }
+    )
+
+
+@gzip_page
+@require_GET
+@condition(etag_func=_api_etag(COINS), last_modified_func=_api_last_modified(COINS))
+def coins_api(request: HttpRequest) -> JsonResponse:
+    """Return a page of coins as JSON."""
+    return _api_page(
+        request,
+        COINS,
+        Coins.objects.all(),
+        COINS_API_FIELDS,
+        sort_fields=INDEX_SORT_FIELDS,
+        search_fields=('name', 'symbol'),
+    )
+
+
+@gzip_page
+@require_GET
+@condition(etag_func=_api_etag(FULL_COINS), last_modified_func=_api_last_modified(FULL_COINS))
+def full_coins_api(request: HttpRequest) -> JsonResponse:
+    """Return a page of full coin data as JSON."""
+    return _api_page(
+        request,
+        FULL_COINS,
+        FullCoin.objects.all(),
+        FULL_COINS_API_FIELDS,
+        sort_fields=FULL_COINS_SORT_FIELDS,
+        search_fields=('name', 'symbol'),
+    )
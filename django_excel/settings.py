@@ -11,6 +11,7 @@ https://docs.djangoproject.com/en/4.0/ref/settings/
 """
 
 import os
+import tempfile
 from pathlib import Path
 from typing import Any
 
@@ -53,6 +54,7 @@ MIDDLEWARE: list[str] = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'core.profiling.QueryProfilerMiddleware',
 ]
 
 ROOT_URLCONF: str = 'django_excel.urls'
@@ -132,12 +134,39 @@ USE_TZ: bool = True
 STATIC_URL: str = 'static/'
 STATIC_ROOT: str = BASE_DIR / 'staticfiles'
 
+MEDIA_URL: str = 'media/'
+MEDIA_ROOT: Path = Path(config('MEDIA_ROOT', default=str(BASE_DIR / 'exports' / 'media')))
+
+# Absolute base for links sent outside a request, e.g. export download links in emails.
+SITE_URL: str = config('SITE_URL', default='http://localhost:8000')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.0/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD: str = 'django.db.models.BigAutoField'
 
 
+# Cache
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+
+CACHES: dict[str, Any] = {
+    # Holds state the web and worker processes must agree on: data generations, task locks, ingestion
+    # checkpoints, the pending export batch and the published Sheets snapshot. It is therefore never a
+    # per-process cache; production uses Redis, everything else a directory shared on the host.
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': config('CACHE_DIR', default=str(Path(tempfile.gettempdir()) / 'django_excel' / 'default')),
+    },
+    # CoinGecko responses, shared between worker processes on the same host.
+    'coingecko': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': config(
+            'COINGECKO_CACHE_DIR', default=str(Path(tempfile.gettempdir()) / 'django_excel' / 'coingecko')
+        ),
+    },
+}
+
+
 CELERY_BROKER_URL: str = config('REDIS_URL', default='redis://localhost:6379/0')
 CELERY_RESULT_BACKEND: str = config('REDIS_URL', default='redis://localhost:6379/0')
 
@@ -145,17 +174,25 @@ CELERY_ACCEPT_CONTENT: list[str] = ['application/json']
 CELERY_TASK_SERIALIZER: str = 'json'
 CELERY_RESULT_SERIALIZER: str = 'json'
 CELERY_BEAT_SCHEDULE: dict[str, dict[str, Any]] = {
-    'get_coins_data_from_coingecko_and_store': {
-        'task': 'core.tasks.get_coins_data_from_coingecko_and_store',
-        'schedule': crontab(minute='*/1'),
+    'ingest_coin_markets': {
+        'task': 'core.tasks.ingest_coin_markets',
+        'schedule': crontab(minute='*/3'),
     },
     'populate_googlesheet_with_coins_data': {
         'task': 'core.tasks.populate_googlesheet_with_coins_data',
         'schedule': crontab(minute='*/2'),
     },
-    'get_full_coin_data_iteratively_for_page': {
-        'task': 'core.tasks.get_full_coin_data_iteratively_for_page',
-        'schedule': crontab(minute='*/3'),
+    'send_coin_export_batch': {
+        'task': 'core.tasks.send_coin_export_batch',
+        'schedule': crontab(minute='*/10'),
+    },
+    'purge_stored_exports': {
+        'task': 'core.tasks.purge_stored_exports',
+        'schedule': crontab(minute=45),
+    },
+    'prune_coin_price_snapshots': {
+        'task': 'core.tasks.prune_coin_price_snapshots',
+        'schedule': crontab(minute=15),
     },
 }
 
@@ -168,7 +205,12 @@ BROKER_BACKEND = 'memory'
 GOOGLE_API_SCOPE = ['https://www.googleapis.com/auth/spreadsheets']
 SPREADSHEET_ID = config('SPREADSHEET_ID', default='1AFNyUKcqgwO-CCXRubcIALOC74yfV716Q5q57Ojjicc')
 GOOGLE_API_SERVICE_KEY_URL = config('SERVICE_KEY_PATH', default='')
+GOOGLE_API_KEY_TIMEOUT = config('GOOGLE_API_KEY_TIMEOUT', default=10.0, cast=float)
 SPREADSHEET_TAB_EXPIRY = config('SPREADSHEET_TAB_EXPIRY', default=360, cast=int)
+# 'incremental' keeps one live tab and sends only changed cells; 'tabs' adds a new timestamped tab per run.
+SPREADSHEET_SYNC_MODE = config('SPREADSHEET_SYNC_MODE', default='incremental')
+SPREADSHEET_LIVE_TAB_TITLE = config('SPREADSHEET_LIVE_TAB_TITLE', default='Coin data')
+SPREADSHEET_LIVE_TAB_ID = config('SPREADSHEET_LIVE_TAB_ID', default=1072, cast=int)
 
 # Email configuration
 ADMINS = (('Admin', config('EMAIL_HOST_USER', default='no-reply@django_excel.herokuapp.com')),)
@@ -204,7 +246,95 @@ if not DEBUG:
     db_from_env = dj_database_url.config(conn_max_age=500)
     DATABASES['default'].update(db_from_env)
 
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config('REDIS_URL', default='redis://localhost:6379/0'),
+    }
+    CACHES['coingecko'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config('REDIS_URL', default='redis://localhost:6379/0'),
+        'KEY_PREFIX': 'coingecko',
+    }
+
 
 # ==============================================================================
 # COINGECKO API CONFIGURATIONS
 BASE_API_URL: str = 'https://api.coingecko.com/api/v3'
+COINGECKO_POOL_MAXSIZE: int = config('COINGECKO_POOL_MAXSIZE', default=4, cast=int)
+COINGECKO_CONNECT_TIMEOUT: float = config('COINGECKO_CONNECT_TIMEOUT', default=5.0, cast=float)
+COINGECKO_READ_TIMEOUT: float = config('COINGECKO_READ_TIMEOUT', default=30.0, cast=float)
+COINGECKO_MAX_RETRIES: int = config('COINGECKO_MAX_RETRIES', default=3, cast=int)
+COINGECKO_RETRY_BACKOFF: float = config('COINGECKO_RETRY_BACKOFF', default=0.5, cast=float)
+# Successful responses are reused for up to COINGECKO_CACHE_TTL seconds (less if Cache-Control says so),
+# then kept for COINGECKO_CACHE_REVALIDATE_TTL more so they can be revalidated with If-None-Match.
+COINGECKO_CACHE_ALIAS: str = config('COINGECKO_CACHE_ALIAS', default='coingecko')
+COINGECKO_CACHE_TTL: int = config('COINGECKO_CACHE_TTL', default=45, cast=int)
+COINGECKO_CACHE_REVALIDATE_TTL: int = config('COINGECKO_CACHE_REVALIDATE_TTL', default=600, cast=int)
+# Quote currencies stored in CoinPrice; each one is fetched as its own concurrent stream of pages.
+COINGECKO_VS_CURRENCIES: list[str] = config('COINGECKO_VS_CURRENCIES', default='usd,ngn', cast=Csv())
+COINGECKO_PRICE_PER_PAGE: int = config('COINGECKO_PRICE_PER_PAGE', default=250, cast=int)
+COINGECKO_PRICE_MAX_PAGES: int = config('COINGECKO_PRICE_MAX_PAGES', default=4, cast=int)
+# One ingestion run fetches /coins/markets once per currency and feeds every table from those pages:
+# FullCoin and its snapshots from FULL_COIN_VS_CURRENCY, Coins from the first COINS_MAX_PAGES pages
+# of COINS_VS_CURRENCY, and CoinPrice from the first COINGECKO_PRICE_MAX_PAGES of each currency.
+COINGECKO_MARKETS_PER_PAGE: int = config('COINGECKO_MARKETS_PER_PAGE', default=250, cast=int)
+COINGECKO_PAGE_INTERVAL: float = config('COINGECKO_PAGE_INTERVAL', default=1.0, cast=float)
+FULL_COIN_VS_CURRENCY: str = config('FULL_COIN_VS_CURRENCY', default='usd')
+COINS_VS_CURRENCY: str = config('COINS_VS_CURRENCY', default='ngn')
+COINS_MAX_PAGES: int = config('COINS_MAX_PAGES', default=1, cast=int)
+# How long an unfinished ingestion run's page checkpoint is kept for retries to resume from.
+INGESTION_CHECKPOINT_TTL: int = config('INGESTION_CHECKPOINT_TTL', default=6 * 60 * 60, cast=int)
+
+
+# ==============================================================================
+# TASK LOCK CONFIGURATIONS
+# Ingestion and Sheets tasks hold a lock in the default cache while they run; a crashed worker's
+# lock expires after TASK_LOCK_TTL seconds and a live one is extended every TASK_LOCK_HEARTBEAT.
+# Only the Redis cache makes these locks atomic; the file cache used outside production is best-effort.
+TASK_LOCK_TTL: int = config('TASK_LOCK_TTL', default=300, cast=int)
+TASK_LOCK_HEARTBEAT: float = config('TASK_LOCK_HEARTBEAT', default=60.0, cast=float)
+
+
+# ==============================================================================
+# METRICS CONFIGURATIONS
+# /metrics serves Prometheus text. Set the PROMETHEUS_MULTIPROC_DIR environment variable (to an empty,
+# writable directory) to add up samples from every gunicorn and Celery process on the host.
+METRICS_TOKEN: str = config('METRICS_TOKEN', default='')
+
+# With QUERY_PROFILING on, every request and task logs its query count, DB time and duplicated
+# statements to core.profiling, and each statement slower than SLOW_QUERY_THRESHOLD seconds.
+QUERY_PROFILING: bool = config('QUERY_PROFILING', default=False, cast=bool)
+SLOW_QUERY_THRESHOLD: float = config('SLOW_QUERY_THRESHOLD', default=0.1, cast=float)
+
+
+# ==============================================================================
+# VIEW CONFIGURATIONS
+INDEX_PAGE_SIZE: int = config('INDEX_PAGE_SIZE', default=50, cast=int)
+API_PAGE_SIZE: int = config('API_PAGE_SIZE', default=250, cast=int)
+API_MAX_PAGE_SIZE: int = config('API_MAX_PAGE_SIZE', default=1000, cast=int)
+
+
+# ==============================================================================
+# EXPORT CONFIGURATIONS
+EXPORT_CHUNK_SIZE: int = config('EXPORT_CHUNK_SIZE', default=2000, cast=int)
+EXPORT_CURRENCY_FORMAT: str = config('EXPORT_CURRENCY_FORMAT', default='"₦"#,##0.00')
+EXPORT_CACHE_DIR: Path = Path(config('EXPORT_CACHE_DIR', default=str(BASE_DIR / 'exports' / 'cache')))
+EXPORT_CACHE_MAX_BYTES: int = config('EXPORT_CACHE_MAX_BYTES', default=50 * 1024 * 1024, cast=int)
+# Export requests arriving within EXPORT_BATCH_WINDOW seconds of the first one share a workbook and SMTP connection.
+EXPORT_BATCH_WINDOW: int = config('EXPORT_BATCH_WINDOW', default=30, cast=int)
+EXPORT_BATCH_LOCK_TTL: int = config('EXPORT_BATCH_LOCK_TTL', default=10, cast=int)
+EXPORT_BATCH_LOCK_WAIT: float = config('EXPORT_BATCH_LOCK_WAIT', default=2.0, cast=float)
+# A batch that hasn't run EXPORT_BATCH_GRACE seconds after its window closed is rescheduled by the next
+# request; the send_coin_export_batch beat entry sweeps up addresses no later request comes along for.
+EXPORT_BATCH_GRACE: int = config('EXPORT_BATCH_GRACE', default=300, cast=int)
+# Exports are kept in default_storage and emailed as signed links valid for EXPORT_LINK_MAX_AGE seconds.
+EXPORT_COMPRESS: bool = config('EXPORT_COMPRESS', default=False, cast=bool)
+EXPORT_LINK_MAX_AGE: int = config('EXPORT_LINK_MAX_AGE', default=24 * 60 * 60, cast=int)
+EXPORT_ARTIFACT_MAX_AGE: int = config('EXPORT_ARTIFACT_MAX_AGE', default=48 * 60 * 60, cast=int)
+
+
+# ==============================================================================
+# PRICE HISTORY CONFIGURATIONS
+SNAPSHOT_RETENTION_HOURS: int = config('SNAPSHOT_RETENTION_HOURS', default=72, cast=int)
+SNAPSHOT_INSERT_BATCH_SIZE: int = config('SNAPSHOT_INSERT_BATCH_SIZE', default=1000, cast=int)
+SNAPSHOT_PRUNE_CHUNK_SIZE: int = config('SNAPSHOT_PRUNE_CHUNK_SIZE', default=5000, cast=int)
@@ -0,0 +1,15 @@
+import tempfile
+from typing import Iterator
+
+import pytest
+from django.conf import settings
+from django.test import override_settings
+
+
+@pytest.fixture(scope='session', autouse=True)
+def isolated_default_cache() -> Iterator[None]:
+    """Keep the shared default cache of a test run apart from the one a local app is using."""
+    with tempfile.TemporaryDirectory() as location:
+        caches = {**settings.CACHES, 'default': {**settings.CACHES['default'], 'LOCATION': location}}
+        with override_settings(CACHES=caches):
+            yield
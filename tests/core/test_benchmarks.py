@@ -0,0 +1,39 @@
+import json
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from core.generation import FULL_COINS, get_data_generation
+from core.locks import SingleFlightLock, single_flight
+from core.models import Coins, FullCoin
+from core.tasks import COIN_MARKETS_LOCK
+
+
+class BenchCommandTests(TestCase):
+    def test_bench_reports_every_benchmark_and_rolls_back(self) -> None:
+        """Test the suite emits JSON for each benchmark and leaves no rows behind."""
+        output = StringIO()
+        call_command('bench', sizes=[3], stdout=output)
+
+        results = json.loads(output.getvalue())
+        self.assertEqual(
+            [result['benchmark'] for result in results],
+            ['store_data', 'coins_task', 'export', 'currency_filter', 'index'],
+        )
+        self.assertEqual(results[1]['stored'], 3)
+        self.assertIn('peak_bytes', results[2])
+        self.assertFalse(Coins.objects.exists() or FullCoin.objects.exists())
+
+    def test_bench_leaves_live_caches_alone(self) -> None:
+        """Test a benchmark run next to a live ingestion neither skips nor touches its lock or generations."""
+        generation = get_data_generation(FULL_COINS)
+        output = StringIO()
+        with single_flight(COIN_MARKETS_LOCK) as held:
+            self.assertTrue(held)
+            call_command('bench', sizes=[3], only=['coins_task'], no_memory=True, stdout=output)
+            with self.assertLogs('core.locks', level='INFO'):
+                self.assertFalse(SingleFlightLock(COIN_MARKETS_LOCK).acquire())
+
+        self.assertEqual(json.loads(output.getvalue())[0]['stored'], 3)
+        self.assertEqual(get_data_generation(FULL_COINS), generation)
@@ -0,0 +1,96 @@
+from typing import Any, Optional
+from unittest.mock import MagicMock, patch
+
+from django.core.cache import caches
+from django.test import SimpleTestCase
+
+from core.coingecko import CoinGeckoClient, cache_key, get_client, reset_client
+
+
+class CoinGeckoClientTests(SimpleTestCase):
+    def tearDown(self) -> None:
+        """Drop the cached client between tests."""
+        reset_client()
+
+    def test_get_client_is_shared_within_a_process(self) -> None:
+        """Test get_client returns the same pooled client until the pid changes."""
+        client = get_client()
+        self.assertIs(get_client(), client)
+
+        with patch('core.coingecko.os.getpid', return_value=-1):
+            self.assertIsNot(get_client(), client)
+
+    def test_get_json_uses_timeout(self) -> None:
+        """Test every request carries the configured connect/read timeouts."""
+        client = CoinGeckoClient(connect_timeout=1.5, read_timeout=9.0)
+        with patch.object(client.session, 'get') as mock_get:
+            mock_get.return_value.json.return_value = [{'id': 'bitcoin'}]
+            data = client.get_json('https://api.coingecko.com/api/v3/coins/markets', params={'page': 1})
+
+        self.assertEqual(data, [{'id': 'bitcoin'}])
+        mock_get.assert_called_once_with(
+            'https://api.coingecko.com/api/v3/coins/markets', params={'page': 1}, timeout=(1.5, 9.0)
+        )
+
+    def test_connection_stats_starts_empty(self) -> None:
+        """Test connection_stats before any request."""
+        self.assertEqual(
+            CoinGeckoClient().connection_stats(), {'requests': 0, 'new_connections': 0, 'reused_connections': 0}
+        )
+
+
+class CoinGeckoResponseCacheTests(SimpleTestCase):
+    url = 'https://api.coingecko.com/api/v3/coins/markets?vs_currency=usd&page=1'
+
+    def setUp(self) -> None:
+        """Create a client backed by the local-memory cache."""
+        self.cache = caches['default']
+        self.addCleanup(self.cache.clear)
+        self.client = CoinGeckoClient(cache=self.cache, cache_ttl=60, revalidate_ttl=600)
+        patcher = patch.object(self.client.session, 'get')
+        self.mock_get = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def respond(self, status: int = 200, headers: Optional[dict[str, str]] = None, data: Any = None) -> None:
+        """Make the next request return this response."""
+        response = MagicMock(status_code=status, headers=headers or {})
+        response.json.return_value = data
+        self.mock_get.return_value = response
+
+    def test_cache_key_normalizes_url_and_params(self) -> None:
+        """Test parameter order, host case and params vs query string don't change the key."""
+        self.assertEqual(
+            cache_key('https://API.coingecko.com/api/v3/coins/markets?page=1&vs_currency=usd'),
+            cache_key('https://api.coingecko.com/api/v3/coins/markets/', params={'vs_currency': 'usd', 'page': 1}),
+        )
+        self.assertNotEqual(cache_key(self.url), cache_key(self.url.replace('page=1', 'page=2')))
+
+    def test_fresh_responses_are_served_from_cache(self) -> None:
+        """Test a repeated URL within its TTL doesn't reach the network."""
+        self.respond(data=[{'id': 'bitcoin'}])
+        self.assertEqual(self.client.get_json(self.url), [{'id': 'bitcoin'}])
+        self.assertEqual(self.client.get_json(self.url), [{'id': 'bitcoin'}])
+
+        self.mock_get.assert_called_once()
+        self.assertEqual(self.client.cache_stats(), {'hits': 1, 'misses': 1, 'revalidated': 0})
+
+    def test_stale_responses_are_revalidated_with_etag(self) -> None:
+        """Test Cache-Control max-age bounds freshness and a 304 reuses the cached body."""
+        self.respond(headers={'Cache-Control': 'public, max-age=0', 'ETag': 'W/"abc"'}, data=[{'id': 'bitcoin'}])
+        self.client.get_json(self.url)
+        self.respond(status=304, headers={'Cache-Control': 'max-age=0'})
+
+        self.assertEqual(self.client.get_json(self.url), [{'id': 'bitcoin'}])
+        self.assertEqual(self.mock_get.call_args.kwargs['headers'], {'If-None-Match': 'W/"abc"'})
+        self.assertEqual(self.client.cache_stats(), {'hits': 0, 'misses': 1, 'revalidated': 1})
+
+    def test_errors_and_no_store_are_not_cached(self) -> None:
+        """Test rate-limit responses and no-store responses are fetched again every time."""
+        self.respond(status=429, data={'status': {'error_code': 429}})
+        self.client.get_json(self.url)
+        self.respond(headers={'Cache-Control': 'no-store'}, data=[])
+        self.client.get_json(self.url)
+        self.client.get_json(self.url)
+
+        self.assertEqual(self.mock_get.call_count, 3)
+        self.assertEqual(self.client.cache_stats()['hits'], 0)
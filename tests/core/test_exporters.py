@@ -0,0 +1,146 @@
+import os
+import tempfile
+import time
+import zipfile
+from decimal import Decimal
+from io import BytesIO
+from pathlib import Path
+from unittest.mock import patch
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import TestCase, override_settings
+from openpyxl import load_workbook
+
+from core.exporters import (
+    COIN_EXPORT_COLUMNS,
+    COIN_EXPORT_FIELDS,
+    cached_coins_export,
+    coin_export_queryset,
+    export_download_url,
+    load_export_token,
+    publish_coins_export,
+    purge_export_artifacts,
+    stream_csv,
+    write_coins_workbook,
+)
+from core.generation import COINS, bump_data_generation
+from core.models import Coins
+
+
+class WriteCoinsWorkbookTests(TestCase):
+    def setUp(self) -> None:
+        """Create the setup of the test."""
+        Coins.objects.create(
+            name='ethers', symbol='eth', rank=2, current_price=1500, price_change_within_24_hours=-20, market_cap=900
+        )
+        Coins.objects.create(
+            name='bitcoin', symbol='btc', rank=1, current_price=12000000, price_change_within_24_hours=500
+        )
+
+    def test_write_coins_workbook(self) -> None:
+        """Test rows are written in rank order as numeric cells sharing named styles."""
+        output = BytesIO()
+        with self.assertNumQueries(1):
+            row_count = write_coins_workbook(output, chunk_size=1)
+
+        self.assertEqual(row_count, 2)
+        worksheet = load_workbook(output).active
+        rows = list(worksheet.iter_rows(values_only=True))
+        self.assertEqual(list(rows[0]), COIN_EXPORT_COLUMNS)
+        self.assertEqual(rows[1][:4], ('bitcoin', 'BTC', 1, 12000000))
+        self.assertEqual(rows[2][4], -20)
+        self.assertIsNone(rows[1][5])
+
+        price_cell = worksheet.cell(row=2, column=4)
+        self.assertEqual(price_cell.style, 'coin_currency')
+        self.assertIn('#,##0.00', price_cell.number_format)
+        self.assertTrue(price_cell.protection.locked)
+        self.assertIsInstance(Decimal(price_cell.value), Decimal)
+
+    def test_stream_csv_flushes_in_chunks(self) -> None:
+        """Test the header comes out first and rows are flushed whenever the buffer fills."""
+        with patch('core.exporters.CSV_FLUSH_BYTES', 1):
+            chunks = list(stream_csv(coin_export_queryset(), COIN_EXPORT_FIELDS, COIN_EXPORT_COLUMNS, chunk_size=1))
+
+        self.assertEqual(len(chunks), 3)
+        self.assertEqual(chunks[0], ','.join(COIN_EXPORT_COLUMNS) + '\r\n')
+        self.assertTrue(chunks[1].startswith('bitcoin,btc,1,12000000.00,500.00,'))
+
+
+class CachedCoinsExportTests(TestCase):
+    def setUp(self) -> None:
+        """Create the setup of the test."""
+        self.cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.cache_dir.cleanup)
+        self.settings_override = override_settings(EXPORT_CACHE_DIR=Path(self.cache_dir.name))
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        Coins.objects.create(name='bitcoin', symbol='btc', rank=1, current_price=12000000)
+
+    def test_cached_coins_export_reuses_artifact_until_generation_changes(self) -> None:
+        """Test exports are rendered once per ingestion generation."""
+        first = cached_coins_export()
+        with self.assertNumQueries(0):
+            self.assertEqual(cached_coins_export(), first)
+
+        bump_data_generation(COINS)
+        second = cached_coins_export()
+        self.assertNotEqual(second, first)
+        self.assertEqual(load_workbook(second).active.cell(row=2, column=1).value, 'bitcoin')
+
+    def test_cached_coins_export_evicts_least_recently_used(self) -> None:
+        """Test the cache directory stays within EXPORT_CACHE_MAX_BYTES."""
+        stale = Path(self.cache_dir.name) / 'coins-1.xlsx'
+        stale.write_bytes(b'x' * 1024)
+        os.utime(stale, (0, 0))
+
+        with override_settings(EXPORT_CACHE_MAX_BYTES=1):
+            current = cached_coins_export()
+
+        self.assertFalse(stale.exists())
+        self.assertTrue(current.exists())
+
+
+class StoredExportTests(TestCase):
+    def setUp(self) -> None:
+        """Create the setup of the test."""
+        export_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(export_dir.cleanup)
+        self.settings_override = override_settings(
+            MEDIA_ROOT=Path(export_dir.name) / 'media', EXPORT_CACHE_DIR=Path(export_dir.name) / 'cache'
+        )
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        Coins.objects.create(name='bitcoin', symbol='btc', rank=1, current_price=12000000)
+
+    def test_publish_coins_export_is_stored_once_per_generation(self) -> None:
+        """Test the workbook lands in storage once per generation, zipped when compression is on."""
+        name = publish_coins_export()
+        self.assertEqual(publish_coins_export(), name)
+        self.assertTrue(default_storage.exists(name))
+
+        bump_data_generation(COINS)
+        with self.settings(EXPORT_COMPRESS=True):
+            zipped = publish_coins_export()
+        self.assertTrue(zipped.endswith('.zip'))
+        with default_storage.open(zipped) as archive, zipfile.ZipFile(archive) as contents:
+            self.assertEqual(contents.namelist(), ['latest-coin-list.xlsx'])
+
+    def test_export_links_are_signed_and_expire(self) -> None:
+        """Test a link round-trips to its storage name, and tampered or expired links don't."""
+        token = export_download_url('exports/coins-1.xlsx').rstrip('/').rsplit('/', 1)[-1]
+        self.assertEqual(load_export_token(token), 'exports/coins-1.xlsx')
+        self.assertIsNone(load_export_token(token[:-1]))
+        with self.settings(EXPORT_LINK_MAX_AGE=-1):
+            self.assertIsNone(load_export_token(token))
+
+    def test_purge_export_artifacts(self) -> None:
+        """Test only exports older than EXPORT_ARTIFACT_MAX_AGE are deleted."""
+        old, new = publish_coins_export(), default_storage.save('exports/coins-new.xlsx', ContentFile(b'x'))
+        past = time.time() - 3 * 24 * 60 * 60
+        os.utime(default_storage.path(old), (past, past))
+
+        self.assertEqual(purge_export_artifacts(), 1)
+        self.assertFalse(default_storage.exists(old))
+        self.assertTrue(default_storage.exists(new))
@@ -0,0 +1,48 @@
+import locale
+from decimal import Decimal
+from unittest.mock import patch
+
+from django.test import SimpleTestCase
+
+from core.formatting import (
+    FALLBACK_CONVENTIONS,
+    CurrencyFormatter,
+    format_currency_many,
+    get_currency_formatter,
+)
+from core.templatetags.custom_tags import currency
+
+
+class CurrencyFormatterTests(SimpleTestCase):
+    def setUp(self) -> None:
+        """Create the setup of the test."""
+        self.formatter = CurrencyFormatter(dict(FALLBACK_CONVENTIONS))
+
+    def test_format(self) -> None:
+        """Test grouping, rounding and negative amounts."""
+        self.assertEqual(self.formatter.format(12000000), '₦12,000,000.00')
+        self.assertEqual(self.formatter.format(Decimal('1234567890123.456')), '₦1,234,567,890,123.46')
+        self.assertEqual(self.formatter.format('0.5'), '₦0.50')
+        self.assertEqual(self.formatter.format(-20), '-₦20.00')
+
+    def test_format_symbol_after_amount(self) -> None:
+        """Test conventions that place the symbol after the amount."""
+        conventions = dict(FALLBACK_CONVENTIONS, p_cs_precedes=0, p_sep_by_space=1, mon_thousands_sep='.')
+        conventions['mon_decimal_point'] = ','
+        self.assertEqual(CurrencyFormatter(conventions).format(1234.5), '1.234,50 ₦')
+
+    def test_formatter_is_cached_and_leaves_locale_alone(self) -> None:
+        """Test conventions are resolved once and the process locale is restored."""
+        before = locale.setlocale(locale.LC_MONETARY)
+        with patch('core.formatting.locale.localeconv', wraps=locale.localeconv) as mock_localeconv:
+            formatter = get_currency_formatter(('xx_XX.UTF-8', 'C.UTF-8'), currency_symbol='$')
+            self.assertIs(get_currency_formatter(('xx_XX.UTF-8', 'C.UTF-8'), currency_symbol='$'), formatter)
+        self.assertLessEqual(mock_localeconv.call_count, 1)
+        self.assertEqual(locale.setlocale(locale.LC_MONETARY), before)
+        self.assertEqual(formatter.format(1), '$1.00')
+
+    def test_format_currency_many(self) -> None:
+        """Test the batch API matches the template filter."""
+        values = [None, 0, 1500, Decimal('-20.10')]
+        self.assertEqual(format_currency_many(values), [currency(value) for value in values])
+        self.assertEqual(format_currency_many([None])[0], '₦0.0')
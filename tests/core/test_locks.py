@@ -0,0 +1,132 @@
+import threading
+import time
+from unittest.mock import patch
+
+import fakeredis
+from django.core.cache import cache
+from django.test import SimpleTestCase, override_settings
+
+from core.locks import (
+    SingleFlightLock,
+    contention_count,
+    single_flight,
+    single_flight_task,
+)
+
+REDIS_CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': 'redis://localhost:6379/0',
+        'OPTIONS': {'connection_class': fakeredis.FakeRedisConnection},
+    }
+}
+
+
+class SingleFlightLockTests(SimpleTestCase):
+    def setUp(self) -> None:
+        """Start every test with an empty cache."""
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_second_holder_is_refused_and_counted(self) -> None:
+        """Test only one holder at a time and that contention is counted."""
+        with single_flight('ingest') as first:
+            with single_flight('ingest') as second:
+                self.assertTrue(first)
+                self.assertFalse(second)
+        self.assertEqual(contention_count('ingest'), 1)
+
+        with single_flight('ingest') as again:
+            self.assertTrue(again)
+
+    def test_release_keeps_a_lock_taken_over_by_another_holder(self) -> None:
+        """Test release only deletes the key while it still holds this holder's token."""
+        lock = SingleFlightLock('ingest', ttl=60, heartbeat=60)
+        self.assertTrue(lock.acquire())
+        cache.set(lock.key, 'someone-else')
+        lock.release()
+        self.assertEqual(cache.get(lock.key), 'someone-else')
+
+    def test_heartbeat_extends_the_lock(self) -> None:
+        """Test a held lock outlives its TTL while the heartbeat runs."""
+        lock = SingleFlightLock('ingest', ttl=1, heartbeat=0.2)
+        self.assertTrue(lock.acquire())
+        try:
+            time.sleep(1.5)
+            self.assertEqual(cache.get(lock.key), lock.token)
+        finally:
+            lock.release()
+        self.assertIsNone(cache.get(lock.key))
+
+    def test_short_locks_run_without_a_heartbeat(self) -> None:
+        """Test only locks given a heartbeat start a thread to extend them."""
+        with single_flight('export-queue'):
+            self.assertNotIn('lock-heartbeat-export-queue', [thread.name for thread in threading.enumerate()])
+
+    def test_coalesced_task_reruns_once_for_overlapping_calls(self) -> None:
+        """Test calls made while a coalescing task runs collapse into one follow-up run."""
+        calls = []
+
+        @single_flight_task('sheets', coalesce=True)
+        def publish() -> str:
+            calls.append(len(calls))
+            if len(calls) == 1:
+                self.assertIsNone(publish())
+                self.assertIsNone(publish())
+            return 'done'
+
+        self.assertEqual(publish(), 'done')
+        self.assertEqual(calls, [0, 1])
+        self.assertEqual(contention_count('sheets'), 2)
+
+    def test_skipping_task_does_not_run(self) -> None:
+        """Test a non-coalescing task returns without running while the lock is held."""
+        with patch('core.locks.logger') as mock_logger, single_flight('ingest'):
+            self.assertIsNone(single_flight_task('ingest')(lambda: 'ran')())
+        mock_logger.info.assert_called_once()
+
+
+@override_settings(CACHES=REDIS_CACHES)
+class RedisSingleFlightLockTests(SimpleTestCase):
+    def setUp(self) -> None:
+        """Start every test with an empty Redis."""
+        cache.clear()
+        self.addCleanup(cache.clear)
+
+    def test_second_holder_is_refused_and_counted(self) -> None:
+        """Test only one holder at a time and that contention is counted."""
+        with single_flight('ingest') as first:
+            with single_flight('ingest') as second:
+                self.assertTrue(first)
+                self.assertFalse(second)
+        self.assertEqual(contention_count('ingest'), 1)
+
+        with single_flight('ingest') as again:
+            self.assertTrue(again)
+
+    def test_release_keeps_a_lock_taken_over_by_another_holder(self) -> None:
+        """Test a holder whose lock expired and was taken over doesn't release the new holder's lock."""
+        lock = SingleFlightLock('ingest', ttl=60)
+        self.assertTrue(lock.acquire())
+        cache.delete(lock.key)
+        other = SingleFlightLock('ingest', ttl=60)
+        self.assertTrue(other.acquire())
+
+        with self.assertLogs('core.locks', level='WARNING'):
+            lock.release()
+        with self.assertLogs('core.locks', level='INFO'):
+            self.assertFalse(SingleFlightLock('ingest').acquire())
+        other.release()
+        self.assertTrue(SingleFlightLock('ingest').acquire())
+
+    def test_heartbeat_extends_the_lock(self) -> None:
+        """Test a held lock outlives its TTL while the heartbeat runs."""
+        lock = SingleFlightLock('ingest', ttl=1, heartbeat=0.2)
+        self.assertTrue(lock.acquire())
+        try:
+            time.sleep(1.5)
+            with self.assertLogs('core.locks', level='INFO'):
+                self.assertFalse(SingleFlightLock('ingest').acquire())
+        finally:
+            lock.release()
+        self.assertTrue(SingleFlightLock('ingest').acquire())
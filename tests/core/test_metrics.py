@@ -0,0 +1,85 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from prometheus_client import REGISTRY
+
+from core.benchmarks import synthetic_market_data
+from core.tasks import (
+    prune_coin_price_snapshots,
+    snapshot_from_data,
+    store_coins,
+    store_data,
+    store_prices,
+    store_snapshots,
+)
+
+
+def sample(name: str, **labels: str) -> float:
+    """Return a metric sample's current value, treating a missing one as zero."""
+    return REGISTRY.get_sample_value(name, labels) or 0.0
+
+
+class MetricsTests(TestCase):
+    def test_task_signals_record_duration_and_queries(self) -> None:
+        """Test a task run through Celery is timed and its queries counted."""
+        task = 'core.tasks.prune_coin_price_snapshots'
+        runs = sample('django_excel_task_duration_seconds_count', task=task, state='success')
+        queries = sample('django_excel_task_db_queries_sum', task=task)
+
+        prune_coin_price_snapshots.apply()
+
+        self.assertEqual(sample('django_excel_task_duration_seconds_count', task=task, state='success'), runs + 1)
+        self.assertGreater(sample('django_excel_task_db_queries_sum', task=task), queries)
+
+    def test_store_data_counts_rows(self) -> None:
+        """Test created, updated and unchanged rows are counted."""
+        before = {
+            outcome: sample('django_excel_rows_stored_total', model='full_coin', outcome=outcome)
+            for outcome in ('created', 'updated', 'unchanged')
+        }
+        store_data(synthetic_market_data(3, seed=1))
+        store_data(synthetic_market_data(3, seed=1)[:1] + synthetic_market_data(3, seed=2)[1:])
+
+        for outcome, expected in {'created': 3, 'updated': 2, 'unchanged': 1}.items():
+            self.assertEqual(
+                sample('django_excel_rows_stored_total', model='full_coin', outcome=outcome),
+                before[outcome] + expected,
+            )
+
+    def test_other_store_functions_count_rows(self) -> None:
+        """Test coins, prices and snapshots are counted under their own model labels."""
+        counted = {
+            ('coins', 'upserted'): 3,
+            ('coins', 'updated'): 3,
+            ('coins', 'created'): 1,
+            ('coin_price', 'upserted'): 3,
+            ('coin_price', 'updated'): 3,
+            ('coin_price', 'created'): 1,
+            ('price_snapshot', 'appended'): 3,
+        }
+        before = {key: sample('django_excel_rows_stored_total', model=key[0], outcome=key[1]) for key in counted}
+        page = synthetic_market_data(3, seed=1)
+        store_coins(page, upsert=True)
+        store_coins(page + synthetic_market_data(4, seed=1)[3:], upsert=False)
+        store_prices('usd', page, upsert=True)
+        store_prices('usd', synthetic_market_data(4, seed=1), upsert=False)
+        store_data(page)
+        store_snapshots([snapshot_from_data(coin, timezone.now()) for coin in page])
+
+        for (model, outcome), expected in counted.items():
+            self.assertEqual(
+                sample('django_excel_rows_stored_total', model=model, outcome=outcome),
+                before[model, outcome] + expected,
+            )
+
+    def test_metrics_view(self) -> None:
+        """Test the Prometheus text endpoint, optionally behind a bearer token."""
+        response = self.client.get(reverse('core:metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        self.assertIn(b'django_excel_coingecko_pages_fetched', response.content)
+
+        with override_settings(METRICS_TOKEN='secret'):
+            self.assertEqual(self.client.get(reverse('core:metrics')).status_code, 401)
+            response = self.client.get(reverse('core:metrics'), HTTP_AUTHORIZATION='Bearer secret')
+            self.assertEqual(response.status_code, 200)
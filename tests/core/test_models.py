@@ -1,6 +1,15 @@
+from datetime import timedelta
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
 
-from core.models import Coins
+from core.benchmarks import synthetic_market_data
+from core.exporters import coin_export_queryset
+from core.models import CoinPriceSnapshot, Coins
+from core.tasks import coin_from_data, store_data
 
 
 class CoinsModelTests(TestCase):
@@ -11,3 +20,62 @@ class CoinsModelTests(TestCase):
     def test_unicode(self) -> None:
         """Test the model's __str__ method"""
         self.assertEqual(str(self.coin), f'{self.coin.name} - {self.coin.symbol}')
+
+
+class CoinPriceSnapshotTests(TestCase):
+    def test_for_coin_since(self) -> None:
+        """Test the history helper returns one coin's recent snapshots in time order."""
+        now = timezone.now()
+        for hours_ago in (1, 30, 2):
+            CoinPriceSnapshot.objects.create(
+                coin_id='bitcoin', captured_at=now - timedelta(hours=hours_ago), current_price=hours_ago
+            )
+        CoinPriceSnapshot.objects.create(coin_id='ethereum', captured_at=now, current_price=5)
+
+        prices = list(
+            CoinPriceSnapshot.objects.for_coin_since('bitcoin', hours=24).values_list('current_price', flat=True)
+        )
+
+        self.assertEqual(prices, [2, 1])
+
+
+def explain(sql: str) -> str:
+    """Return the plan of ``sql`` as text."""
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            # The test tables are tiny, so a sequential scan would otherwise always win.
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute(f'EXPLAIN {sql}')
+        else:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}')
+        return '\n'.join(str(row) for row in cursor.fetchall())
+
+
+class IndexUsageTests(TestCase):
+    def setUp(self) -> None:
+        """Seed coins and full coins."""
+        data = synthetic_market_data(120, seed=1)
+        Coins.objects.bulk_create([coin_from_data(item) for item in data])
+        store_data(data)
+
+    def view_plan(self, url: str, table: str) -> str:
+        """Return the plan of the first page query, over rows with a sort value, the view runs against ``table``."""
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        sql = next(
+            query['sql'] for query in queries if query['sql'].startswith('SELECT') and f'FROM "{table}"' in query['sql']
+        )
+        return explain(sql)
+
+    def test_index_view_uses_keyset_indexes(self) -> None:
+        """Test the index view walks the (sort column, id) index of each sort."""
+        self.assertIn('coins_rank_id_idx', self.view_plan(reverse('core:index'), 'core_coins'))
+        self.assertIn('coins_name_id_idx', self.view_plan(f"{reverse('core:index')}?sort=-name", 'core_coins'))
+
+    def test_full_coins_api_uses_ranked_index(self) -> None:
+        """Test the default full-coins page is served by the partial index on ranked coins."""
+        self.assertIn('fullcoin_ranked_idx', self.view_plan(reverse('core:full_coins_api'), 'core_fullcoin'))
+
+    def test_export_query_uses_rank_index(self) -> None:
+        """Test the export reads coins in index order instead of sorting them."""
+        self.assertIn('coins_rank_id_idx', explain(str(coin_export_queryset().query)))
@@ -0,0 +1,61 @@
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.benchmarks import synthetic_market_data
+from core.models import Coins
+from core.profiling import fingerprint, profile_queries, query_budget
+from core.tasks import coin_from_data, prune_coin_price_snapshots
+
+
+class QueryProfilingTests(TestCase):
+    def setUp(self) -> None:
+        """Seed a page of coins for the index view."""
+        Coins.objects.bulk_create([coin_from_data(data) for data in synthetic_market_data(60, seed=1)])
+
+    def test_fingerprint_collapses_literals(self) -> None:
+        """Test statements differing only in literals share a fingerprint."""
+        self.assertEqual(
+            fingerprint("SELECT * FROM core_coins WHERE id = 1 AND name = 'a''b'"),
+            fingerprint('SELECT *  FROM core_coins\nWHERE id = 22 AND name = \'c\''),
+        )
+        self.assertEqual(fingerprint('SELECT 1 WHERE id IN (%s, %s, %s)'), 'SELECT ? WHERE id IN (...)')
+
+    def test_profile_counts_duplicates_and_slow_queries(self) -> None:
+        """Test the profile records counts, repeated shapes and statements over the threshold."""
+        with profile_queries('test', slow_threshold=0) as profile:
+            for pk in (1, 2, 3):
+                Coins.objects.filter(pk=pk).first()
+        summary = profile.summary()
+        self.assertEqual(summary['queries'], 3)
+        self.assertEqual(summary['duplicated'], 2)
+        self.assertEqual(summary['slow'], 3)
+        self.assertEqual(len(profile.duplicates()), 1)
+
+    def test_middleware_logs_only_when_enabled(self) -> None:
+        """Test requests are profiled only with QUERY_PROFILING on."""
+        with self.assertNoLogs('core.profiling'):
+            self.client.get(reverse('core:index'))
+
+        with override_settings(QUERY_PROFILING=True, SLOW_QUERY_THRESHOLD=0), self.assertLogs(
+            'core.profiling', level='INFO'
+        ) as logs:
+            self.client.get(reverse('core:index'))
+        self.assertIn("'label': 'GET /'", logs.output[0])
+        self.assertTrue(any(line.startswith('WARNING:core.profiling:Slow query') for line in logs.output))
+
+    @override_settings(QUERY_PROFILING=True)
+    def test_tasks_are_profiled(self) -> None:
+        """Test a task run logs its profile under the task's name."""
+        with self.assertLogs('core.profiling', level='INFO') as logs:
+            prune_coin_price_snapshots.apply()
+        self.assertIn('task core.tasks.prune_coin_price_snapshots', logs.output[0])
+
+    def test_query_budget(self) -> None:
+        """Test the index view stays within its budget and an N+1 loop trips the helper."""
+        with query_budget(max_queries=3, max_duplicated=0):
+            self.client.get(reverse('core:index'))
+
+        with self.assertRaisesMessage(AssertionError, '4 duplicated queries, budget 0'):
+            with query_budget(max_queries=10, max_duplicated=0):
+                for coin in Coins.objects.all()[:5]:
+                    Coins.objects.filter(pk=coin.pk).exists()
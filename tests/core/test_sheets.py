@@ -0,0 +1,161 @@
+from unittest.mock import MagicMock, patch
+
+from django.test import SimpleTestCase, TestCase, override_settings
+
+from core.fake_sheets import FakeSheetsError, FakeSheetsService
+from core.models import Coins
+from core.sheets import (
+    SHEET_HEADER,
+    coin_sheet_rows,
+    diff_ranges,
+    get_sheets_service,
+    publish_coin_tab,
+    reset_sheet_snapshot,
+    reset_sheets_service,
+    sync_coin_tab,
+)
+
+
+class SheetsServiceCacheTests(SimpleTestCase):
+    def setUp(self) -> None:
+        """Create the setup of the test."""
+        self.key = {'client_email': 'sheets@django-excel.iam.gserviceaccount.com', 'private_key_id': '1'}
+        patchers = [
+            patch('core.sheets.build'),
+            patch('core.sheets.service_account.Credentials'),
+            patch('core.sheets.fetch_service_account_info', side_effect=lambda url: dict(self.key)),
+        ]
+        self.mock_build, _, self.mock_fetch = [patcher.start() for patcher in patchers]
+        for patcher in patchers:
+            self.addCleanup(patcher.stop)
+        self.addCleanup(reset_sheets_service)
+
+    @override_settings(GOOGLE_API_SERVICE_KEY_URL='https://keys.example.com/a.json')
+    def test_service_is_built_once_per_process(self) -> None:
+        """Test the key is downloaded and the client built once, from the bundled discovery document."""
+        service = get_sheets_service()
+        self.assertIs(get_sheets_service(), service)
+
+        self.mock_fetch.assert_called_once()
+        self.mock_build.assert_called_once()
+        self.assertTrue(self.mock_build.call_args.kwargs['static_discovery'])
+
+    def test_service_is_rebuilt_only_when_the_key_changes(self) -> None:
+        """Test a new key URL serving the same key reuses the client, while a rotated key rebuilds it."""
+        with override_settings(GOOGLE_API_SERVICE_KEY_URL='https://keys.example.com/a.json'):
+            service = get_sheets_service()
+        with override_settings(GOOGLE_API_SERVICE_KEY_URL='https://keys.example.com/b.json'):
+            self.assertIs(get_sheets_service(), service)
+
+            self.key['private_key_id'] = '2'
+            reset_sheets_service()
+            get_sheets_service()
+
+        self.assertEqual(self.mock_fetch.call_count, 3)
+        self.assertEqual(self.mock_build.call_count, 2)
+
+
+class DiffRangesTests(SimpleTestCase):
+    def test_diff_ranges(self) -> None:
+        """Test changed cells are grouped into rectangular ranges and vanished rows are blanked."""
+        old = [
+            list(SHEET_HEADER),
+            ['Bitcoin', 'BTC', 1, '₦1.00', '₦0.0', '₦9.00', '21'],
+            ['Tether', 'USDT', 2] + ['x'] * 4,
+        ]
+        new = [list(SHEET_HEADER), ['Bitcoin', 'BTC', 1, '₦2.00', '₦1.00', '₦9.00', '21']]
+
+        self.assertEqual(
+            diff_ranges('Coin data', old, new),
+            [
+                {'range': "'Coin data'!D2:E2", 'values': [['₦2.00', '₦1.00']]},
+                {'range': "'Coin data'!A3:G3", 'values': [[''] * 7]},
+            ],
+        )
+        self.assertEqual(diff_ranges('Coin data', new, new), [])
+        self.assertEqual(
+            diff_ranges('Coin data', [], new[:1] + new[1:] * 2)[0]['range'],
+            "'Coin data'!A1:G3",
+        )
+
+
+class PublishCoinsTests(TestCase):
+    def setUp(self) -> None:
+        """Create the setup of the test."""
+        self.addCleanup(reset_sheet_snapshot)
+        self.sheet = MagicMock()
+        self.sheet.get.return_value.execute.return_value = {
+            'sheets': [{'properties': {'sheetId': 3, 'title': 'Mon Jan 01 2024 10h00m Coin data'}}]
+        }
+        for rank in range(1, 6):
+            Coins.objects.create(name=f'Coin {rank}', symbol=f'c{rank}', rank=rank, current_price=rank)
+
+    def test_sync_sends_only_changes(self) -> None:
+        """Test the first sync creates the live tab and later syncs send only changed cells."""
+        self.assertEqual(sync_coin_tab(self.sheet), 1)
+        structural = self.sheet.batchUpdate.call_args.kwargs['body']['requests']
+        self.assertEqual([list(request) for request in structural], [['addSheet'], ['deleteSheet']])
+
+        self.sheet.reset_mock()
+        self.assertEqual(sync_coin_tab(self.sheet), 0)
+        self.assertFalse(self.sheet.method_calls)
+
+        Coins.objects.filter(rank__in=[2, 3]).update(current_price=100)
+        self.assertEqual(sync_coin_tab(self.sheet), 1)
+        self.sheet.get.assert_not_called()
+        body = self.sheet.values.return_value.batchUpdate.call_args.kwargs['body']
+        self.assertEqual(body['data'], [{'range': "'Coin data'!D3:D4", 'values': [['₦100.00'], ['₦100.00']]}])
+
+    def test_publish_coin_tab_folds_cleanup_into_one_batch_update(self) -> None:
+        """Test the per-run tab mode deletes expired tabs and adds the new one in a single request."""
+        publish_coin_tab(self.sheet)
+
+        self.sheet.batchUpdate.assert_called_once()
+        structural = self.sheet.batchUpdate.call_args.kwargs['body']['requests']
+        self.assertEqual([list(request) for request in structural], [['addSheet'], ['deleteSheet']])
+        self.assertEqual(len(self.sheet.values.return_value.append.call_args.kwargs['body']['values']), 6)
+
+    def test_sync_keeps_fake_spreadsheet_in_step_with_coins(self) -> None:
+        """Test the live tab matches the coins after growing, shrinking and repricing against the fake API."""
+        service = FakeSheetsService(latency=0.1)
+        sync_coin_tab(service.spreadsheets())
+        self.assertEqual(service.rows('Coin data'), coin_sheet_rows())
+
+        for rank in (6, 7):
+            Coins.objects.create(name=f'Coin {rank}', symbol=f'c{rank}', rank=rank, current_price=rank)
+        Coins.objects.filter(rank=1).delete()
+        Coins.objects.filter(rank=4).update(current_price=40)
+        sync_coin_tab(service.spreadsheets())
+        self.assertEqual(service.rows('Coin data', width=len(SHEET_HEADER)), coin_sheet_rows())
+
+        stats = service.stats()
+        self.assertEqual(
+            stats['calls_by_method'],
+            {'spreadsheets.get': 2, 'spreadsheets.batchUpdate': 2, 'values.batchUpdate': 2},
+        )
+        self.assertAlmostEqual(stats['simulated_seconds'], 0.6)
+        self.assertGreater(stats['request_bytes'], 0)
+
+    def test_expired_tabs_can_be_the_only_tabs(self) -> None:
+        """Test both modes replace a spreadsheet whose only tab has expired, which the API must keep one of."""
+        service = FakeSheetsService()
+        with self.assertRaises(FakeSheetsError):
+            service.spreadsheets().batchUpdate(
+                spreadsheetId='',
+                body={
+                    'requests': [
+                        {'addSheet': {'properties': {'title': 'x'}}},
+                        {'deleteSheet': {'sheetId': 0}},
+                        {'deleteSheet': {'sheetId': 1}},
+                    ]
+                },
+            ).execute()
+        self.assertEqual([tab['title'] for tab in service.tabs.values()], ['Sheet1'])
+
+        for publish in (sync_coin_tab, publish_coin_tab):
+            reset_sheet_snapshot()
+            service = FakeSheetsService()
+            service.tabs = {3: {**service.tabs.pop(0), 'title': 'Mon Jan 01 2024 10h00m Coin data'}}
+            publish(service.spreadsheets())
+            self.assertNotIn(3, service.tabs)
+            self.assertEqual(len(service.tabs), 1)
@@ -1,24 +1,63 @@
+import tempfile
 from datetime import timedelta
+from decimal import Decimal
+from pathlib import Path
+from smtplib import SMTPException
 from unittest.mock import patch
 
+import requests
 from django.core import mail
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.mail import get_connection
+from django.test import TestCase, override_settings
 from django.utils import timezone
 
-from core.models import Coins
+from core.benchmarks import synthetic_market_data
+from core.exporters import publish_coins_export
+from core.generation import COINS, get_data_generation
+from core.models import CoinPrice, CoinPriceSnapshot, Coins, FullCoin
+from core.sheets import reset_sheet_snapshot, reset_sheets_service
 from core.tasks import (
+    EXPORT_PENDING_KEY,
+    EXPORT_SCHEDULED_KEY,
+    StoreResult,
     export_data_to_excel,
+    get_coin_prices_for_currencies,
     get_coins_data_from_coingecko_and_store,
+    get_full_coin_data_iteratively_for_page,
+    ingest_coin_markets,
     populate_googlesheet_with_coins_data,
+    prune_coin_price_snapshots,
+    request_coin_export,
+    send_coin_export_batch,
+    store_coins,
+    store_data,
+    store_prices,
 )
 
 
 class CoinTasksTests(TestCase):
+    def setUp(self) -> None:
+        """Keep rendered and stored exports in a throwaway directory."""
+        export_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(export_dir.cleanup)
+        settings_override = override_settings(
+            MEDIA_ROOT=Path(export_dir.name) / 'media', EXPORT_CACHE_DIR=Path(export_dir.name) / 'cache'
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def tearDown(self) -> None:
+        """Drop the cached Sheets client and published snapshot between tests."""
+        reset_sheets_service()
+        reset_sheet_snapshot()
+
     def test_get_coins_data_from_coingecko_and_store(self):
         """Test get_coins_data_from_coingecko_and_store."""
 
-        with patch('core.tasks.requests.get') as mock_get:
-            mock_get.return_value.coin_data = [
+        with patch('core.tasks.get_client') as mock_get_client:
+            mock_get = mock_get_client.return_value.get_json
+            mock_get.return_value = [
                 {
                     'symbol': 'btc',
                     'name': 'Bitcoin',
@@ -32,8 +71,10 @@ class CoinTasksTests(TestCase):
             ]
 
             get_coins_data_from_coingecko_and_store()
+            get_coins_data_from_coingecko_and_store()
 
-        mock_get.assert_called_once()
+        self.assertEqual(mock_get.call_count, 2)
+        self.assertEqual(Coins.objects.filter(name='Bitcoin', symbol='btc').count(), 1)
 
     def test_populate_googlesheet_with_coins_data(self):
         """Test populate_googlesheet_with_coins_data."""
@@ -48,8 +89,9 @@ class CoinTasksTests(TestCase):
             name='xrp', symbol='xrp', current_price=12000000, price_change_within_24_hours=500, market_cap=210000000
         )
 
-        with patch('core.tasks.build') as mock_build:
-            with patch('core.tasks.service_account.Credentials') as mock_service_acount_credentials:
+        with patch('core.sheets.build') as mock_build, patch('core.sheets.fetch_service_account_info') as mock_key:
+            mock_key.return_value = {'client_email': 'sheets@django-excel.iam.gserviceaccount.com'}
+            with patch('core.sheets.service_account.Credentials') as mock_service_acount_credentials:
                 mock_service_acount_credentials.from_service_account_info.return_value = '123'
                 datetime_format = '%a %b %d %Y %Hh%Mm'
                 mock_build.return_value.spreadsheets.return_value.get.return_value.execute.return_value = {
@@ -74,8 +116,10 @@ class CoinTasksTests(TestCase):
                 today_datetime_now = timezone.now() + timedelta(minutes=7)
                 with patch('django.utils.timezone.now', return_value=today_datetime_now):
                     populate_googlesheet_with_coins_data()
+                    populate_googlesheet_with_coins_data()
 
         mock_build.assert_called_once()
+        mock_key.assert_called_once()
 
     def test_export_data_to_excel(self):
         """Test export_data_to_excel task."""
@@ -97,3 +141,284 @@ class CoinTasksTests(TestCase):
 
         self.assertEqual(len(mail.outbox), 1)
         self.assertEqual(mail.outbox[0].to, ['admin@django_excel.com'])
+        self.assertFalse(mail.outbox[0].attachments)
+        self.assertIn('http://localhost:8000/exports/', mail.outbox[0].body)
+
+    def test_send_coin_export_batch(self):
+        """Test queued requests share one stored workbook and one SMTP connection, once per address."""
+        self.addCleanup(cache.clear)
+        Coins.objects.create(name='tron', symbol='tron', current_price=12000000, market_cap=210000000)
+        with patch('core.tasks.send_coin_export_batch.apply_async') as mock_batch:
+            for email in ['a@django_excel.com', 'b@django_excel.com', 'A@django_excel.com ']:
+                request_coin_export(email)
+        mock_batch.assert_called_once()
+
+        with patch('core.tasks.publish_coins_export', wraps=publish_coins_export) as mock_export:
+            with patch('core.tasks.get_connection', wraps=get_connection) as mock_connection:
+                self.assertEqual(send_coin_export_batch(), 2)
+        mock_export.assert_called_once()
+        mock_connection.assert_called_once()
+        self.assertEqual([message.to for message in mail.outbox], [['a@django_excel.com'], ['b@django_excel.com']])
+        self.assertEqual(send_coin_export_batch(), 0)
+
+    def test_unscheduled_export_batch_is_rescheduled(self):
+        """Test a batch that failed to schedule or ran late is scheduled again and its addresses are kept."""
+        self.addCleanup(cache.clear)
+        with patch('core.tasks.send_coin_export_batch.apply_async', side_effect=ConnectionError('broker down')):
+            with self.assertLogs('core.tasks', level='ERROR'):
+                request_coin_export('a@django_excel.com')
+        with patch('core.tasks.send_coin_export_batch.apply_async') as mock_batch:
+            request_coin_export('b@django_excel.com')
+            request_coin_export('c@django_excel.com')
+            mock_batch.assert_called_once()
+
+            # The scheduled run never happened and its marker lapsed.
+            cache.delete(EXPORT_SCHEDULED_KEY)
+            request_coin_export('d@django_excel.com')
+            self.assertEqual(mock_batch.call_count, 2)
+
+        self.assertEqual(len(cache.get(EXPORT_PENDING_KEY)), 4)
+        self.assertEqual(send_coin_export_batch(), 4)
+
+    def test_failed_export_batch_keeps_its_addresses(self):
+        """Test addresses stay queued when sending fails and go out with the next run."""
+        self.addCleanup(cache.clear)
+        with patch('core.tasks.send_coin_export_batch.apply_async'):
+            request_coin_export('a@django_excel.com')
+        with patch('core.tasks.get_connection') as mock_connection:
+            mock_connection.return_value.send_messages.side_effect = SMTPException('connection refused')
+            with self.assertRaises(SMTPException):
+                send_coin_export_batch()
+        self.assertEqual(cache.get(EXPORT_PENDING_KEY), ['a@django_excel.com'])
+
+        with patch('core.tasks.send_coin_export_batch.apply_async'):
+            request_coin_export('b@django_excel.com')
+        self.assertEqual(send_coin_export_batch(), 2)
+        self.assertEqual([message.to for message in mail.outbox], [['a@django_excel.com'], ['b@django_excel.com']])
+        self.assertIsNone(cache.get(EXPORT_PENDING_KEY))
+
+
+class StoreDataTests(TestCase):
+    def assert_store_data_round_trip(self, upsert: bool) -> None:
+        """Store a batch, store changed values, and check both are persisted."""
+        store_data(synthetic_market_data(3, seed=1), upsert=upsert)
+        changed = synthetic_market_data(4, seed=2)
+        store_data(changed, upsert=upsert)
+
+        self.assertEqual(FullCoin.objects.count(), 4)
+        coin = FullCoin.objects.get(coin_id='bench-coin-2')
+        self.assertEqual(float(coin.current_price), changed[1]['current_price'])
+        self.assertEqual(coin.market_cap_rank, 2)
+
+    def test_store_data_upsert(self) -> None:
+        """Test the single-statement upsert path."""
+        with self.assertNumQueries(2):
+            store_data(synthetic_market_data(3), upsert=True)
+        self.assert_store_data_round_trip(upsert=True)
+
+    def test_store_data_bulk_update(self) -> None:
+        """Test the read-then-bulk_update fallback path."""
+        self.assert_store_data_round_trip(upsert=False)
+
+    def test_store_data_skips_unchanged_coins(self) -> None:
+        """Test only new or changed coins are written and the counts are reported."""
+        self.assertEqual(store_data(synthetic_market_data(3, seed=1)), StoreResult(created=3))
+
+        data = synthetic_market_data(4, seed=1)
+        data[0]['current_price'] = 1.5
+        with self.assertNumQueries(2):
+            result = store_data(data)
+        self.assertEqual(result, StoreResult(created=1, updated=1, unchanged=2))
+
+        with self.assertNumQueries(1):
+            self.assertEqual(store_data(data), StoreResult(unchanged=4))
+        self.assertEqual(float(FullCoin.objects.get(coin_id='bench-coin-1').current_price), 1.5)
+
+    def test_store_data_falls_back_without_upsert_support(self) -> None:
+        """Test store_data picks the fallback when the backend can't upsert."""
+        with patch('core.tasks.supports_upsert', return_value=False):
+            with patch('core.tasks.store_data_with_bulk_update') as mock_bulk_update:
+                store_data(synthetic_market_data(1))
+        mock_bulk_update.assert_called_once()
+
+
+class StoreCoinsTests(TestCase):
+    def setUp(self) -> None:
+        """Create the setup of the test."""
+        self.page = [
+            {
+                'name': 'Bitcoin',
+                'symbol': 'btc',
+                'image': 'https://assets.coingecko.com/coins/images/1/large/bitcoin.png',
+                'current_price': 100,
+                'price_change_24h': 1,
+                'market_cap_rank': 1,
+                'market_cap': 1000,
+                'total_supply': 21000000,
+            },
+            {
+                'name': 'Ethereum',
+                'symbol': 'eth',
+                'image': 'https://assets.coingecko.com/coins/images/279/large/ethereum.png',
+                'current_price': 10,
+                'price_change_24h': 1,
+                'market_cap_rank': 2,
+                'market_cap': 500,
+                'total_supply': None,
+            },
+        ]
+
+    def test_store_coins_upsert(self) -> None:
+        """Test a page is written in one transaction with a single upsert."""
+        with self.assertNumQueries(3):
+            store_coins(self.page, upsert=True)
+        self.page[0]['current_price'] = 200
+        store_coins(self.page, upsert=True)
+
+        self.assertEqual(Coins.objects.count(), 2)
+        self.assertEqual(Coins.objects.get(symbol='btc').current_price, 200)
+
+    def test_store_coins_fallback(self) -> None:
+        """Test the select-then-bulk-write path keeps (name, symbol) unique."""
+        store_coins(self.page[:1], upsert=False)
+        self.page[0]['current_price'] = 300
+        store_coins(self.page, upsert=False)
+
+        self.assertEqual(Coins.objects.count(), 2)
+        self.assertEqual(Coins.objects.get(symbol='btc').current_price, 300)
+
+
+def serve_markets(requested: list[str], per_currency_pages: int, per_page: int = 10, fail_on_page: int = 0):
+    """Return a ``get_json`` fake serving synthetic market pages, raising once on ``fail_on_page``."""
+    failed = []
+
+    def get_json(url: str) -> list[dict]:
+        requested.append(url)
+        params = dict(part.split('=') for part in url.split('?')[1].split('&'))
+        page = int(params['page'])
+        if page == fail_on_page and not failed:
+            failed.append(page)
+            raise requests.exceptions.ConnectionError('connection reset')
+        if page > per_currency_pages:
+            return []
+        return synthetic_market_data(per_page, start_rank=(page - 1) * per_page + 1)
+
+    return get_json
+
+
+@override_settings(COINGECKO_PAGE_INTERVAL=0)
+class CoinPriceSnapshotTasksTests(TestCase):
+    def setUp(self) -> None:
+        """Route CoinGecko requests to a fake and start without a checkpoint."""
+        self.requested: list[str] = []
+        patcher = patch('core.tasks.get_client')
+        self.get_json = patcher.start().return_value.get_json
+        self.addCleanup(patcher.stop)
+        self.addCleanup(cache.clear)
+
+    def test_full_coin_run_appends_one_snapshot_per_coin(self) -> None:
+        """Test a full-coin run records every fetched coin at a single capture time."""
+        self.get_json.side_effect = serve_markets(self.requested, per_currency_pages=3, per_page=50)
+        get_full_coin_data_iteratively_for_page()
+
+        self.assertEqual(FullCoin.objects.count(), 150)
+        self.assertEqual(CoinPriceSnapshot.objects.count(), 150)
+        self.assertEqual(CoinPriceSnapshot.objects.values('captured_at').distinct().count(), 1)
+
+    def test_failed_run_resumes_after_last_stored_page(self) -> None:
+        """Test a retry starts after the last checkpointed page and only a finished run clears it."""
+        self.get_json.side_effect = serve_markets(self.requested, per_currency_pages=4, fail_on_page=3)
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            get_full_coin_data_iteratively_for_page()
+        self.assertEqual(FullCoin.objects.count(), 20)
+        get_full_coin_data_iteratively_for_page()
+        get_full_coin_data_iteratively_for_page()
+
+        pages = [int(url.split('&page=')[1].split('&')[0]) for url in self.requested]
+        self.assertEqual(pages, [1, 2, 3, 3, 4, 5, 1, 2, 3, 4, 5])
+        self.assertEqual(FullCoin.objects.count(), 40)
+        # The retry stamps the pages it stores with its own capture time, not the failed attempt's.
+        captured = CoinPriceSnapshot.objects.order_by('captured_at').values_list('captured_at', flat=True).distinct()
+        first, retried, rerun = captured
+        self.assertLess(first, retried)
+        self.assertLess(retried, rerun)
+        self.assertEqual(CoinPriceSnapshot.objects.filter(captured_at=retried).count(), 20)
+
+    def test_ingest_coin_markets_fetches_each_page_once(self) -> None:
+        """Test one run feeds every table from a single stream of pages per currency."""
+        self.get_json.side_effect = serve_markets(self.requested, per_currency_pages=3)
+        generation = get_data_generation(COINS)
+        with self.settings(COINGECKO_VS_CURRENCIES=['usd', 'ngn'], COINGECKO_PRICE_MAX_PAGES=2, COINS_MAX_PAGES=1):
+            written = ingest_coin_markets()
+
+        self.assertEqual(sorted(self.requested), sorted(set(self.requested)))
+        # usd walks to the empty fourth page for FullCoin; ngn stops after the two pages its sinks want.
+        self.assertEqual(len(self.requested), 6)
+        self.assertEqual(
+            written,
+            {'full_coins.usd': 30, 'snapshots.usd': 30, 'coins.ngn': 10, 'prices.usd': 20, 'prices.ngn': 20},
+        )
+        self.assertEqual((FullCoin.objects.count(), CoinPriceSnapshot.objects.count()), (30, 30))
+        self.assertEqual((Coins.objects.count(), CoinPrice.objects.count()), (10, 40))
+        self.assertNotEqual(get_data_generation(COINS), generation)
+
+    def test_prune_coin_price_snapshots(self) -> None:
+        """Test snapshots past the retention window are deleted in chunks."""
+        now = timezone.now()
+        CoinPriceSnapshot.objects.bulk_create(
+            [CoinPriceSnapshot(coin_id=f'coin-{i}', captured_at=now - timedelta(days=30)) for i in range(5)]
+            + [CoinPriceSnapshot(coin_id='bitcoin', captured_at=now)]
+        )
+
+        with self.settings(SNAPSHOT_PRUNE_CHUNK_SIZE=2):
+            self.assertEqual(prune_coin_price_snapshots(), 5)
+
+        self.assertEqual(list(CoinPriceSnapshot.objects.values_list('coin_id', flat=True)), ['bitcoin'])
+
+
+@override_settings(COINGECKO_PAGE_INTERVAL=0)
+class CoinPriceTasksTests(TestCase):
+    def setUp(self) -> None:
+        """Serve two pages of synthetic markets per currency, priced differently per currency."""
+        self.rates = {'usd': 1, 'ngn': 1500, 'eur': 0.9}
+        self.requested: list[str] = []
+
+        def get_json(url: str) -> list[dict]:
+            self.requested.append(url)
+            params = dict(part.split('=') for part in url.split('?')[1].split('&'))
+            page = int(params['page'])
+            if page > 2:
+                return []
+            data = synthetic_market_data(3, start_rank=page * 10)
+            for coin in data:
+                coin['current_price'] = round(coin['current_price'] * self.rates[params['vs_currency']], 2)
+            return data
+
+        patcher = patch('core.tasks.get_client')
+        patcher.start().return_value.get_json.side_effect = get_json
+        self.addCleanup(patcher.stop)
+
+    def test_get_coin_prices_for_currencies(self) -> None:
+        """Test each currency is one stream of page requests and every page is upserted once."""
+        with self.settings(COINGECKO_VS_CURRENCIES=['usd', 'NGN', 'eur'], COINGECKO_PRICE_PER_PAGE=3):
+            with patch('core.tasks.store_prices', wraps=store_prices) as mock_store:
+                self.assertEqual(get_coin_prices_for_currencies(), {'usd': 6, 'ngn': 6, 'eur': 6})
+
+        self.assertEqual(len(self.requested), 9)
+        self.assertEqual(mock_store.call_count, 6)
+        self.assertEqual(CoinPrice.objects.count(), 18)
+        usd, ngn = (CoinPrice.objects.get(coin_id='bench-coin-10', vs_currency=c) for c in ('usd', 'ngn'))
+        self.assertAlmostEqual(float(ngn.current_price), round(float(usd.current_price) * 1500, 2), places=2)
+
+    def test_store_prices_updates_in_place(self) -> None:
+        """Test re-storing a page updates the (coin, currency) rows on both write paths."""
+        page = synthetic_market_data(2)
+        for upsert in (True, False):
+            store_prices('usd', page, upsert=upsert)
+            page[0]['current_price'] += 1
+            store_prices('usd', page, upsert=upsert)
+
+            self.assertEqual(CoinPrice.objects.count(), 2)
+            self.assertEqual(
+                CoinPrice.objects.get(coin_id='bench-coin-1').current_price, Decimal(str(page[0]['current_price']))
+            )
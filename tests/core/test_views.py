@@ -1,8 +1,23 @@
+import gzip
+import json
+import tempfile
+from pathlib import Path
 from unittest.mock import patch
+from urllib.parse import urlsplit
 
-from django.test import Client, TestCase
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
+from core.benchmarks import synthetic_market_data
+from core.exporters import export_download_url
+from core.generation import COINS, bump_data_generation
+from core.models import Coins
+from core.tasks import EXPORT_PENDING_KEY, store_data
+
 
 class IndexViewTests(TestCase):
     def setUp(self) -> None:
@@ -15,6 +30,86 @@ class IndexViewTests(TestCase):
         self.assertEqual(response.templates[0].name, 'coin_data.html')
 
 
+@override_settings(INDEX_PAGE_SIZE=2)
+class IndexPaginationTests(TestCase):
+    def setUp(self) -> None:
+        """Create the setup of the test."""
+        self.client = Client()
+        for rank, (name, symbol, price) in enumerate(
+            [('Bitcoin', 'btc', 900), ('Ethereum', 'eth', 300), ('Bitcoin Cash', 'bch', 300), ('Tether', 'usdt', 1)],
+            start=1,
+        ):
+            Coins.objects.create(name=name, symbol=symbol, rank=rank, current_price=price)
+        Coins.objects.create(name='Unranked', symbol='unr')
+
+    def names(self, response) -> list[str]:
+        """Return the coin names rendered on a page."""
+        return [coin.name for coin in response.context['coin_data']]
+
+    def test_keyset_pages_follow_cursor(self) -> None:
+        """Test pages are bounded and the cursor continues where the last page stopped."""
+        with self.assertNumQueries(1):
+            first = self.client.get(reverse('core:index'))
+        self.assertEqual(self.names(first), ['Bitcoin', 'Ethereum'])
+
+        second = self.client.get(reverse('core:index'), {'cursor': first.context['next_cursor']})
+        self.assertEqual(self.names(second), ['Bitcoin Cash', 'Tether'])
+
+        third = self.client.get(reverse('core:index'), {'cursor': second.context['next_cursor']})
+        self.assertEqual(self.names(third), ['Unranked'])
+        self.assertIsNone(third.context['next_cursor'])
+
+    def test_null_sort_values_come_last_in_both_directions(self) -> None:
+        """Test rows without a sort value are paged through after every valued row, ascending or not."""
+        Coins.objects.create(name='Unpriced', symbol='unp')
+        for sort, expected in (
+            ('rank', ['Bitcoin', 'Ethereum', 'Bitcoin Cash', 'Tether', 'Unranked', 'Unpriced']),
+            ('-rank', ['Tether', 'Bitcoin Cash', 'Ethereum', 'Bitcoin', 'Unpriced', 'Unranked']),
+        ):
+            names, cursor = [], None
+            while True:
+                page = self.client.get(reverse('core:index'), {'sort': sort, **({'cursor': cursor} if cursor else {})})
+                names += self.names(page)
+                cursor = page.context['next_cursor']
+                if cursor is None:
+                    break
+            self.assertEqual(names, expected)
+
+    def test_descending_sort_breaks_ties_by_id(self) -> None:
+        """Test a descending sort with equal values pages without skipping or repeating rows."""
+        first = self.client.get(reverse('core:index'), {'sort': '-current_price'})
+        second = self.client.get(
+            reverse('core:index'), {'sort': '-current_price', 'cursor': first.context['next_cursor']}
+        )
+        self.assertEqual(self.names(first) + self.names(second), ['Bitcoin', 'Bitcoin Cash', 'Ethereum', 'Tether'])
+
+    def test_unknown_sort_and_foreign_cursor_are_ignored(self) -> None:
+        """Test non-whitelisted sorts fall back to rank and cursors can't cross sorts."""
+        first = self.client.get(reverse('core:index'), {'sort': 'image_url'})
+        self.assertEqual(first.context['sort'], 'rank')
+
+        response = self.client.get(reverse('core:index'), {'sort': 'name', 'cursor': first.context['next_cursor']})
+        self.assertEqual(self.names(response), ['Bitcoin', 'Bitcoin Cash'])
+
+    def test_prefix_search(self) -> None:
+        """Test name and symbol prefix search ignores case."""
+        response = self.client.get(reverse('core:index'), {'q': 'bitc'})
+        self.assertEqual(self.names(response), ['Bitcoin', 'Bitcoin Cash'])
+
+        response = self.client.get(reverse('core:index'), {'q': 'USD'})
+        self.assertEqual(self.names(response), ['Tether'])
+
+    def test_prefix_search_matches_non_ascii_names(self) -> None:
+        """Test a prefix with lowercase non-ASCII letters finds names starting with it."""
+        Coins.objects.create(name='écu', symbol='ecu', rank=50)
+        Coins.objects.create(name='ébène', symbol='ebn', rank=51)
+
+        response = self.client.get(reverse('core:index'), {'q': 'éb'})
+        self.assertEqual(self.names(response), ['ébène'])
+        response = self.client.get(reverse('core:index'), {'q': 'éCu'})
+        self.assertEqual(self.names(response), ['écu'])
+
+
 class ExtractAndSendCoinDataViaEmailTests(TestCase):
     def setUp(self) -> None:
         """Create the setup of the test."""
@@ -24,12 +119,124 @@ class ExtractAndSendCoinDataViaEmailTests(TestCase):
     def test_extract_and_send_coin_data_via_email_success(self):
         """Test extract and send extracted data."""
 
-        with patch('core.views.export_data_to_excel.delay') as mock_export_data_to_excel:
+        self.addCleanup(cache.clear)
+        with patch('core.tasks.send_coin_export_batch.apply_async') as mock_batch:
             response = self.client.post(reverse('core:extract_data'), self.data, content_type='application/json')
+            self.client.post(reverse('core:extract_data'), self.data, content_type='application/json')
+            self.client.post(
+                reverse('core:extract_data'), {'userEmail': 'other@django.com'}, content_type='application/json'
+            )
 
         self.assertEqual(response.status_code, 200)
-        mock_export_data_to_excel.assert_called_once()
+        mock_batch.assert_called_once_with(countdown=settings.EXPORT_BATCH_WINDOW)
+        self.assertEqual(cache.get(EXPORT_PENDING_KEY), ['django_excel@django.com', 'other@django.com'])
 
     def test_extract_and_send_coin_data_via_email_failure(self):
         response = self.client.get(reverse('core:extract_data'), self.data, content_type='application/json')
         self.assertEqual(response.status_code, 500)
+
+
+class CoinsApiTests(TestCase):
+    def setUp(self) -> None:
+        """Create the setup of the test."""
+        self.client = Client()
+        for rank in range(1, 41):
+            Coins.objects.create(name=f'Coin {rank}', symbol=f'c{rank}', rank=rank, current_price=rank * 10)
+
+    def test_coins_api(self) -> None:
+        """Test the API pages coins from values_list rows and compresses large bodies."""
+        response = self.client.get(reverse('core:coins_api'), {'limit': 30}, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('ETag', response)
+        payload = json.loads(gzip.decompress(response.content))
+        self.assertEqual(len(payload['results']), 30)
+        self.assertEqual(payload['results'][0]['name'], 'Coin 1')
+        self.assertEqual(payload['results'][0]['current_price'], '10.00')
+
+        response = self.client.get(reverse('core:coins_api'), {'limit': 30, 'cursor': payload['next_cursor']})
+        self.assertEqual([coin['rank'] for coin in response.json()['results']], list(range(31, 41)))
+
+    def test_coins_api_not_modified_without_db(self) -> None:
+        """Test a matching If-None-Match is answered with 304 and no queries until the next ingestion."""
+        bump_data_generation(COINS)
+        response = self.client.get(reverse('core:coins_api'))
+        self.assertIn('Last-Modified', response)
+
+        with self.assertNumQueries(0):
+            cached = self.client.get(reverse('core:coins_api'), HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, 304)
+
+        bump_data_generation(COINS)
+        self.assertEqual(
+            self.client.get(reverse('core:coins_api'), HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200
+        )
+
+    def test_full_coins_api(self) -> None:
+        """Test full coin data is served with its own generation."""
+        store_data(synthetic_market_data(3))
+        response = self.client.get(reverse('core:full_coins_api'), {'sort': '-market_cap_rank'})
+
+        self.assertEqual([coin['coin_id'] for coin in response.json()['results']][0], 'bench-coin-3')
+
+    def test_full_coins_api_includes_unranked_coins(self) -> None:
+        """Test the default rank sort returns unranked coins after the ranked ones."""
+        data = synthetic_market_data(3)
+        data[1]['market_cap_rank'] = None
+        store_data(data)
+        response = self.client.get(reverse('core:full_coins_api'), {'limit': 2})
+        payload = response.json()
+        self.assertEqual([coin['coin_id'] for coin in payload['results']], ['bench-coin-1', 'bench-coin-3'])
+
+        response = self.client.get(reverse('core:full_coins_api'), {'limit': 2, 'cursor': payload['next_cursor']})
+        self.assertEqual([coin['coin_id'] for coin in response.json()['results']], ['bench-coin-2'])
+        self.assertIsNone(response.json()['next_cursor'])
+
+
+class DownloadDataTests(TestCase):
+    def setUp(self) -> None:
+        """Create the setup of the test."""
+        self.client = Client()
+        store_data(synthetic_market_data(3))
+        for rank in range(1, 4):
+            Coins.objects.create(name=f'Coin {rank}', symbol=f'c{rank}', rank=rank, current_price=rank)
+
+    def test_download_csv_streams(self) -> None:
+        """Test CSV downloads are streamed as attachments, header first."""
+        response = self.client.get(reverse('core:download_data', args=['full-coins', 'csv']))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment; filename="full-coins-', response['Content-Disposition'])
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual(lines[0].split(',')[:3], ['coin_id', 'symbol', 'name'])
+        self.assertEqual([line.split(',')[0] for line in lines[1:]], ['bench-coin-1', 'bench-coin-2', 'bench-coin-3'])
+
+    def test_download_xlsx_and_unknown(self) -> None:
+        """Test the coin workbook download and 404s for unknown datasets or formats."""
+        with tempfile.TemporaryDirectory() as cache_dir, override_settings(EXPORT_CACHE_DIR=Path(cache_dir)):
+            response = self.client.get(reverse('core:download_data', args=['coins', 'xlsx']))
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(b''.join(response.streaming_content).startswith(b'PK'))
+            response.close()
+
+        self.assertEqual(self.client.get(reverse('core:download_data', args=['users', 'csv'])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('core:download_data', args=['full-coins', 'xlsx'])).status_code, 404)
+
+    def test_download_export_link(self) -> None:
+        """Test an emailed link streams the stored export until it expires."""
+        with tempfile.TemporaryDirectory() as media_root, override_settings(MEDIA_ROOT=media_root):
+            name = default_storage.save('exports/coins-1.xlsx', ContentFile(b'PK workbook'))
+            path = urlsplit(export_download_url(name)).path
+
+            response = self.client.get(path)
+            self.assertEqual(response.status_code, 200)
+            self.assertIn('filename="coins-1.xlsx"', response['Content-Disposition'])
+            self.assertEqual(b''.join(response.streaming_content), b'PK workbook')
+            response.close()
+
+            with override_settings(EXPORT_LINK_MAX_AGE=-1):
+                self.assertEqual(self.client.get(path).status_code, 404)
+            default_storage.delete(name)
+            self.assertEqual(self.client.get(path).status_code, 404)